@@ -3,6 +3,7 @@ from langchain.vectorstores.chroma import Chroma
 from langchain_openai import AzureOpenAIEmbeddings
 from dotenv import load_dotenv
 from openai import AzureOpenAI
+from llm_cache import cached_client
 import streamlit as st
 
 CHROMA_PATH = "chroma_finance_docs"
@@ -48,13 +49,13 @@ def query_rag(query_text):
     # Combine context from matching documents
     context_text = "\n\n - -\n\n".join([doc.page_content for doc, _score in results])
 
-    # Azure OpenAI
-    client = AzureOpenAI(
+    # Azure OpenAI (repeated requests are answered from the response cache)
+    client = cached_client(AzureOpenAI(
             azure_endpoint=endpoint_url,
             azure_deployment=deployment_name,
             api_key=api_key,
             api_version=version_number,
-        )
+        ))
 
     rag_chat_completion = client.chat.completions.create(
 
@@ -16,7 +16,12 @@ from datetime import datetime
 from dotenv import load_dotenv
 from agno.utils.pprint import pprint_run_response
 from openai import AzureOpenAI
+from llm_cache import cached_client
 import json
+import contextvars
+import pandas as pd
+from scoring_snapshot import score_applicant
+from batch_scoring import top_drivers
 
 
 import warnings
@@ -39,13 +44,13 @@ embedding_deployment_name = os.environ.get("ADA_AZURE_OPENAI_DEPLOYMENT")
 # version_number = os.environ.get("API_VERSION_GA")
 
 
-# Azure OpenAI
-client = AzureOpenAI(
+# Azure OpenAI (repeated requests are answered from the response cache, except regenerations)
+client = cached_client(AzureOpenAI(
         azure_endpoint=endpoint_url,
         azure_deployment=deployment_name,
         api_key=api_key,
         api_version=version_number,
-    )
+    ))
 
 
 embeddings = AzureOpenAIEmbedder(id=embedding_model_name, api_key = embedding_api_key, azure_deployment= embedding_deployment_name, azure_endpoint=embedding_endpoint_url, api_version="2024-10-21")
@@ -97,6 +102,10 @@ Include sections under the following headings:
 class ScoreStructure(BaseModel):
     score: float = Field(..., description="The score you will generate for the loan application based on the narrative and ml model score provided to you, must be in the range of 0-100")
 
+# Application scored by ml_model, set by the caller before running the score agent.
+# A context variable, so concurrent requests in the assessment service each see their own.
+current_application = contextvars.ContextVar("current_application", default=None)
+
 def ml_model() -> str:
     """Use this function to get a score and a list of features given by a Machine Learning model
 
@@ -106,7 +115,16 @@ def ml_model() -> str:
         json: List of features influencing the score and Model Score
         
     """
-    ml_data = {"features_list": ["Total Debt", "Net Revenue", "Asset Turnover Ratio"], "score": 65.11}
+    application = current_application.get()
+    if application is None:
+        return json.dumps({"features_list": [], "score": None, "error": "No application data available"})
+
+    # Contributions come out of the same scoring pass as the score itself
+    scores = score_applicant(application, explain=True)
+    drivers = top_drivers(pd.DataFrame([scores["Contributions"]]), k=3)[0]
+    ml_data = {"features_list": [feature for feature, _ in drivers],
+               "feature_contributions": {feature: round(value, 2) for feature, value in drivers},
+               "score": round(scores["Final Risk Score"], 2)}
 
     return json.dumps(ml_data) 
 
@@ -206,7 +224,8 @@ class CreditNoteAgent:
     def __init__(self, template: str):
         self.template = template
 
-    def generate_credit_note(self, narrative: str, user_query:str, loan_details: dict,feedback_history: list = None) -> str:
+    def generate_credit_note(self, narrative: str, user_query:str, loan_details: dict,feedback_history: list = None,
+                             regenerate: bool = False) -> str:
         current_date = datetime.now().strftime("%Y-%m-%d")
         # Add feedback context to system prompt
         feedback_context = "\n".join([f"Feedback {i+1}: {fb}" for i, fb in enumerate(feedback_history or [])])
@@ -253,6 +272,8 @@ class CreditNoteAgent:
 
         model=model_name,
         temperature=0.4,
+        # A regenerated note must be a new answer, not the cached one the user rejected
+        cache=not regenerate,
         )
         return credit_note_chat_completion.choices[0].message.content
 
@@ -291,8 +312,18 @@ credit_note_agent = CreditNoteAgent(credit_note_template)
 # ---------------------------------------------------------------------
 # Main pipeline: Combines all the agents and human-in-the-loop interactions.
 # ---------------------------------------------------------------------
-def main():
+# Applicant the CLI pipeline scores (ratios and loan terms, as in fetch_financial_data_from_excel)
+SAMPLE_APPLICATION = {
+    "Net Profit Margin %": 35.8, "Return on Equity %": 32.8, "Return on Assets %": 17.2,
+    "Current Ratio": 1.27, "Asset Turnover Ratio": 0.48, "Debt Equity Ratio": 0.35,
+    "Debt To Asset Ratio": 0.17, "Interest Coverage Ratio": 37.0,
+    "Loan Value": 250000000, "Collateral Value": 400000000, "Credit Score": 780,
+}
+
+def main(application=SAMPLE_APPLICATION):
     input_data = "Generate me a credit note for a corporate loan for Microsoft"
+    # The score agent's ml_model tool scores this application
+    current_application.set(application)
     
     # Step 1: Generate and approve risk narrative
     # while True:  
@@ -346,7 +377,7 @@ def main():
         input_data = input_data + " " + structured_fb_credit  # Update input with feedback
         # print(input_data)
 
-        credit_note = credit_note_agent.generate_credit_note(final_narrative_response, input_data)
+        credit_note = credit_note_agent.generate_credit_note(final_narrative_response, input_data, regenerate=True)
         # print("regen-note")
         print(credit_note)
 
@@ -0,0 +1,223 @@
+import os
+import time
+import itertools
+from datetime import datetime
+import pandas as pd
+import pyarrow as pa
+import pyarrow.ipc as ipc
+
+STORE_PATH = "output/applications"
+
+# A level is compacted into one segment of the next level once it holds FANOUT segments.
+# Segments at MAX_LEVEL are never merged again, so every row is rewritten at most MAX_LEVEL times.
+FANOUT = 16
+MAX_LEVEL = 3
+
+SUPERSEDES_KEY = b"supersedes"
+LOCK_STALE_SECONDS = 60
+
+_counter = itertools.count()
+
+
+def _segment_name(level, stamp=None):
+    stamp = stamp or f"{time.time_ns():020d}-{os.getpid()}-{next(_counter)}"
+    return f"L{level}-{stamp}.arrow"
+
+
+def _segment_stamp(name):
+    return name.split("-", 1)[1][:-len(".arrow")]
+
+
+def _segment_level(name):
+    return int(name.split("-", 1)[0][1:])
+
+
+def _numeric_as_float(table):
+    """
+    Store every numeric field as float64, so segments holding 750 and 750.5 for the same field
+    still concatenate.
+    """
+    for i, field in enumerate(table.schema):
+        if (pa.types.is_integer(field.type) or pa.types.is_floating(field.type)) and field.type != pa.float64():
+            table = table.set_column(i, field.with_type(pa.float64()), table.column(i).cast(pa.float64()))
+    return table
+
+
+def _write_segment(store_path, table, level, supersedes=(), stamp=None):
+    """
+    Write an Arrow IPC file under a temporary name and rename it into place, so a segment
+    is either fully visible to readers or not at all.
+    """
+    metadata = dict(table.schema.metadata or {})
+    metadata[SUPERSEDES_KEY] = ",".join(supersedes).encode()
+    table = table.replace_schema_metadata(metadata)
+
+    name = _segment_name(level, stamp)
+    tmp_path = os.path.join(store_path, name + ".tmp")
+    with pa.OSFile(tmp_path, "wb") as sink:
+        with ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    os.replace(tmp_path, os.path.join(store_path, name))
+    return name
+
+
+def _open_segment(path):
+    """
+    Memory-map a segment. Returns the table and the segments it replaced.
+    """
+    source = pa.memory_map(path, "r")
+    table = ipc.open_file(source).read_all()
+    supersedes = (table.schema.metadata or {}).get(SUPERSEDES_KEY, b"").decode()
+    return table, set(filter(None, supersedes.split(",")))
+
+
+def _list_segments(store_path):
+    if not os.path.isdir(store_path):
+        return []
+    return sorted(name for name in os.listdir(store_path) if name.endswith(".arrow"))
+
+
+def append_application(record, store_path=STORE_PATH):
+    """
+    Durably append one scored application to the store.
+
+    The record goes into its own small segment (constant cost, no existing file is rewritten).
+    Every FANOUT-th segment of a level makes this call run compact() before returning, so that
+    append also merges the level: a few tens of milliseconds at most, since a row is rewritten
+    at most MAX_LEVEL times.
+    Args:
+    - record (dict): Applicant inputs and scores. A "Scored At" timestamp is added if missing.
+    - store_path (str): Store directory.
+    Returns:
+    - name (str): The segment the record was written to.
+    """
+    os.makedirs(store_path, exist_ok=True)
+    record = dict(record)
+    record.setdefault("Scored At", datetime.now().isoformat(timespec="seconds"))
+    name = _write_segment(store_path, _numeric_as_float(pa.Table.from_pylist([record])), level=0)
+
+    level0 = [s for s in _list_segments(store_path) if _segment_level(s) == 0]
+    if len(level0) >= FANOUT:
+        compact(store_path)
+    return name
+
+
+def read_snapshot(store_path=STORE_PATH):
+    """
+    Memory-map a consistent view of the store.
+
+    Compaction writes the merged segment (listing the segments it replaces) before removing
+    its inputs, so a reader drops every segment superseded by another one it can see. If a
+    listed segment is removed before it can be opened, the listing is simply taken again.
+    Returns:
+    - table (pyarrow.Table): All stored applications, in append order.
+    """
+    while True:
+        segments = {}
+        try:
+            for name in _list_segments(store_path):
+                segments[name] = _open_segment(os.path.join(store_path, name))
+        except FileNotFoundError:
+            continue
+        break
+
+    superseded = set().union(*(s for _, s in segments.values())) if segments else set()
+    live = sorted((name for name in segments if name not in superseded), key=_segment_stamp)
+    # Segments written before numeric fields were stored as float64 are cast on read
+    tables = [_numeric_as_float(segments[name][0]) for name in live]
+    if not tables:
+        return pa.table({})
+    return pa.concat_tables(tables, promote_options="default")
+
+
+def read_applications(store_path=STORE_PATH):
+    """
+    Stored applications as a DataFrame (see read_snapshot).
+    """
+    return read_snapshot(store_path).to_pandas()
+
+
+class _CompactionLock:
+    """
+    Non-blocking cross-process lock (lock file created with O_EXCL). Only one process compacts at
+    a time; the others just keep appending. A lock older than LOCK_STALE_SECONDS is assumed to
+    belong to a crashed compactor and is taken over.
+    """
+
+    def __init__(self, store_path):
+        self.path = os.path.join(store_path, "compact.lock")
+        self.acquired = False
+
+    def __enter__(self):
+        try:
+            if time.time() - os.path.getmtime(self.path) > LOCK_STALE_SECONDS:
+                os.remove(self.path)
+        except OSError:
+            pass
+        try:
+            os.close(os.open(self.path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+            self.acquired = True
+        except FileExistsError:
+            self.acquired = False
+        return self
+
+    def __exit__(self, *exc):
+        if self.acquired:
+            os.remove(self.path)
+
+
+def compact(store_path=STORE_PATH):
+    """
+    Merge every level that holds at least FANOUT segments into one segment of the next level.
+    Returns:
+    - merged (list): Names of the segments written, empty if another process holds the lock.
+    """
+    merged = []
+    with _CompactionLock(store_path) as lock:
+        if not lock.acquired:
+            return merged
+
+        # Retry removing segments an earlier compaction could not delete, and never merge them again
+        superseded = set()
+        for name in _list_segments(store_path):
+            superseded |= _open_segment(os.path.join(store_path, name))[1]
+        _remove_segments(store_path, superseded)
+
+        for level in range(MAX_LEVEL):
+            names = sorted((s for s in _list_segments(store_path) if _segment_level(s) == level and s not in superseded),
+                           key=_segment_stamp)
+            if len(names) < FANOUT:
+                continue
+
+            tables, supersedes = [], set(names)
+            for name in names:
+                table, replaced = _open_segment(os.path.join(store_path, name))
+                tables.append(_numeric_as_float(table.replace_schema_metadata(None)))
+                # Carry forward older replacements in case their files could not be removed
+                supersedes |= replaced
+            table = pa.concat_tables(tables, promote_options="default").combine_chunks()
+            # The merged segment keeps the stamp of its oldest input so rows stay in append order
+            merged.append(_write_segment(store_path, table, level + 1, sorted(supersedes), _segment_stamp(names[0])))
+            _remove_segments(store_path, names)
+            superseded |= supersedes
+    return merged
+
+
+def _remove_segments(store_path, names):
+    for name in names:
+        try:
+            os.remove(os.path.join(store_path, name))
+        except OSError:
+            # Missing already, or still memory-mapped by a reader (Windows); it stays superseded until removed
+            pass
+
+
+def reference_with_applications(reference, store_path=STORE_PATH):
+    """
+    Reference population plus every application stored since, e.g. to rebuild the scoring
+    snapshot with scoring_snapshot.snapshot_from_frame.
+    """
+    applications = read_applications(store_path)
+    if applications.empty:
+        return reference
+    return pd.concat([reference, applications], axis=0, ignore_index=True)
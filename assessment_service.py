@@ -0,0 +1,340 @@
+import os
+import time
+import asyncio
+import math
+import itertools
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from datetime import datetime
+from fastapi import FastAPI, Request
+from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
+import uvicorn
+import pandas as pd
+from dotenv import load_dotenv
+from scoring_snapshot import load_snapshot, score_applicant
+from batch_scoring import top_drivers
+from ticker_index import load_index, resolve_ticker
+from financials_store import get_store
+from ml_rule import fetch_financial_data_from_excel
+
+load_dotenv()
+
+HOST = os.environ.get("ASSESSMENT_HOST", "localhost")
+PORT = int(os.environ.get("ASSESSMENT_PORT", 5000))  # homepage.tsx calls http://localhost:5000
+# Canned LLM responses instead of Azure, for local runs and load_test.py
+FAKE_LLM = os.environ.get("ASSESSMENT_FAKE_LLM") == "1"
+FAKE_LLM_DELAY = float(os.environ.get("ASSESSMENT_FAKE_LLM_DELAY", 0.05))
+# Assessments are kept in memory; the least recently used beyond the cap, or unused for the TTL, are dropped
+MAX_ASSESSMENTS = int(os.environ.get("ASSESSMENT_MAX", 10_000))
+ASSESSMENT_TTL = float(os.environ.get("ASSESSMENT_TTL_HOURS", 24)) * 3600
+
+
+class AgentBackend:
+    """
+    LLM steps of agentic.py. Importing agentic builds the Azure client, the agents and opens the
+    Chroma knowledge base once, so every request reuses them.
+    """
+
+    def __init__(self):
+        import agentic
+        self.agentic = agentic
+
+    async def narrative(self, query):
+        response = await self.agentic.risk_analysis_narrative_agent.arun(query)
+        return response.content
+
+    async def score(self, narrative, application):
+        # ml_model reads the application from a context variable, so concurrent requests don't mix
+        self.agentic.current_application.set(application)
+        response = await self.agentic.risk_calculation_narrative_agent.arun(narrative)
+        return float(response.content.score)
+
+    async def structure_feedback(self, text):
+        return await asyncio.to_thread(self.agentic.feedback_agent.process_feedback_narrative, text)
+
+    async def credit_note(self, narrative, query, loan_details, feedback, regenerate=False):
+        return await asyncio.to_thread(self.agentic.credit_note_agent.generate_credit_note,
+                                       narrative, query, loan_details, feedback, regenerate)
+
+
+class FakeBackend:
+    """
+    Stand-in for AgentBackend with fixed latency, so the service can be run and load tested without Azure.
+    """
+
+    async def narrative(self, query):
+        await asyncio.sleep(FAKE_LLM_DELAY)
+        return f"1. financial performance\n\nNarrative for: {query}"
+
+    async def score(self, narrative, application):
+        await asyncio.sleep(FAKE_LLM_DELAY)
+        return round(score_applicant(application)["Final Risk Score"], 2)
+
+    async def structure_feedback(self, text):
+        await asyncio.sleep(FAKE_LLM_DELAY)
+        return f"1. Other specific areas for improvement: {text}"
+
+    async def credit_note(self, narrative, query, loan_details, feedback, regenerate=False):
+        await asyncio.sleep(FAKE_LLM_DELAY)
+        return f"# CREDIT NOTE\n\n## Company: {query}\n## Credit Amount: {loan_details.get('amount')}"
+
+
+backend = None
+# Assessment id -> assessment, least recently used first
+assessments = OrderedDict()
+_ids = itertools.count(1)
+
+
+class ApiError(Exception):
+    def __init__(self, status, message):
+        self.status = status
+        self.message = message
+
+
+@asynccontextmanager
+async def warm_state(app):
+    """
+    Load everything the requests need once: LLM clients and vector store, scoring snapshot,
+    ticker index and the financials store (with its reload watcher).
+    """
+    global backend
+    backend = FakeBackend() if FAKE_LLM else await asyncio.to_thread(AgentBackend)
+    await asyncio.to_thread(load_snapshot)
+    await asyncio.to_thread(load_index)
+    store = await asyncio.to_thread(get_store, watch=True)
+    yield
+    store.stop_watcher()
+
+
+app = FastAPI(title="Credit assessment service", lifespan=warm_state)
+app.add_middleware(CORSMiddleware, allow_origins=["*"], allow_methods=["*"], allow_headers=["*"])
+
+
+@app.exception_handler(ApiError)
+async def api_error_handler(request, exc):
+    # The frontend reads errorData.error
+    return JSONResponse(status_code=exc.status, content={"error": exc.message})
+
+
+def _expire_assessments():
+    cutoff = time.monotonic() - ASSESSMENT_TTL
+    while assessments:
+        oldest = next(iter(assessments.values()))
+        if len(assessments) <= MAX_ASSESSMENTS and oldest["last_used"] >= cutoff:
+            break
+        assessments.popitem(last=False)
+
+
+def _get_assessment(assessment_id):
+    _expire_assessments()
+    assessment = assessments.get(assessment_id)
+    if assessment is None:
+        raise ApiError(404, f"Assessment {assessment_id} not found")
+    assessment["last_used"] = time.monotonic()
+    assessments.move_to_end(assessment_id)
+    return assessment
+
+
+def _positive_number(value):
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return None
+    return value if math.isfinite(value) and value > 0 else None
+
+
+def _validate_loan_details(loan_details):
+    """
+    Check the loan details the credit note needs, so a bad request fails here with a 400 rather
+    than later in generate_credit_note. Returns the loan amount.
+    """
+    if not isinstance(loan_details, dict):
+        raise ApiError(400, "loanDetails must be an object with amount, term and purpose")
+    amount = _positive_number(loan_details.get("amount"))
+    if amount is None:
+        raise ApiError(400, "loanDetails.amount must be a positive number")
+    if _positive_number(loan_details.get("term")) is None:
+        raise ApiError(400, "loanDetails.term must be a positive number of months")
+    purpose = loan_details.get("purpose")
+    if not isinstance(purpose, str) or not purpose.strip():
+        raise ApiError(400, "loanDetails.purpose is required")
+    return amount
+
+
+def _retrieve_exception(task):
+    # A job whose result is never asked for (feedback without a /narrative call) would otherwise log
+    # "Task exception was never retrieved" when it fails; whoever awaits it still gets the exception
+    if not task.cancelled():
+        task.exception()
+
+
+def _start_job(assessment, name, coro):
+    """
+    Run a slow LLM step as a background task; a request for its result just awaits the task.
+    """
+    task = asyncio.create_task(coro)
+    task.add_done_callback(_retrieve_exception)
+    assessment["jobs"][name] = task
+    return task
+
+
+async def _generate_narrative(assessment):
+    query = assessment["query"]
+    if assessment["structured_feedback"]:
+        query = query + " " + " ".join(assessment["structured_feedback"])
+    narrative = await backend.narrative(query)
+    score = await backend.score(narrative, assessment["application"])
+    assessment.update(narrative=narrative, score=score, updated_at=datetime.now().isoformat(timespec="seconds"))
+    return assessment
+
+
+def _assessment_response(assessment):
+    return {
+        "assessmentId": assessment["id"],
+        "score": assessment["score"],
+        "mlScore": assessment["ml_score"],
+        "drivers": assessment["drivers"],
+        "riskNarrative": assessment["narrative"],
+        "narrative": assessment["narrative"],
+        "companyName": assessment["company"],
+        "loanDetails": assessment["loan_details"],
+        "feedbackCount": len(assessment["feedback"]),
+    }
+
+
+@app.post("/api/assessments")
+async def create_assessment(request: Request):
+    """
+    Body: {"companyName", "loanDetails": {"amount", "term", "purpose"}, "collateralValue", "creditScore"}.
+    Scores the application right away and drafts the narrative.
+    """
+    body = await request.json()
+    company = body.get("companyName")
+    loan_details = body.get("loanDetails") or {}
+    if not company:
+        raise ApiError(400, "companyName is required")
+    amount = _validate_loan_details(loan_details)
+
+    ticker = await asyncio.to_thread(resolve_ticker, company)
+    if not ticker:
+        raise ApiError(404, f"Ticker not found for company: {company}")
+    application = await asyncio.to_thread(fetch_financial_data_from_excel, ticker, amount,
+                                          body.get("collateralValue"), body.get("creditScore"))
+    if not application:
+        raise ApiError(404, f"No financials found for {ticker}")
+
+    scores = score_applicant(application, explain=True)
+    drivers = top_drivers(pd.DataFrame([scores["Contributions"]]), k=3)[0]
+    assessment = {
+        "id": next(_ids),
+        "company": company,
+        "ticker": ticker,
+        "query": f"Generate me a credit note for a corporate loan for {company}",
+        "loan_details": loan_details,
+        "application": application,
+        "ml_score": round(scores["Final Risk Score"], 2),
+        "drivers": [feature for feature, _ in drivers],
+        "score": None,
+        "narrative": None,
+        "feedback": [],
+        "structured_feedback": [],
+        "credit_note": None,
+        "jobs": {},
+        # Narrative job whose result has already been returned to the client
+        "served": None,
+        "last_used": time.monotonic(),
+    }
+    assessments[assessment["id"]] = assessment
+    _expire_assessments()
+
+    task = _start_job(assessment, "narrative", _generate_narrative(assessment))
+    if not body.get("wait", True):
+        # Poll GET /api/assessments/{id} or call /narrative to wait for the result
+        return JSONResponse(status_code=202, content=_assessment_response(assessment))
+    try:
+        await task
+    except Exception as e:
+        raise ApiError(502, f"Narrative generation failed: {e}")
+    assessment["served"] = task
+    return _assessment_response(assessment)
+
+
+@app.get("/api/assessments/{assessment_id}")
+async def get_assessment(assessment_id: int):
+    assessment = _get_assessment(assessment_id)
+    response = _assessment_response(assessment)
+    response["jobs"] = {name: "done" if task.done() else "running" for name, task in assessment["jobs"].items()}
+    return response
+
+
+@app.post("/api/assessments/{assessment_id}/feedback")
+async def submit_feedback(assessment_id: int, request: Request):
+    """
+    Body: {"text"}. Structuring the feedback and regenerating the narrative start in the
+    background right away, so the /narrative call that follows only waits for what is left.
+    """
+    assessment = _get_assessment(assessment_id)
+    text = (await request.json()).get("text", "").strip()
+    if not text:
+        raise ApiError(400, "Feedback text is required")
+    assessment["feedback"].append(text)
+
+    # Captured before the new job replaces it in assessment["jobs"]
+    previous = assessment["jobs"].get("narrative")
+
+    async def regenerate():
+        if previous is not None:
+            # Its failure is reported on its own request; this job regenerates regardless
+            await asyncio.gather(previous, return_exceptions=True)
+        assessment["structured_feedback"].append(await backend.structure_feedback(text))
+        return await _generate_narrative(assessment)
+
+    _start_job(assessment, "narrative", regenerate())
+    return {"status": "accepted", "feedbackCount": len(assessment["feedback"])}
+
+
+@app.post("/api/assessments/{assessment_id}/narrative")
+async def regenerate_narrative(assessment_id: int):
+    assessment = _get_assessment(assessment_id)
+    # Return the pending (e.g. feedback triggered) job, or regenerate if its result was already served
+    task = assessment["jobs"].get("narrative")
+    if task is None or task is assessment["served"]:
+        task = _start_job(assessment, "narrative", _generate_narrative(assessment))
+    try:
+        await task
+    except Exception as e:
+        raise ApiError(502, f"Narrative generation failed: {e}")
+    assessment["served"] = task
+    return {"score": assessment["score"], "narrative": assessment["narrative"],
+            "feedbackCount": len(assessment["feedback"])}
+
+
+@app.post("/api/assessments/{assessment_id}/credit-note")
+async def generate_credit_note(assessment_id: int):
+    assessment = _get_assessment(assessment_id)
+    task = assessment["jobs"].get("narrative")
+    try:
+        if task is not None:
+            await task
+    except Exception as e:
+        raise ApiError(502, f"Narrative generation failed: {e}")
+
+    try:
+        # Asking again for a note means the previous one was rejected, so it isn't served from the cache
+        assessment["credit_note"] = await backend.credit_note(assessment["narrative"], assessment["query"],
+                                                              assessment["loan_details"], assessment["structured_feedback"],
+                                                              regenerate=assessment["credit_note"] is not None)
+    except Exception as e:
+        raise ApiError(502, f"Credit note generation failed: {e}")
+    return {"credit_note": assessment["credit_note"], "company": assessment["company"],
+            "loan_details": assessment["loan_details"]}
+
+
+@app.get("/api/health")
+async def health():
+    return {"status": "ok", "assessments": len(assessments), "financials": len(get_store())}
+
+
+if __name__ == "__main__":
+    uvicorn.run(app, host=HOST, port=PORT)
@@ -2,36 +2,25 @@ import os
 import json
 import pandas as pd
 from dotenv import load_dotenv
-from openai import AzureOpenAI
 import warnings
 import re
+import argparse
+from llm_engine import generate
+from shard_runner import generate_sharded, row_journals, row_keys
+from row_validation import validate_and_regenerate
 
 warnings.filterwarnings("ignore")
 load_dotenv()
 
-# 1) Azure OpenAI client setup
-client = AzureOpenAI(
-    azure_endpoint   = os.environ["AZURE_OPENAI_ENDPOINT"],
-    azure_deployment = os.environ["AZURE_OPENAI_DEPLOYMENT"],
-    api_key          = os.environ["AZURE_OPENAI_API_KEY"],
-    api_version      = os.environ["API_VERSION_GA"],
-)
-print("✅ AzureOpenAI client initialized")
+# 1) Azure OpenAI: requests go through the shared async engine (llm_engine.py), many in flight at once
 
 # 2) Paths
 INPUT_PATH  = "output/Company_Financials_Cleaned.xlsx"
 OUTPUT_PATH = "output/Company_Financials_Synthetic_First100.xlsx"  # Changed output filename for 100 companies
+FULL_OUTPUT_PATH = "output/Company_Financials_Synthetic.xlsx"  # --rows 0: the whole dataset
+JOURNAL_PATH = "output/journals/azure.jsonl"  # finished rows, kept across runs
 
-# 3) Load first 100 rows
-df_full = pd.read_excel(INPUT_PATH)
-df100   = df_full.iloc[:100].reset_index(drop=True)  # Changed to 100 rows
-print("\n=== INPUT (first 100 rows) ===")
-print(df100)
-
-# 4) Prepare features
-features = df100.drop(columns=["Company","Industry","Sector","Financial Year"], errors="ignore")
-
-# 5) JSON parser
+# 3) JSON parser
 def parse_json_response(text: str):
     txt = text.strip().strip("```")
     try:
@@ -40,7 +29,7 @@ def parse_json_response(text: str):
         m = re.search(r"\{.*\}", txt, re.DOTALL)
         return json.loads(m.group(0)) if m else None
 
-# 6) Your exact prompt template (braces escaped)
+# 4) Your exact prompt template (braces escaped)
 prompt_template = """
 You are a financial risk expert responsible for evaluating a company's loan risk based on their financial data. Your task is to generate a "Risk Score" that ranges from 0 to 100, where:
 
@@ -148,8 +137,11 @@ You are a financial risk expert responsible for evaluating a company's loan risk
     2. **Medium Impact Features**: **Current Assets**, **Total Assets**, **Net Profit Margin**, **Return on Equity**, **Return on Assets**.
     3. **Low Impact Features**: **Current Ratio**, **Interest Expense**, **Debt Equity Ratio**, **Debt To Asset Ratio**, **Interest Coverage Ratio**.
     
+    ### Company Financials:
+    {financials}
+
     ### Final Instructions:
-    Generate the loan and risk details based on these features. 
+    Generate the loan and risk details for this company based on these features. 
     The loan value should be realistic (₹10,00,000 to ₹50 Crore), 
     collateral should be at realistic (₹10,00,000 to ₹55 Crore), 
     loan tenure should be between 6 to 240 months.
@@ -169,51 +161,63 @@ You are a financial risk expert responsible for evaluating a company's loan risk
     }}
 """
 
-# 7) LLM call
-def generate_synthetic(fin_dict):
+# 5) LLM request for one row
+def build_messages(fin_dict):
     fin_json = json.dumps(fin_dict, indent=2)
     prompt = prompt_template.format(financials=fin_json)
-    print(f"\n--- Prompt for row ---\n{prompt}")
-    resp = client.chat.completions.create(
-        model    = os.environ["AZURE_OPENAI_DEPLOYMENT"],
-        messages = [
-            {"role":"system", "content":"You generate synthetic loan & risk data."},
-            {"role":"user",   "content":prompt}
-        ],
-        temperature=0.6,
-        max_tokens = 800
-    )
-    raw = resp.choices[0].message.content
-    print(f"[Raw response]\n{raw}")
-    parsed = parse_json_response(raw)
-    print(f"[Parsed JSON]\n{parsed}")
-    return parsed
-
-# 8) Loop & collect
-synthetic_rows = []
-for idx, row in features.iterrows():
-    print(f"\n>>> Processing row {idx}")
-    res = generate_synthetic(row.to_dict())
-    if not res:
-        print(f"⚠️ Row {idx} failed.")
-        res = {
-            "Loan Value": None,
-            "Collateral Value": None,
-            "Loan Tenure (Months)": None,
-            "Loan to Collateral Ratio": None,
-            "Credit Score": None,
-            "Risk Score": None,
-            "Explanation": "Generation failed.",
-            "Feature Impact Weightage": {}
-        }
-    synthetic_rows.append(res)
-
-# 9) Merge & save
-syn_df = pd.DataFrame(synthetic_rows)
-final = pd.concat([df100, syn_df], axis=1)
-print("\n=== FINAL MERGED DF ===")
-print(final)
-
-os.makedirs(os.path.dirname(OUTPUT_PATH), exist_ok=True)
-final.to_excel(OUTPUT_PATH, index=False)
-print(f"\n✅ Saved output to {OUTPUT_PATH}")
+    return [
+        {"role":"system", "content":"You generate synthetic loan & risk data."},
+        {"role":"user",   "content":prompt}
+    ]
+
+# Generated columns of every row (empty where a row failed)
+SYNTHETIC_COLUMNS = ["Loan Value", "Collateral Value", "Loan Tenure (Months)", "Loan to Collateral Ratio",
+                     "Credit Score", "Risk Score", "Explanation"]
+
+def synthetic_frame(results):
+    frame = pd.DataFrame([res if isinstance(res, dict) else {} for res in results])
+    return frame.reindex(columns=list(dict.fromkeys(SYNTHETIC_COLUMNS + list(frame.columns))))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate synthetic loan and risk columns")
+    parser.add_argument("--rows", type=int, default=100, help="First N rows of the dataset, 0 for all")
+    parser.add_argument("--shards", type=int, default=1, help="Worker processes, each with a slice of the quota")
+    args = parser.parse_args()
+    output_path = OUTPUT_PATH if args.rows else FULL_OUTPUT_PATH
+
+    # 6) Load rows
+    df_full = pd.read_excel(INPUT_PATH)
+    df_rows = (df_full.iloc[:args.rows] if args.rows else df_full).reset_index(drop=True)
+    print(f"\n=== INPUT ({len(df_rows)} rows) ===")
+    print(df_rows)
+
+    # 7) Prepare features
+    features = df_rows.drop(columns=["Company","Industry","Sector","Financial Year"], errors="ignore")
+
+    # 8) Generate all rows concurrently & collect (results come back in row order);
+    #    each finished row is journaled at once, so a rerun after a crash resumes where it stopped.
+    #    With --shards the rows are split by company and year across worker processes.
+    requests = [build_messages(row.to_dict()) for _, row in features.iterrows()]
+    if args.shards > 1:
+        results = generate_sharded(requests, row_keys(df_rows), JOURNAL_PATH, args.shards, parse=parse_json_response,
+                                   temperature=0.6, max_tokens=800)
+    else:
+        results = generate(requests, journal=JOURNAL_PATH, parse=parse_json_response, temperature=0.6, max_tokens=800)
+
+    # 9) Check ranges, LtC and types of all rows in one pass; only the rows that fail (or got no
+    #    answer) are requested again, one call each
+    # Regenerated rows are journaled like the first pass (into their shard's journal with --shards)
+    journals = JOURNAL_PATH if args.shards == 1 else row_journals(row_keys(df_rows), JOURNAL_PATH, args.shards)
+    syn_df, failures = validate_and_regenerate(requests, results, synthetic_frame, parse_json_response,
+                                               journal=journals,
+                                               temperature=0.6, max_tokens=800)
+    syn_df.loc[failures.index, "Explanation"] = "Generation failed: " + failures
+
+    # 10) Merge & save
+    final = pd.concat([df_rows, syn_df], axis=1)
+    print("\n=== FINAL MERGED DF ===")
+    print(final)
+
+    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    final.to_excel(output_path, index=False)
+    print(f"\n✅ Saved output to {output_path}")
@@ -1,52 +1,40 @@
-import os
-import json
 import pandas as pd
 from dotenv import load_dotenv
-from openai import AzureOpenAI
+from row_batcher import RowBatcher, LOAN_FIELDS
 import warnings
-import re
-import io
-from io import StringIO
+import argparse
 
 warnings.filterwarnings("ignore")
 load_dotenv()
 
+parser = argparse.ArgumentParser(description="Generate synthetic loan and risk columns")
+parser.add_argument("--rows", type=int, default=100, help="First N rows of the dataset, 0 for all")
+args = parser.parse_args()
 
-# 1) Azure OpenAI client setup
-client = AzureOpenAI(
-    azure_endpoint   = os.environ["AZURE_OPENAI_ENDPOINT"],
-    azure_deployment = os.environ["AZURE_OPENAI_DEPLOYMENT"],
-    api_key          = os.environ["AZURE_OPENAI_API_KEY"],
-    api_version      = os.environ["API_VERSION_GA"],
-)
-print(" AzureOpenAI client initialized")
 
-# 2) Paths
+# 1) Paths
 INPUT_PATH  = "output/Company_Financials_Cleaned.xlsx"
 OUTPUT_PATH = "output/Company_Financials_Synthetic_First5.xlsx"
+if not args.rows:
+    OUTPUT_PATH = "output/Company_Financials_Synthetic.xlsx"
 
-# 3) Load first 5 rows
+# 2) Load the first --rows rows (all with --rows 0)
 df_full = pd.read_excel(INPUT_PATH)
-df5     = df_full.iloc[:100].reset_index(drop=True)
+df5     = (df_full.iloc[:args.rows] if args.rows else df_full).reset_index(drop=True)
 print("\n=== INPUT (first 5 rows) ===")
 print(df5)
 
-# 4) Prepare features
-new_columns = ["Loan Value", "Collateral Value", "Loan Tenure", "Credit Score", "Risk Score"]
-for col in new_columns:
-    df5[col] = pd.NA
+# 3) Prepare features
+new_columns = list(LOAN_FIELDS)
 features = df5.drop(columns=["Company","Industry","Sector","Financial Year","Net Income Continuous Operations", 
                              "Total Revenue", "Stockholders Equity", "Total Assets", "Current Assets", 
                              "Current Liabilities", "Inventory", "Total Debt","Interest Expense","EBIT"], errors="ignore")
 
 print(features)
 
-str_df = features.to_string()
 
-
-
-# 6) Prompt
-prompt_template = f"""
+# 4) Prompt
+prompt_template = """
 You are a financial risk expert responsible for evaluating a company's loan risk based on their financial data. Your task is to generate a "Risk Score" that ranges from 0 to 100, where:
 
     - A Risk Score of 0 represents **minimum risk** and indicates a financially stable company.
@@ -111,66 +99,24 @@ You are a financial risk expert responsible for evaluating a company's loan risk
     loan tenure should be realistic (6 to 240 months)
     credit score to be realistic between (300 to 900)
     
-    Can you fill in the blanks for the required columns by introducing variations in the values. 
-    Please fill the blank values in this dataframe: {str_df}
+    Can you fill in the required columns for every row by introducing variations in the values. 
 
     There should be variation in data. For Example, 
     where the colalteral value is greter than the loan value, the risk score will be 0-10 and vice versa
     if the loan amount is very less than the Total Revenue and Total Assest - risk score will be 0-10 and vice versa
     So give data simiar to these use cases across the features and range.
 
-    Separate the column names by '|'  
     dont give additional commentary, only give the columns and the numerical values
-    create a table with columns and their respective values that can be saved in a csv file.
    
-""".format(str_df=str_df)
-
-resp = client.chat.completions.create(
-        model    = os.environ["AZURE_OPENAI_DEPLOYMENT"],
-        messages = [
-            {"role":"system", "content":"You generate synthetic loan & risk data."},
-            {"role":"user",   "content":prompt_template}
-        ],
-        temperature=0.6,
-        max_tokens = 800
-    )
-raw = resp.choices[0].message.content
-print(f"[Raw response]\n{raw}")
-
-cols=list(features.columns)
-def string_to_dataframe(raw, delimiter='|', names=cols):
-
-    """
-
-    Converts a string to a Pandas DataFrame.
- 
-    Args:
-
-        data_string (str): The string data.
+"""
 
-        delimiter (str, optional): The delimiter separating values. Defaults to '|'.
+# 5) Generate the columns for all rows in token-budget sized batches (see row_batcher.py)
+batcher = RowBatcher(prompt_template, LOAN_FIELDS, system="You generate synthetic loan & risk data.")
+df_synthetic = batcher.run(features, temperature=0.6)
+print(f"{len(features)} rows in {batcher.stats['requests']} requests, "
+      f"{batcher.stats['resliced']} re-requested, {batcher.stats['failed']} without a valid answer")
 
-        header (list, optional): List of column names. If None, it infers from the first row or assigns default integer indices.
- 
-    Returns:
-
-        pd.DataFrame: The resulting DataFrame.
-
-    """
-
-    data = io.StringIO(raw)
-    print(data)
-    print(list(features.columns))
-   
-    df = pd.read_csv(data,names=cols)
-
-    return df
-    
-# 9) Convert synthetic data to DataFrame using string_to_dataframe function
-df_synthetic = string_to_dataframe(raw)  
- 
-# Save updated dataframe to Excel
-df_synthetic.to_excel(OUTPUT_PATH, index=False)  # Saving the DataFrame to Excel
+# 6) Save the rows with the synthetic columns to Excel
+df5 = df5.assign(**df_synthetic[new_columns])
+df5.to_excel(OUTPUT_PATH, index=False)
 print(f"Output saved to {OUTPUT_PATH}")
- 
-
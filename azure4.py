@@ -1,56 +1,39 @@
-import os
-import json
 import pandas as pd
 from dotenv import load_dotenv
-from openai import AzureOpenAI
+from row_batcher import RowBatcher, LOAN_FIELDS
 import warnings
-import re
-import time
-import io
-from io import StringIO
-from langchain.prompts import PromptTemplate
+import argparse
  
 warnings.filterwarnings("ignore")
 load_dotenv()
+
+parser = argparse.ArgumentParser(description="Generate synthetic loan and risk columns")
+parser.add_argument("--rows", type=int, default=100, help="First N rows of the dataset, 0 for all")
+args = parser.parse_args()
  
-# 1) Azure OpenAI client setup
-client = AzureOpenAI(
-    azure_endpoint=os.environ["AZURE_OPENAI_ENDPOINT"],
-    azure_deployment=os.environ["AZURE_OPENAI_DEPLOYMENT"],
-    api_key=os.environ["AZURE_OPENAI_API_KEY"],
-    api_version=os.environ["API_VERSION_GA"],
-)
-print("AzureOpenAI client initialized")
- 
-# 2) Paths
+# 1) Paths
 INPUT_PATH = "output/Company_Financials_Cleaned.xlsx"
-OUTPUT_PATH = "output/Company_Financials_Synthetic_First100"
+OUTPUT_PATH = "output/Company_Financials_Synthetic_First100.xlsx"
+if not args.rows:
+    OUTPUT_PATH = "output/Company_Financials_Synthetic.xlsx"
  
-# 3) Load first 100 rows
+# 2) Load the first --rows rows (all with --rows 0)
 df_full = pd.read_excel(INPUT_PATH)
-df_batch = df_full.iloc[:100].reset_index(drop=True)
+df_batch = (df_full.iloc[:args.rows] if args.rows else df_full).reset_index(drop=True)
 print("\n=== INPUT (first 5 rows) ===")
 print(df_batch.head())
  
-# 4) Add synthetic columns with placeholders
-new_columns = ["Loan Value", "Collateral Value", "Loan Tenure", "Credit Score", "Risk Score"]
-for col in new_columns:
-    df_batch[col] = pd.NA
+# 3) Synthetic columns to generate, with their valid ranges
+new_columns = list(LOAN_FIELDS)
  
-# 5) Features passed to LLM (without dropped columns)
+# 4) Features passed to LLM (without dropped columns)
 features = df_batch.drop(columns=["Company", "Industry", "Sector", "Financial Year",
                                   "Net Income Continuous Operations", "Total Revenue",
                                   "Stockholders Equity", "Total Assets", "Current Assets",
                                   "Current Liabilities", "Inventory", "Total Debt",
                                   "Interest Expense", "EBIT"], errors="ignore")
-
-features_50 = features.iloc[0:50] 
-features_100 = features.iloc[50:100] 
-print()
-#list_df = [features_50,features_100]
-#str_df = features.to_string(index=False)
  
-# 6) Prompt for LLM
+# 5) Prompt for LLM
 prompt_template = """
 You are a financial risk expert responsible for evaluating a company's loan risk based on their financial data. Your task is to generate a "Risk Score" that ranges from 0 to 100, where:
 
@@ -123,56 +106,22 @@ You are a financial risk expert responsible for evaluating a company's loan risk
     So give data simiar to these use cases across the features and range.
  
 ### Instructions:
-- Output only the new columns in the same order: Loan Value | Collateral Value | Loan Tenure | Credit Score | Risk Score
-- Use ‘|’ as the separator.
+- For every row id, output only the new columns: Loan Value, Collateral Value, Loan Tenure, Credit Score, Risk Score
 - Do not repeat values across rows.
-- No additional explanation or commentary. Just the data table.
-- understand the range, there are multiple batches, remember what output you have given to previous and try not to give same output.
-Example Format:
-Loan Value|Collateral Value|Loan Tenure|Credit Score|Risk Score
-50000000|70000000|120|850|8
-70000000|50000000|60|400|90
-...
- 
-Here is the dataset for which you must generate the above synthetic columns:
-{str_df}
+- No additional explanation or commentary.
 """
  
-# 7) Call Azure OpenAI
-list_df = [features_50,features_100]
-#str_df = features.to_string(index=False)
-i = 0
-for single_df in list_df:
-    str_df = single_df.to_string(index=False)
-    temp_prompt=PromptTemplate(input_variables=["str_df"],template =prompt_template)
-    final_prompt = temp_prompt.format(str_df=str_df)
-    resp = client.chat.completions.create(
-        model=os.environ["AZURE_OPENAI_DEPLOYMENT"],
-        messages=[
-            {"role": "system", "content": "You generate synthetic loan and risk data."},
-            {"role": "user", "content": final_prompt}
-        ],
-        temperature=0.6,
-        max_tokens=2500  # You may increase this if needed
-    )
-    raw = resp.choices[0].message.content.strip()
-    print(f"[Raw response]\n{raw[:1000]}...")  # Preview first 1000 characters
- 
-    # 8) Convert raw LLM output to DataFrame
-    def string_to_dataframe(raw_string, delimiter='|'):
-        data = io.StringIO(raw_string)
-        df = pd.read_csv(data, delimiter=delimiter)
-        df.columns = [col.strip().title() for col in df.columns]
-        return df
+# 6) Generate the columns for all rows, packing as many rows per request as the token budget
+#    allows; rows missing or invalid in an answer are re-requested in smaller batches
+batcher = RowBatcher(prompt_template, LOAN_FIELDS)
+df_synthetic = batcher.run(features, temperature=0.6)
+print(f"{len(features)} rows in {batcher.stats['requests']} requests, "
+      f"{batcher.stats['resliced']} re-requested, {batcher.stats['failed']} without a valid answer")
  
-    df_synthetic = string_to_dataframe(raw)
+# 7) Merge synthetic values back
+for col in new_columns:
+    df_batch[col] = df_synthetic[col]
  
-    # 9) Merge synthetic values back
-    for col in new_columns:
-        df_batch[col] = df_synthetic[col].astype(str).str.replace(",", "").astype(float)
-    
-    # 10) Save to Excel
-    i+=1
-    df_batch.to_excel(OUTPUT_PATH+str(i)+'.xlsx', index=False)
-    print(f"Output saved to {OUTPUT_PATH}")
-    time.sleep(5)
\ No newline at end of file
+# 8) Save to Excel
+df_batch.to_excel(OUTPUT_PATH, index=False)
+print(f"Output saved to {OUTPUT_PATH}")
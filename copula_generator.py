@@ -0,0 +1,314 @@
+import os
+import json
+import time
+import argparse
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from scipy.special import ndtr, ndtri
+from row_batcher import LOAN_FIELDS
+
+# LLM-labelled rows written by azure.py / loop.py (whichever exist)
+TRAINING_PATHS = ["output/Company_Financials_Synthetic_First100.xlsx", "output/Company_Financials_Synthetic.xlsx"]
+MODEL_PATH = "output/copula_model.json"
+MODEL_FORMAT = 1
+SAMPLE_PATH = "output/synthetic_applications.parquet"
+REPORT_PATH = "output/copula_report.xlsx"
+
+RATIO_COLUMNS = ["Net Profit Margin %", "Return on Equity %", "Return on Assets %", "Current Ratio",
+                 "Asset Turnover Ratio", "Debt Equity Ratio", "Debt To Asset Ratio", "Interest Coverage Ratio"]
+# Same ranges the generator prompts ask for
+LABEL_RANGES = LOAN_FIELDS
+LABEL_COLUMNS = list(LABEL_RANGES)
+INTEGER_COLUMNS = ["Loan Tenure", "Credit Score"]
+COLUMN_ALIASES = {"Loan Tenure (Months)": "Loan Tenure"}
+
+# Marginals are stored as values at evenly spaced normal scores, so mapping a score to a value is
+# index arithmetic rather than a search
+Z_GRID = np.linspace(-5, 5, 2001)
+CHUNK_ROWS = 1_000_000
+# Synthetic rows compared against the training rows in the report
+REPORT_SAMPLE = 200_000
+
+
+def load_training(paths=None):
+    """
+    LLM-labelled rows with all ratios and valid labels, from the generators' output files.
+    """
+    frames = []
+    for path in paths or TRAINING_PATHS:
+        if os.path.exists(path):
+            frames.append(pd.read_excel(path).rename(columns=COLUMN_ALIASES))
+    if not frames:
+        raise FileNotFoundError(f"No labelled rows found in {paths or TRAINING_PATHS}; "
+                                "run azure.py or loop.py first")
+    data = pd.concat(frames, ignore_index=True)
+    keys = [col for col in ["Company", "Financial Year"] if col in data.columns]
+    data = data.drop_duplicates(subset=keys or None)
+    columns = RATIO_COLUMNS + LABEL_COLUMNS
+    data = data[columns].apply(pd.to_numeric, errors="coerce").dropna()
+    valid = np.ones(len(data), dtype=bool)
+    for column, (low, high) in LABEL_RANGES.items():
+        valid &= data[column].between(low, high).to_numpy()
+    return data[valid].reset_index(drop=True)
+
+
+def _nearest_correlation(matrix):
+    # Clip negative eigenvalues and rescale to a unit diagonal, so the matrix is a valid correlation
+    matrix = np.nan_to_num((matrix + matrix.T) / 2)
+    np.fill_diagonal(matrix, 1.0)
+    values, vectors = np.linalg.eigh(matrix)
+    matrix = vectors @ np.diag(np.clip(values, 1e-6, None)) @ vectors.T
+    scale = np.sqrt(np.diag(matrix))
+    return matrix / np.outer(scale, scale)
+
+
+def _positive_definite(matrix):
+    # Residual covariance of the labels; clip tiny negative eigenvalues from rounding
+    matrix = (matrix + matrix.T) / 2
+    values, vectors = np.linalg.eigh(matrix)
+    return vectors @ np.diag(np.clip(values, 1e-9, None)) @ vectors.T
+
+
+class CopulaGenerator:
+    """
+    Gaussian copula over the financial ratios and the LLM labels.
+
+    Each column keeps its own empirical distribution (values at the normal scores Z_GRID) and the
+    dependence between columns is the correlation of their normal scores. Labels for given ratios
+    come from the conditional normal of the label scores given the ratio scores, i.e. a linear
+    regression in score space plus the residual covariance; full applications are drawn from the
+    joint normal. Everything is a matrix product and a table lookup, so millions of rows take seconds.
+    """
+
+    def __init__(self, columns, value_grid, correlation, features=RATIO_COLUMNS, labels=LABEL_COLUMNS, n_train=0):
+        self.columns = list(columns)
+        self.value_grid = np.asarray(value_grid, dtype=float)
+        self.correlation = np.asarray(correlation, dtype=float)
+        self.features = [col for col in features if col in self.columns]
+        self.labels = [col for col in labels if col in self.columns]
+        self.n_train = n_train
+
+        x = [self.columns.index(col) for col in self.features]
+        y = [self.columns.index(col) for col in self.labels]
+        self.x, self.y = x, y
+        self.cholesky = np.linalg.cholesky(self.correlation)
+        r_xx = self.correlation[np.ix_(x, x)]
+        r_xy = self.correlation[np.ix_(x, y)]
+        self.coefficients = np.linalg.solve(r_xx, r_xy)  # label scores = feature scores @ coefficients + noise
+        residual = self.correlation[np.ix_(y, y)] - r_xy.T @ self.coefficients
+        self.residual_cholesky = np.linalg.cholesky(_positive_definite(residual))
+
+    @classmethod
+    def fit(cls, data, features=RATIO_COLUMNS, labels=LABEL_COLUMNS):
+        """
+        Fit the copula on labelled rows (see load_training).
+        """
+        columns = list(features) + list(labels)
+        values = data[columns].to_numpy(dtype=float)
+        n = len(values)
+        if n < len(columns) + 2:
+            raise ValueError(f"Need more than {len(columns) + 1} labelled rows to fit, got {n}")
+        scores = ndtri(data[columns].rank(method="average").to_numpy() / (n + 1))
+        correlation = _nearest_correlation(np.corrcoef(scores, rowvar=False))
+        value_grid = np.quantile(values, ndtr(Z_GRID), axis=0).T
+        return cls(columns, value_grid, correlation, features, labels, n)
+
+    def save(self, path=MODEL_PATH):
+        model = {
+            "format": MODEL_FORMAT, "columns": self.columns, "features": self.features, "labels": self.labels,
+            "n_train": self.n_train, "correlation": self.correlation.tolist(),
+            "value_grid": self.value_grid.tolist(),
+        }
+        folder = os.path.dirname(path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        with open(path + ".tmp", "w") as f:
+            json.dump(model, f)
+        os.replace(path + ".tmp", path)
+
+    @classmethod
+    def load(cls, path=MODEL_PATH):
+        with open(path) as f:
+            model = json.load(f)
+        if model.get("format") != MODEL_FORMAT:
+            raise ValueError(f"Unsupported model format {model.get('format')} in {path}")
+        return cls(model["columns"], model["value_grid"], model["correlation"], model["features"],
+                   model["labels"], model["n_train"])
+
+    def _to_values(self, scores, indices):
+        # Linear interpolation in value_grid, one column per row of scores, done in place
+        grid = self.value_grid[list(indices)]
+        step = (Z_GRID[-1] - Z_GRID[0]) / (len(Z_GRID) - 1)
+        np.clip(scores, Z_GRID[0], Z_GRID[-1] - 1e-9, out=scores)
+        scores -= Z_GRID[0]
+        scores /= step
+        lower = scores.astype(np.int64)
+        scores -= lower
+        lower += (np.arange(len(grid)) * len(Z_GRID))[:, None]  # flat index into the grid rows
+        low = grid.ravel()[lower]
+        scores *= grid.ravel()[lower + 1] - low
+        scores += low
+        return scores
+
+    def _to_scores(self, values, indices):
+        out = np.empty_like(values, dtype=float)
+        for j, i in enumerate(indices):
+            # Ties in the grid map to the middle of their score range
+            low = np.interp(values[:, j], self.value_grid[i], Z_GRID, left=Z_GRID[0], right=Z_GRID[-1])
+            high = -np.interp(-values[:, j], -self.value_grid[i][::-1], -Z_GRID[::-1], left=-Z_GRID[-1],
+                              right=-Z_GRID[0])
+            out[:, j] = (low + high) / 2
+        return np.nan_to_num(out)  # a missing ratio counts as the median
+
+    def _frame(self, values, columns):
+        frame = {}
+        for column, row in zip(columns, values):
+            if column in LABEL_RANGES:
+                np.clip(row, *LABEL_RANGES[column], out=row)
+            frame[column] = np.rint(row).astype(np.int64) if column in INTEGER_COLUMNS else row
+        return pd.DataFrame(frame, copy=False)
+
+    def sample(self, n, seed=None):
+        """
+        n synthetic applications: ratios and labels drawn jointly.
+        """
+        rng = np.random.default_rng(seed)
+        scores = self.cholesky @ rng.standard_normal((len(self.columns), n))
+        return self._frame(self._to_values(scores, range(len(self.columns))), self.columns)
+
+    def label(self, features, seed=None):
+        """
+        Labels for given rows of financial ratios, drawn from their conditional distribution.
+        Args:
+        - features (pd.DataFrame): Rows with the ratio columns (NaN allowed).
+        Returns:
+        - labels (pd.DataFrame): The label columns, indexed like features.
+        """
+        rng = np.random.default_rng(seed)
+        x_scores = self._to_scores(features[self.features].to_numpy(dtype=float), self.x)
+        noise = self.residual_cholesky @ rng.standard_normal((len(self.y), len(features)))
+        y_scores = (x_scores @ self.coefficients).T + noise
+        labels = self._frame(self._to_values(y_scores, self.y), self.labels)
+        labels.index = features.index
+        return labels
+
+    def stream(self, n, chunk_rows=CHUNK_ROWS, seed=None):
+        """
+        n synthetic applications in chunks of chunk_rows.
+        """
+        rng = np.random.default_rng(seed)
+        for start in range(0, n, chunk_rows):
+            yield self.sample(min(chunk_rows, n - start), seed=rng.integers(2**63))
+
+
+def _ks_statistic(a, b):
+    # Largest gap between the two empirical CDFs
+    a, b = np.sort(a), np.sort(b)
+    points = np.concatenate([a, b])
+    return float(np.max(np.abs(np.searchsorted(a, points, side="right") / len(a)
+                               - np.searchsorted(b, points, side="right") / len(b))))
+
+
+def compare(training, synthetic, columns=None):
+    """
+    Marginals and rank correlations of synthetic rows against the LLM-labelled training rows.
+    Returns:
+    - marginals (pd.DataFrame): Mean, std and 5/50/95% quantiles of both, plus the KS statistic,
+      per column.
+    - correlations (pd.DataFrame): Spearman correlation of synthetic minus training, per column pair.
+    """
+    columns = columns or [col for col in training.columns if col in synthetic.columns]
+    stats = []
+    for column in columns:
+        a = training[column].to_numpy(dtype=float)
+        b = synthetic[column].to_numpy(dtype=float)
+        stats.append({
+            "Column": column,
+            "Mean (LLM)": a.mean(), "Mean (copula)": b.mean(),
+            "Std (LLM)": a.std(), "Std (copula)": b.std(),
+            **{f"P{q} (LLM)": np.percentile(a, q) for q in (5, 50, 95)},
+            **{f"P{q} (copula)": np.percentile(b, q) for q in (5, 50, 95)},
+            "KS": _ks_statistic(a, b),
+        })
+    marginals = pd.DataFrame(stats).set_index("Column")
+    correlations = synthetic[columns].corr(method="spearman") - training[columns].corr(method="spearman")
+    return marginals, correlations
+
+
+def write_report(training, model, path=REPORT_PATH, n=REPORT_SAMPLE, seed=0):
+    """
+    Compare a sample of the fitted copula (joint, and labels conditioned on the training ratios)
+    with the training rows, print a summary and save the tables to Excel.
+    """
+    joint = model.sample(n, seed=seed)
+    conditional = training[model.features].join(model.label(training, seed=seed))
+    marginals, correlations = compare(training, joint, model.columns)
+    _, conditional_correlations = compare(training, conditional, model.columns)
+    labels = correlations.loc[model.labels]
+
+    print(f"Copula fitted on {model.n_train} labelled rows, compared with {n:,} sampled rows")
+    print(marginals[["Mean (LLM)", "Mean (copula)", "P50 (LLM)", "P50 (copula)", "KS"]].round(3).to_string())
+    print(f"Spearman correlation gap: max {np.abs(correlations.to_numpy()).max():.3f}, "
+          f"mean {np.abs(correlations.to_numpy()).mean():.3f}; labels given the training ratios: "
+          f"max {np.abs(conditional_correlations.loc[model.labels].to_numpy()).max():.3f}")
+
+    folder = os.path.dirname(path)
+    if folder:
+        os.makedirs(folder, exist_ok=True)
+    with pd.ExcelWriter(path) as writer:
+        marginals.to_excel(writer, sheet_name="Marginals")
+        correlations.to_excel(writer, sheet_name="Correlation gap")
+        conditional_correlations.to_excel(writer, sheet_name="Conditional gap")
+        labels.to_excel(writer, sheet_name="Label correlation gap")
+    print(f"Report saved to {path}")
+
+
+def write_sample(model, n, path=SAMPLE_PATH, seed=None):
+    """
+    Stream n synthetic applications to a Parquet file.
+    """
+    folder = os.path.dirname(path)
+    if folder:
+        os.makedirs(folder, exist_ok=True)
+    start = time.perf_counter()
+    writer = None
+    try:
+        for chunk in model.stream(n, seed=seed):
+            table = pa.Table.from_pandas(chunk, preserve_index=False)
+            writer = writer or pq.ParquetWriter(path, table.schema)
+            writer.write_table(table)
+    finally:
+        if writer is not None:
+            writer.close()
+    elapsed = time.perf_counter() - start
+    print(f"{n:,} synthetic applications written to {path} in {elapsed:.2f}s ({n / elapsed:,.0f} rows/s)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Synthetic applications from a copula fitted on the LLM labels")
+    parser.add_argument("--fit", action="store_true", help="Fit the copula on the LLM-labelled rows and report")
+    parser.add_argument("--train", nargs="+", default=None, help="Labelled files to fit on")
+    parser.add_argument("--rows", type=int, default=0, help="Synthetic applications to write")
+    parser.add_argument("--output", default=SAMPLE_PATH)
+    parser.add_argument("--label", metavar="PATH", help="Label the ratio rows of an Excel file")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    if args.fit:
+        training = load_training(args.train)
+        model = CopulaGenerator.fit(training)
+        model.save()
+        print(f"Model saved to {MODEL_PATH}")
+        write_report(training, model)
+    if args.rows:
+        write_sample(CopulaGenerator.load(), args.rows, args.output, args.seed)
+    if args.label:
+        rows = pd.read_excel(args.label)
+        start = time.perf_counter()
+        labelled = rows.join(CopulaGenerator.load().label(rows, seed=args.seed))
+        print(f"{len(rows):,} rows labelled in {time.perf_counter() - start:.2f}s")
+        output = os.path.splitext(args.label)[0] + "_copula_labels.xlsx"
+        labelled.to_excel(output, index=False)
+        print(f"Saved to {output}")
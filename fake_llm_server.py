@@ -0,0 +1,163 @@
+import os
+import re
+import json
+import time
+import random
+import asyncio
+import argparse
+from collections import deque
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+import uvicorn
+
+# Stand-in for the Azure OpenAI chat completions endpoint, for benchmarking the generators locally
+LATENCY = float(os.environ.get("FAKE_LLM_LATENCY", 0.5))  # seconds per request (to the first token)
+TOKEN_TIME = float(os.environ.get("FAKE_LLM_TOKEN_TIME", 0.002))  # seconds per generated token
+JITTER = float(os.environ.get("FAKE_LLM_JITTER", 0.2))  # +/- fraction of the latency
+# Quota per sliding window, like Azure's requests/tokens per minute (0 = unlimited)
+QUOTA_WINDOW = float(os.environ.get("FAKE_LLM_WINDOW", 10))
+REQUEST_QUOTA = int(os.environ.get("FAKE_LLM_REQUESTS", 0))
+TOKEN_QUOTA = int(os.environ.get("FAKE_LLM_TOKENS", 0))
+ERROR_RATE = float(os.environ.get("FAKE_LLM_ERROR_RATE", 0))  # share of requests failing (500, or a cut stream)
+DROP_RATE = float(os.environ.get("FAKE_LLM_DROP_RATE", 0))  # share of rows left out of a structured answer
+BAD_RATE = float(os.environ.get("FAKE_LLM_BAD_RATE", 0))  # share of rows answered with an out-of-range value
+
+_window = deque()  # (time, tokens) of admitted requests
+
+app = FastAPI(title="Fake OpenAI compatible server")
+
+SYNTHETIC_ROW = {
+    "Loan Value": 10000000,
+    "Collateral Value": 15000000,
+    "Loan Tenure (Months)": 120,
+    "Loan to Collateral Ratio": 0.666,
+    "Credit Score": 750,
+    "Risk Score": 20,
+    "Explanation": "Canned response from the fake server.",
+}
+
+
+def structured_reply(prompt, schema):
+    # One object per row id in the prompt, with the fields of the schema
+    fields = [name for name in schema["properties"]["rows"]["items"]["properties"] if name != "id"]
+    rows = []
+    for i in dict.fromkeys(int(i) for i in re.findall(r'"id": (\d+)', prompt)):
+        if random.random() < DROP_RATE:
+            continue
+        values = {name: next((v for k, v in SYNTHETIC_ROW.items() if k.startswith(name)), 1) for name in fields}
+        if random.random() < BAD_RATE and "Credit Score" in values:
+            values["Credit Score"] = 950
+        rows.append({"id": i, **values})
+    return json.dumps({"rows": rows})
+
+
+def fake_reply(prompt, response_format=None):
+    # Answer in the format the prompt asks for
+    if response_format and response_format.get("type") == "json_schema":
+        return structured_reply(prompt, response_format["json_schema"]["schema"])
+    bad = random.random() < BAD_RATE
+    if "pipe-separated" in prompt:
+        return "10000000 | 15000000 | 120 | 950 | 20" if bad else "10000000 | 15000000 | 120 | 750 | 20"
+    return json.dumps({**SYNTHETIC_ROW, "Credit Score": 950} if bad else SYNTHETIC_ROW)
+
+
+def admit(tokens):
+    """
+    Charge a request against the sliding window quota. Returns (admitted, headers).
+    """
+    now = time.monotonic()
+    while _window and _window[0][0] <= now - QUOTA_WINDOW:
+        _window.popleft()
+    used_tokens = sum(t for _, t in _window)
+    requests_left = REQUEST_QUOTA - len(_window) if REQUEST_QUOTA else None
+    tokens_left = TOKEN_QUOTA - used_tokens if TOKEN_QUOTA else None
+    admitted = (requests_left is None or requests_left >= 1) and (tokens_left is None or tokens_left >= tokens)
+    if admitted:
+        _window.append((now, tokens))
+        requests_left = requests_left - 1 if requests_left is not None else None
+        tokens_left = tokens_left - tokens if tokens_left is not None else None
+
+    headers = {}
+    if requests_left is not None:
+        headers["x-ratelimit-remaining-requests"] = str(requests_left)
+    if tokens_left is not None:
+        headers["x-ratelimit-remaining-tokens"] = str(max(tokens_left, 0))
+    if _window:
+        headers["x-ratelimit-reset-requests"] = f"{_window[0][0] + QUOTA_WINDOW - now:.3f}s"
+    if not admitted:
+        headers["retry-after-ms"] = str(int((_window[0][0] + QUOTA_WINDOW - now) * 1000) + 1)
+    return admitted, headers
+
+
+async def stream_reply(content, model):
+    """
+    Server-sent chat.completion.chunk events of about one token each. With ERROR_RATE a stream
+    is cut off somewhere along the way, like a dropped connection.
+    """
+    cut = random.randrange(len(content)) if random.random() < ERROR_RATE else None
+    chunk_id = f"chatcmpl-fake-{time.time_ns()}"
+
+    def event(delta, finish_reason=None):
+        return "data: " + json.dumps({
+            "id": chunk_id, "object": "chat.completion.chunk", "created": int(time.time()), "model": model,
+            "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+        }) + "\n\n"
+
+    yield event({"role": "assistant", "content": ""})
+    for start in range(0, len(content), 4):
+        if cut is not None and start >= cut:
+            raise ConnectionError("Stream cut off")
+        await asyncio.sleep(TOKEN_TIME)
+        yield event({"content": content[start:start + 4]})
+    yield event({}, "stop")
+    yield "data: [DONE]\n\n"
+
+
+@app.post("/openai/deployments/{deployment}/chat/completions")
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request, deployment: str = "fake"):
+    body = await request.json()
+    prompt = "\n".join(str(message.get("content", "")) for message in body.get("messages", []))
+    prompt_tokens = len(prompt) // 4
+    admitted, headers = admit(prompt_tokens + (body.get("max_tokens") or 0))
+    if not admitted:
+        return JSONResponse(status_code=429, headers=headers, content={"error": {
+            "code": "429", "message": "Requests to the deployment have exceeded the rate limit."}})
+
+    await asyncio.sleep(LATENCY * random.uniform(1 - JITTER, 1 + JITTER))
+    content = fake_reply(prompt, body.get("response_format"))
+    completion_tokens = len(content) // 4
+    if body.get("stream"):
+        return StreamingResponse(stream_reply(content, body.get("model", deployment)), headers=headers,
+                                 media_type="text/event-stream")
+    if random.random() < ERROR_RATE:
+        return JSONResponse(status_code=500, content={"error": {"code": "500", "message": "Internal server error"}})
+    await asyncio.sleep(completion_tokens * TOKEN_TIME)
+    return JSONResponse(headers=headers, content={
+        "id": f"chatcmpl-fake-{time.time_ns()}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": body.get("model", deployment),
+        "choices": [{"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": content}}],
+        "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                  "total_tokens": prompt_tokens + completion_tokens},
+    })
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fake OpenAI compatible chat completions server")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--latency", type=float, default=LATENCY)
+    parser.add_argument("--token-time", type=float, default=TOKEN_TIME, help="Seconds per generated token")
+    parser.add_argument("--window", type=float, default=QUOTA_WINDOW, help="Quota window (s)")
+    parser.add_argument("--requests", type=int, default=REQUEST_QUOTA, help="Requests per window")
+    parser.add_argument("--tokens", type=int, default=TOKEN_QUOTA, help="Tokens per window")
+    parser.add_argument("--error-rate", type=float, default=ERROR_RATE)
+    parser.add_argument("--drop-rate", type=float, default=DROP_RATE, help="Share of rows missing from structured answers")
+    parser.add_argument("--bad-rate", type=float, default=BAD_RATE, help="Share of rows with an out-of-range value")
+    args = parser.parse_args()
+
+    LATENCY, QUOTA_WINDOW, ERROR_RATE, DROP_RATE = args.latency, args.window, args.error_rate, args.drop_rate
+    TOKEN_TIME, BAD_RATE = args.token_time, args.bad_rate
+    REQUEST_QUOTA, TOKEN_QUOTA = args.requests, args.tokens
+    uvicorn.run(app, host="localhost", port=args.port, log_level="warning")
@@ -0,0 +1,155 @@
+import os
+import hashlib
+import threading
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+FINANCIALS_PATH = "output/Company_Financials_FY2024.xlsx"
+RELOAD_INTERVAL = 5  # seconds between mtime checks of the source file
+
+SOURCE_HASH_KEY = b"source_sha256"
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def _file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class FinancialsStore:
+    """
+    Company financials loaded once into column arrays with a ticker -> row dict, so a lookup
+    is O(1) instead of reading the Excel file and scanning df['Company'] == ticker.
+
+    A parsed copy is cached next to the source as Parquet (tagged with the source hash), so a
+    cold start only parses Excel when the source has actually changed. start_watcher() reloads
+    in a background thread when the source file's mtime and content change; readers always see
+    either the old or the new data, never a mix.
+    """
+
+    def __init__(self, source_path=FINANCIALS_PATH, key_column="Company"):
+        self.source_path = source_path
+        self.key_column = key_column
+        self.cache_path = os.path.splitext(source_path)[0] + ".parquet"
+        self._state = None
+        self._mtime = None
+        self._hash = None
+        self._watcher = None
+        self._stop = threading.Event()
+        self.reload()
+
+    def _read(self, source_hash):
+        # Fast path: Parquet cache built from the same source content. Only the footer is read to
+        # check the hash, the data only when it matches
+        if os.path.exists(self.cache_path):
+            metadata = pq.read_schema(self.cache_path).metadata or {}
+            if metadata.get(SOURCE_HASH_KEY, b"").decode() == source_hash:
+                return pq.read_table(self.cache_path).to_pandas()
+
+        df = pd.read_excel(self.source_path)
+        # Temporary name per process and thread, since scoring workers may rebuild the cache at once
+        tmp_path = f"{self.cache_path}.{os.getpid()}-{threading.get_ident()}.tmp"
+        try:
+            table = pa.Table.from_pandas(df, preserve_index=False)
+            table = table.replace_schema_metadata({**(table.schema.metadata or {}), SOURCE_HASH_KEY: source_hash.encode()})
+            pq.write_table(table, tmp_path)
+            os.replace(tmp_path, self.cache_path)
+        except (pa.ArrowException, OSError) as e:
+            # E.g. an Excel column mixing numbers and text: serve the parsed data, just uncached
+            print(f"Could not cache {self.source_path} as Parquet: {e}")
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        return df
+
+    def reload(self, force=False):
+        """
+        Reload if the source changed (mtime first, then content hash). Returns True if reloaded.
+        """
+        mtime = os.path.getmtime(self.source_path)
+        if not force and mtime == self._mtime:
+            return False
+        source_hash = _file_hash(self.source_path)
+        if not force and source_hash == self._hash:
+            self._mtime = mtime
+            return False
+
+        df = self._read(source_hash)
+        if self.key_column not in df.columns:
+            raise KeyError(f"{self.source_path} must have a '{self.key_column}' column.")
+
+        columns = {col: df[col].to_numpy() for col in df.columns}
+        rows = {}
+        for i, key in enumerate(columns[self.key_column]):
+            # First matching row wins, like row.iloc[0] in the old lookup
+            rows.setdefault(key, i)
+        # Single assignment, so concurrent readers switch over atomically
+        self._state = (columns, rows)
+        self._mtime, self._hash = mtime, source_hash
+        return True
+
+    def get(self, ticker, columns=None):
+        """
+        Row of one ticker as a dict (None if unknown).
+        """
+        data, rows = self._state
+        i = rows.get(ticker)
+        if i is None:
+            return None
+        return {col: data[col][i] for col in (columns or data)}
+
+    def column(self, name):
+        return self._state[0][name]
+
+    def tickers(self):
+        return list(self._state[1])
+
+    def __contains__(self, ticker):
+        return ticker in self._state[1]
+
+    def __len__(self):
+        return len(self._state[1])
+
+    def start_watcher(self, interval=RELOAD_INTERVAL):
+        """
+        Poll the source file in a daemon thread and reload it when it changes.
+        """
+        if self._watcher is not None:
+            return
+
+        def watch():
+            while not self._stop.wait(interval):
+                try:
+                    if self.reload():
+                        print(f"Reloaded {self.source_path}")
+                except Exception as e:
+                    # Half written source file: keep serving the old data and retry next tick
+                    print(f"Reload of {self.source_path} failed: {e}")
+
+        self._watcher = threading.Thread(target=watch, name="financials-watcher", daemon=True)
+        self._watcher.start()
+
+    def stop_watcher(self):
+        self._stop.set()
+        if self._watcher is not None:
+            self._watcher.join()
+            self._watcher = None
+        self._stop.clear()
+
+
+def get_store(source_path=FINANCIALS_PATH, watch=False):
+    """
+    Shared store per source file, loaded on first use.
+    """
+    with _stores_lock:
+        store = _stores.get(source_path)
+        if store is None:
+            store = _stores[source_path] = FinancialsStore(source_path)
+    if watch:
+        store.start_watcher()
+    return store
@@ -0,0 +1,199 @@
+import os
+import json
+import atexit
+import time
+import sqlite3
+import hashlib
+import threading
+from openai.types.chat import ChatCompletion
+
+# Responses of every chat completion made through the cache, keyed by a hash of the request
+CACHE_PATH = os.environ.get("LLM_CACHE_PATH", "output/llm_cache.sqlite")
+MAX_BYTES = int(float(os.environ.get("LLM_CACHE_MAX_MB", 512)) * 2**20)
+# LLM_CACHE=0 turns caching off everywhere
+ENABLED = os.environ.get("LLM_CACHE", "1") != "0"
+
+# Request arguments that don't change the response
+IGNORED_PARAMS = {"stream", "timeout", "extra_headers", "extra_query", "extra_body", "user"}
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def cache_key(model, messages, scope=None, **params):
+    """
+    SHA-256 of the deployment, messages and every parameter that shapes the response
+    (temperature, max_tokens, seed, response_format, ...). `scope` (e.g. a row id) keeps the
+    entries of identical prompts apart.
+    """
+    request = {"model": model, "messages": messages,
+               **{k: v for k, v in params.items() if k not in IGNORED_PARAMS and v is not None}}
+    if scope is not None:
+        request["scope"] = scope
+    return hashlib.sha256(json.dumps(request, sort_keys=True, default=str).encode()).hexdigest()
+
+
+class LLMCache:
+    """
+    Persistent content-addressed response cache in SQLite, bounded to max_bytes by evicting the
+    least recently used entries. One connection per cache, guarded by a lock, so it can be shared
+    by threads and by the async engine.
+
+    The cache keeps a running total of its size instead of summing the table on every put (it
+    is recounted only when it crosses max_bytes, since other processes may share the file), and
+    hits record their access time in batches of TOUCH_BATCH rather than one commit each.
+    """
+
+    TOUCH_BATCH = 256
+
+    def __init__(self, path=CACHE_PATH, max_bytes=MAX_BYTES):
+        folder = os.path.dirname(path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.execute("CREATE TABLE IF NOT EXISTS responses ("
+                        "key TEXT PRIMARY KEY, value TEXT NOT NULL, size INTEGER NOT NULL, "
+                        "created REAL NOT NULL, last_used REAL NOT NULL)")
+        self.db.execute("CREATE INDEX IF NOT EXISTS responses_last_used ON responses (last_used)")
+        self.db.commit()
+        self.total = self._count()
+        self.touched = {}
+        self.hits = self.misses = 0
+
+    def _count(self):
+        return self.db.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+    def get(self, key):
+        with self.lock:
+            row = self.db.execute("SELECT value FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.touched[key] = time.time()
+            if len(self.touched) >= self.TOUCH_BATCH:
+                self._flush_touched()
+                self.db.commit()
+            return row[0]
+
+    def put(self, key, value):
+        now = time.time()
+        size = len(value.encode())
+        with self.lock:
+            old = self.db.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+            self.db.execute("INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?)",
+                            (key, value, size, now, now))
+            self.touched.pop(key, None)
+            self.total += size - (old[0] if old else 0)
+            if self.total > self.max_bytes:
+                self._evict()
+            self.db.commit()
+
+    def delete(self, key):
+        with self.lock:
+            row = self.db.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+            self.touched.pop(key, None)
+            if row:
+                self.db.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self.total -= row[0]
+            self.db.commit()
+
+    def flush(self):
+        """
+        Write the pending access times, e.g. before the process exits.
+        """
+        with self.lock:
+            self._flush_touched()
+            self.db.commit()
+
+    def _flush_touched(self):
+        if self.touched:
+            self.db.executemany("UPDATE responses SET last_used = ? WHERE key = ?",
+                                [(used, key) for key, used in self.touched.items()])
+            self.touched.clear()
+
+    def _evict(self):
+        # Entries written by other processes count too, and the least recently used order needs
+        # every pending access time
+        self._flush_touched()
+        self.total = self._count()
+        if self.total <= self.max_bytes:
+            return
+        # Trim to 90% so eviction doesn't run on every insert once the cache is full
+        excess = self.total - int(self.max_bytes * 0.9)
+        keys, freed = [], 0
+        for key, size in self.db.execute("SELECT key, size FROM responses ORDER BY last_used"):
+            keys.append((key,))
+            freed += size
+            if freed >= excess:
+                break
+        self.db.executemany("DELETE FROM responses WHERE key = ?", keys)
+        self.total -= freed
+
+    def get_completion(self, key):
+        value = self.get(key)
+        return ChatCompletion.model_validate_json(value) if value is not None else None
+
+    def put_completion(self, key, completion):
+        self.put(key, completion.model_dump_json())
+
+
+def get_cache(path=CACHE_PATH):
+    """
+    Shared cache per file, or None when caching is turned off.
+    """
+    if not ENABLED:
+        return None
+    with _caches_lock:
+        cache = _caches.get(path)
+        if cache is None:
+            cache = _caches[path] = LLMCache(path)
+            atexit.register(cache.flush)
+        return cache
+
+
+class _CachedCompletions:
+    def __init__(self, completions, cache):
+        self._completions = completions
+        self._cache = cache
+
+    def create(self, cache=True, **kwargs):
+        if not cache or self._cache is None or kwargs.get("stream"):
+            return self._completions.create(**kwargs)
+        key = cache_key(**kwargs)
+        completion = self._cache.get_completion(key)
+        if completion is None:
+            completion = self._completions.create(**kwargs)
+            self._cache.put_completion(key, completion)
+        return completion
+
+
+class _CachedChat:
+    def __init__(self, chat, cache):
+        self.completions = _CachedCompletions(chat.completions, cache)
+
+
+class CachedClient:
+    """
+    Wraps a (sync) OpenAI / AzureOpenAI client so client.chat.completions.create() answers
+    repeated requests from the cache. create(..., cache=False) always calls the model, e.g. to
+    regenerate an answer the user rejected. Everything else is passed through to the client.
+    """
+
+    def __init__(self, client, cache):
+        self._client = client
+        self.chat = _CachedChat(client.chat, cache)
+
+    def __getattr__(self, name):
+        return getattr(self._client, name)
+
+
+def cached_client(client, path=CACHE_PATH):
+    """
+    The client wrapped with the shared response cache (every request is sent when LLM_CACHE=0).
+    """
+    return CachedClient(client, get_cache(path))
@@ -0,0 +1,293 @@
+import os
+import time
+import asyncio
+import argparse
+from dotenv import load_dotenv
+from openai import AsyncAzureOpenAI, APIConnectionError, APIStatusError
+from openai.types.chat import ChatCompletion
+from llm_cache import cache_key, get_cache
+from row_journal import RowJournal, request_hash
+from rate_limiter import AdaptiveLimiter, MAX_CONCURRENCY, MAX_RETRIES, backoff_delay, estimate_tokens, get_limiter
+
+load_dotenv()
+
+# Upper bound on requests one engine keeps in flight; the shared limiter adapts below it
+CONCURRENCY = MAX_CONCURRENCY
+
+
+def make_client(**overrides):
+    """
+    AsyncAzureOpenAI client configured from the same environment variables as the scripts.
+    Retries are left to the engine, which coordinates them through the rate limiter.
+    """
+    environment = {
+        "azure_endpoint": "AZURE_OPENAI_ENDPOINT",
+        "azure_deployment": "AZURE_OPENAI_DEPLOYMENT",
+        "api_key": "AZURE_OPENAI_API_KEY",
+        "api_version": "API_VERSION_GA",
+    }
+    settings = {key: overrides.pop(key, None) or os.environ[name] for key, name in environment.items()}
+    overrides.setdefault("max_retries", 0)
+    return AsyncAzureOpenAI(**settings, **overrides)
+
+
+class GenerationEngine:
+    """
+    Runs many chat completions concurrently with at most `concurrency` in flight, returning the
+    results in the order of the requests. Shared by the synthetic data scripts instead of calling
+    client.chat.completions.create one row at a time.
+
+    Every request goes through the process-wide AdaptiveLimiter of its deployment (see
+    rate_limiter.py), which sets the actual concurrency from the quota headers, and 429 / 5xx /
+    connection errors are retried with backoff. Responses are cached (llm_cache.py) under each
+    row's scope, so a rerun only pays for requests that changed, and regenerate() forgets a row's
+    entry before requesting it again.
+    """
+
+    def __init__(self, client=None, concurrency=CONCURRENCY, model=None, limiter=None, max_retries=MAX_RETRIES,
+                 cache=True):
+        self.client = client or make_client()
+        self.concurrency = concurrency
+        self.model = model or os.environ.get("AZURE_OPENAI_DEPLOYMENT")
+        self.limiter = limiter or get_limiter((str(self.client.base_url), self.model))
+        self.max_retries = max_retries
+        self.cache = get_cache() if cache is True else cache or None
+
+    def _key(self, messages, scope, params):
+        if self.cache is None:
+            return None
+        return cache_key(self.model, messages, scope=scope, **params)
+
+    async def complete(self, messages, scope=None, **params):
+        """
+        One chat completion. Returns the message content.
+        """
+        key = self._key(messages, scope, params)
+        if key:
+            completion = self.cache.get_completion(key)
+            if completion is not None:
+                return completion.choices[0].message.content
+
+        tokens = estimate_tokens(messages, params.get("max_tokens"))
+        for attempt in range(self.max_retries + 1):
+            await self.limiter.acquire(tokens)
+            headers = status = None
+            try:
+                raw = await self.client.chat.completions.with_raw_response.create(
+                    model=self.model, messages=messages, **params)
+                headers, status = raw.headers, raw.status_code
+                completion = raw.parse()
+                if key:
+                    self.cache.put_completion(key, completion)
+                return completion.choices[0].message.content
+            except APIStatusError as e:
+                headers, status = e.response.headers, e.status_code
+                if (status != 429 and status < 500) or attempt == self.max_retries:
+                    raise
+            except APIConnectionError:
+                if attempt == self.max_retries:
+                    raise
+            finally:
+                self.limiter.release(headers, status)
+            await asyncio.sleep(backoff_delay(attempt, headers))
+
+    async def stream(self, messages, scope=None, **params):
+        """
+        One streamed chat completion: yields the content piece by piece as it arrives. Failures
+        before the first piece are retried like complete(); later ones are raised, since the caller
+        already holds the start of the answer. Complete answers are cached like complete()'s.
+        """
+        key = self._key(messages, scope, params)
+        if key:
+            completion = self.cache.get_completion(key)
+            if completion is not None:
+                yield completion.choices[0].message.content
+                return
+
+        tokens = estimate_tokens(messages, params.get("max_tokens"))
+        for attempt in range(self.max_retries + 1):
+            await self.limiter.acquire(tokens)
+            headers = status = None
+            parts = []
+            try:
+                raw = await self.client.chat.completions.with_raw_response.create(
+                    model=self.model, messages=messages, stream=True, **params)
+                headers, status = raw.headers, raw.status_code
+                async for chunk in raw.parse():
+                    if chunk.choices and chunk.choices[0].delta.content:
+                        parts.append(chunk.choices[0].delta.content)
+                        yield parts[-1]
+                if key:
+                    self.cache.put_completion(key, ChatCompletion.model_validate({
+                        "id": f"stream-{key[:16]}", "object": "chat.completion", "created": int(time.time()),
+                        "model": self.model or "",
+                        "choices": [{"index": 0, "finish_reason": "stop",
+                                     "message": {"role": "assistant", "content": "".join(parts)}}],
+                    }))
+                return
+            except APIStatusError as e:
+                headers, status = e.response.headers, e.status_code
+                if (status != 429 and status < 500) or attempt == self.max_retries:
+                    raise
+            except APIConnectionError:
+                if parts or attempt == self.max_retries:
+                    status = None
+                    raise
+            except BaseException:
+                # Cut off mid-stream (or abandoned by the caller)
+                status = None
+                raise
+            finally:
+                self.limiter.release(headers, status)
+            await asyncio.sleep(backoff_delay(attempt, headers))
+
+    def forget(self, messages, scope=None, **params):
+        """
+        Drop a cached response, e.g. one that came back malformed, so the request is sent again.
+        """
+        key = self._key(messages, scope, params)
+        if key:
+            self.cache.delete(key)
+
+    async def map(self, requests, parse=None, on_result=None, scopes=None, **params):
+        """
+        Complete every request, `concurrency` at a time.
+        Args:
+        - requests (list): Message lists, one per row.
+        - parse (callable): Applied to each response content (e.g. a JSON parser).
+        - on_result (callable): Called with (index, result) as soon as a row succeeds.
+        - scopes (list): Cache scope per request (e.g. its row id), so rows with the same prompt
+          don't share a cached answer.
+        - params: Completion parameters shared by all requests (temperature, max_tokens, ...).
+        Returns:
+        - results (list): Parsed content per request in input order; None where the request failed.
+        """
+        semaphore = asyncio.Semaphore(self.concurrency)
+        results = [None] * len(requests)
+        done = 0
+        start = time.perf_counter()
+
+        async def run(i, messages):
+            nonlocal done
+            async with semaphore:
+                try:
+                    content = await self.complete(messages, scopes[i] if scopes else None, **params)
+                    results[i] = parse(content) if parse else content
+                    if on_result is not None and results[i] is not None:
+                        on_result(i, results[i])
+                except Exception as e:
+                    print(f"Row {i} failed: {e}")
+            done += 1
+            if done % 50 == 0 or done == len(requests):
+                elapsed = time.perf_counter() - start
+                print(f"{done}/{len(requests)} rows in {elapsed:.1f}s ({done / elapsed:.1f} rows/s)")
+
+        await asyncio.gather(*(run(i, messages) for i, messages in enumerate(requests)))
+        return results
+
+    def run(self, requests, parse=None, on_result=None, scopes=None, **params):
+        """
+        Synchronous map() for the scripts.
+        """
+        return asyncio.run(self._run_and_close(requests, parse, on_result, scopes, **params))
+
+    async def _run_and_close(self, requests, parse, on_result, scopes, **params):
+        try:
+            return await self.map(requests, parse, on_result, scopes, **params)
+        finally:
+            # The client's connection pool belongs to this event loop
+            await self.client.close()
+
+
+def generate(requests, parse=None, concurrency=CONCURRENCY, journal=None, rows=None, limiter=None, **params):
+    """
+    Complete a list of message lists concurrently, see GenerationEngine.map.
+
+    With a journal path every finished row is appended to that JSONL journal right away (see
+    row_journal.py). Rerunning after a crash or Ctrl-C only requests the rows not journaled yet
+    for the same prompt, and the results are read back from the journal. `rows` are the ids the
+    rows are journaled under, their positions by default.
+    """
+    engine = GenerationEngine(concurrency=concurrency, limiter=limiter)
+    rows = list(rows) if rows is not None else list(range(len(requests)))
+    if journal is None:
+        return engine.run(requests, parse, scopes=rows, **params)
+
+    journal = RowJournal(journal)
+    hashes = [request_hash(messages, **params) for messages in requests]
+    todo = [i for i in range(len(requests)) if (rows[i], hashes[i]) not in journal]
+    print(f"{len(requests) - len(todo)} rows already in {journal.path}, generating {len(todo)}")
+    try:
+        if todo:
+            engine.run([requests[i] for i in todo], parse,
+                       lambda j, result: journal.append(rows[todo[j]], hashes[todo[j]], result),
+                       [rows[i] for i in todo], **params)
+        return journal.results(hashes, rows)
+    finally:
+        journal.close()
+
+
+def regenerate(requests, rows, parse=None, concurrency=CONCURRENCY, journal=None, **params):
+    """
+    Request some rows again, e.g. after their answers failed validation. Their cached answers are
+    dropped first so each row costs one fresh call, and new results are appended to the journal,
+    where they replace the old ones. Rows are cached under their position, like generate()'s, so
+    rows with the same prompt still get an answer each.
+    Args:
+    - requests (list): Message lists of all rows.
+    - rows (list): Positions of the rows to request again.
+    - journal (str or list): Journal path, or one journal path per row of requests (e.g. the
+      shard journals of a sharded run, see shard_runner.row_journals).
+    Returns:
+    - results (dict): Position -> parsed content, for the rows that succeeded.
+    """
+    rows = list(rows)
+    if not rows:
+        return {}
+    engine = GenerationEngine(concurrency=concurrency)
+    for i in rows:
+        engine.forget(requests[i], scope=i, **params)
+    paths = [journal] * len(requests) if journal is None or isinstance(journal, str) else list(journal)
+    journals = {path: RowJournal(path) for path in {paths[i] for i in rows} if path is not None}
+
+    def on_result(j, result):
+        path = paths[rows[j]]
+        if path is not None:
+            journals[path].append(rows[j], request_hash(requests[rows[j]], **params), result)
+
+    try:
+        results = engine.run([requests[i] for i in rows], parse, on_result, scopes=rows, **params)
+    finally:
+        for row_journal in journals.values():
+            row_journal.close()
+    return {i: result for i, result in zip(rows, results) if result is not None}
+
+
+def benchmark(url, n_requests=200, concurrency=CONCURRENCY, serial=True):
+    """
+    Serial vs concurrent throughput against an OpenAI compatible server (e.g. fake_llm_server.py).
+    """
+    requests = [[{"role": "user", "content": f"Row {i}"}] for i in range(n_requests)]
+    runs = [("serial", 1)] if serial else []
+    for label, n in runs + [(f"concurrency {concurrency}", concurrency)]:
+        limiter = AdaptiveLimiter()
+        engine = GenerationEngine(make_client(azure_endpoint=url, api_key="fake"), concurrency=n, limiter=limiter,
+                                  cache=False)
+        start = time.perf_counter()
+        results = engine.run(requests, max_tokens=200)
+        elapsed = time.perf_counter() - start
+        print(f"{label}: {n_requests} requests in {elapsed:.2f}s ({n_requests / elapsed:.1f}/s), "
+              f"{sum(r is not None for r in results)} ok, {limiter.stats}, final limit {limiter.limit:.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the generation engine against a local fake server")
+    parser.add_argument("--url", default="http://localhost:8001", help="Endpoint of fake_llm_server.py")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=CONCURRENCY)
+    parser.add_argument("--no-serial", action="store_true", help="Skip the serial baseline")
+    args = parser.parse_args()
+
+    os.environ.setdefault("AZURE_OPENAI_DEPLOYMENT", "fake")
+    os.environ.setdefault("API_VERSION_GA", "2024-10-21")
+    benchmark(args.url, args.requests, args.concurrency, not args.no_serial)
@@ -0,0 +1,78 @@
+import time
+import random
+import asyncio
+import argparse
+from collections import defaultdict
+import numpy as np
+import httpx
+
+BASE_URL = "http://localhost:5000"
+
+
+async def run_session(client, company, timings, errors):
+    """
+    One assessment as the frontend drives it: create, feedback + regenerate narrative, credit note.
+    """
+    async def call(name, method, path, **kwargs):
+        start = time.perf_counter()
+        try:
+            response = await client.request(method, path, **kwargs)
+        except httpx.HTTPError:
+            errors[name] += 1
+            return None
+        finally:
+            timings[name].append(time.perf_counter() - start)
+        if response.status_code >= 400:
+            errors[name] += 1
+            return None
+        return response.json()
+
+    loan = random.uniform(1e6, 5e8)
+    created = await call("create", "POST", "/api/assessments", json={
+        "companyName": company,
+        "loanDetails": {"amount": loan, "term": random.choice([12, 36, 60, 120]), "purpose": "Working capital"},
+        "collateralValue": loan * random.uniform(0.5, 2.0),
+        "creditScore": random.randint(300, 900),
+    })
+    if not created:
+        return
+    assessment_id = created["assessmentId"]
+    await call("feedback", "POST", f"/api/assessments/{assessment_id}/feedback", json={"text": "Add more detail on leverage."})
+    await call("narrative", "POST", f"/api/assessments/{assessment_id}/narrative")
+    await call("credit-note", "POST", f"/api/assessments/{assessment_id}/credit-note")
+
+
+async def load_test(base_url, companies, sessions, concurrency):
+    timings, errors = defaultdict(list), defaultdict(int)
+    semaphore = asyncio.Semaphore(concurrency)
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=120, limits=limits) as client:
+        async def bounded(i):
+            async with semaphore:
+                await run_session(client, companies[i % len(companies)], timings, errors)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(bounded(i) for i in range(sessions)))
+        elapsed = time.perf_counter() - start
+
+    total = sum(len(t) for t in timings.values())
+    print(f"{sessions} sessions, {total} requests in {elapsed:.2f}s at concurrency {concurrency}: "
+          f"{total / elapsed:,.1f} requests/s")
+    print(f"{'endpoint':<12} {'count':>6} {'errors':>6} {'p50 ms':>9} {'p99 ms':>9} {'max ms':>9}")
+    for name, values in timings.items():
+        ms = np.array(values) * 1000
+        print(f"{name:<12} {len(ms):>6} {errors[name]:>6} {np.percentile(ms, 50):>9.1f} "
+              f"{np.percentile(ms, 99):>9.1f} {ms.max():>9.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load test the assessment service (run it with ASSESSMENT_FAKE_LLM=1 "
+                                                 "to measure the service itself rather than Azure)")
+    parser.add_argument("companies", nargs="+", help="Company names known to the ticker index")
+    parser.add_argument("--url", default=BASE_URL)
+    parser.add_argument("--sessions", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=20)
+    args = parser.parse_args()
+
+    asyncio.run(load_test(args.url, args.companies, args.sessions, args.concurrency))
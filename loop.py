@@ -1,34 +1,25 @@
 import os
 import pandas as pd
-import time
-from openai import AzureOpenAI
 from dotenv import load_dotenv
 import warnings
 import io
+import argparse
+from llm_engine import generate
+from shard_runner import generate_sharded, row_journals, row_keys
+from row_validation import pipe_frame, validate_and_regenerate
  
 warnings.filterwarnings("ignore")
 load_dotenv()
  
-# Azure OpenAI Client
-client = AzureOpenAI(
-    azure_endpoint=os.environ["AZURE_OPENAI_ENDPOINT"],
-    azure_deployment=os.environ["AZURE_OPENAI_DEPLOYMENT"],
-    api_key=os.environ["AZURE_OPENAI_API_KEY"],
-    api_version=os.environ["API_VERSION_GA"],
-)
-print("AzureOpenAI client initialized")
+# Azure OpenAI requests go through the shared async engine (llm_engine.py)
  
 INPUT_PATH = "output/Company_Financials_Cleaned.xlsx"
 OUTPUT_PATH = "output/Company_Financials_Synthetic_First100.xlsx"
+FULL_OUTPUT_PATH = "output/Company_Financials_Synthetic.xlsx"  # --rows 0: the whole dataset
+JOURNAL_PATH = "output/journals/loop.jsonl"  # finished rows, kept across runs
  
-# Load data
-df_full = pd.read_excel(INPUT_PATH)
-df_batch = df_full.iloc[:100].copy().reset_index(drop=True)
- 
-# Add synthetic columns
+# Synthetic columns
 synthetic_cols = ["Loan Value", "Collateral Value", "Loan Tenure", "Credit Score", "Risk Score"]
-for col in synthetic_cols:
-    df_batch[col] = pd.NA
  
 # Define prompt format for single row
 def build_prompt(row_dict):
@@ -46,36 +37,54 @@ Loan Value | Collateral Value | Loan Tenure | Credit Score | Risk Score
 """
     return f"{context}\n{details}{instruction}"
  
-# Process in 2 batches
-for batch_start in [0, 50]:
-    batch_end = batch_start + 50
-    print(f"\nProcessing rows {batch_start} to {batch_end - 1}")
-    for i in range(batch_start, batch_end):
+def main(journal_path=JOURNAL_PATH):
+    """
+    Generate the synthetic columns, journaling finished rows to journal_path (azure6.py runs
+    the same generation with its own journal).
+    """
+    parser = argparse.ArgumentParser(description="Generate synthetic loan and risk columns")
+    parser.add_argument("--rows", type=int, default=100, help="First N rows of the dataset, 0 for all")
+    parser.add_argument("--shards", type=int, default=1, help="Worker processes, each with a slice of the quota")
+    args = parser.parse_args()
+    output_path = OUTPUT_PATH if args.rows else FULL_OUTPUT_PATH
+ 
+    # Load data
+    df_full = pd.read_excel(INPUT_PATH)
+    df_batch = (df_full.iloc[:args.rows] if args.rows else df_full).copy().reset_index(drop=True)
+    for col in synthetic_cols:
+        df_batch[col] = pd.NA
+ 
+    # One request per row
+    requests = []
+    for i in range(len(df_batch)):
         row_data = df_batch.iloc[i].drop(synthetic_cols, errors='ignore').dropna().to_dict()
         prompt = build_prompt(row_data)
+        requests.append([
+            {"role": "system", "content": "You generate synthetic loan and risk data."},
+            {"role": "user", "content": prompt}
+        ])
+ 
+    # All rows run concurrently; results come back in row order (None where the request failed)
+    # Finished rows are journaled as they complete, so a rerun after a crash only requests the rest
+    # With --shards the rows are split by company and year across worker processes
+    if args.shards > 1:
+        results = generate_sharded(requests, row_keys(df_batch), journal_path, args.shards, temperature=0.5, max_tokens=200)
+    else:
+        results = generate(requests, journal=journal_path, temperature=0.5, max_tokens=200)
  
-        try:
-            response = client.chat.completions.create(
-                model=os.environ["AZURE_OPENAI_DEPLOYMENT"],
-                messages=[
-                    {"role": "system", "content": "You generate synthetic loan and risk data."},
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=0.5,
-                max_tokens=200
-            )
-            content = response.choices[0].message.content.strip()
-            parts = [x.strip() for x in content.split('|')]
+    # Parse and check all answers in one pass (field count, numbers, ranges); only the rows that
+    # fail are requested again, one call each
+    # Regenerated rows are journaled like the first pass (into their shard's journal with --shards)
+    journals = journal_path if args.shards == 1 else row_journals(row_keys(df_batch), journal_path, args.shards)
+    synthetic, failures = validate_and_regenerate(requests, results, lambda results: pipe_frame(results, synthetic_cols),
+                                                  journal=journals,
+                                                  temperature=0.5, max_tokens=200)
+    for col in synthetic_cols:
+        df_batch[col] = synthetic[col]
  
-            if len(parts) == 5:
-                df_batch.loc[i, synthetic_cols] = parts
-                print(f"Row {i} processed.")
-            else:
-                print(f"Row {i} - unexpected output: {content}")
-        except Exception as e:
-            print(f"Row {i} failed: {e}")
-        time.sleep(1.5)
+    # Save final DataFrame
+    df_batch.to_excel(output_path, index=False)
+    print(f"Saved synthetic dataset to: {output_path}")
  
-# Save final DataFrame
-df_batch.to_excel(OUTPUT_PATH, index=False)
-print(f"Saved synthetic dataset to: {OUTPUT_PATH}")
+if __name__ == "__main__":
+    main()
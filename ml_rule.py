@@ -1,36 +1,23 @@
+import os
+import sys
+import json
+import time
+import hashlib
+import argparse
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
 import pandas as pd
-import requests
-from rule_decision_new import rule_function  # You must define this function
+from rule import rule_function
+from ticker_index import resolve_ticker, load_index
+from financials_store import get_store
+from panel_store import load_panel
+from batch_scoring import score_batch
  
 EXCEL_FILE_PATH = "company_financial_fy2024.xlsx"
 SHEET_NAME = "Financials"
  
 def search_ticker_by_company_name(company_name):
-    # try:
-        url = f"https://query1.finance.yahoo.com/v1/finance/search?q={company_name}"
-        headers = {"User-Agent": "Mozilla/5.0"}
-        response = requests.get(url, headers=headers)
-        response.raise_for_status()
-        results = response.json().get("quotes", [])
-        print(results)
- 
-        for result in results:
-            symbol = result.get("symbol", "")
-            # print(symbol)
-            exchange = result.get("exchange", "")
-            quote_type = result.get("quoteType", "")
-            if symbol.endswith(".NS"):
-                print(symbol)
-            return symbol if symbol.endswith(".NS") else symbol - "BO" + ".NS"
- 
-        #  if quote_type in ["EQUITY", "ETF"] and exchange == "NS":
-        #     return symbol if symbol.endswith(".NS") else symbol + ".NS"
-        #  print(symbol)
- 
-        # return None
-    # except Exception as e:
-    #     print(f"Error fetching ticker for '{company_name}': {e}")
-    #     return None
+    # Local index built from the scraper's ticker CSVs; Yahoo is only queried on a miss (and cached)
+    return resolve_ticker(company_name)
  
 def safe_div(numerator, denominator):
     try:
@@ -40,24 +27,18 @@ def safe_div(numerator, denominator):
     except:
         return None
  
-def fetch_financial_data_from_excel(ticker, loan_value, collateral_value, credit_score):
+def fetch_financial_data_from_excel(ticker, loan_value, collateral_value, credit_score, as_of=None):
     # try:
-        df = pd.read_excel("output\Company_Financials_FY2024.xlsx")
-        # print(df)
-        # pri
- 
-        if "Company" not in df.columns:
-            print("Excel file must have a 'Ticker' column.")
-            return None
- 
-        row = df[df['Company'] == ticker]
-        if row.empty:
+        if as_of is not None:
+            # Point-in-time: the ratios that were known at that date, from the multi-year panel
+            row = load_panel().get(ticker, as_of, RATIO_COLUMNS)
+        else:
+            # Financials are loaded once, indexed by ticker and reloaded when the file changes
+            row = get_store(watch=True).get(ticker)
+        if row is None:
             print(f"Ticker {ticker} not found in Excel.")
             return None
  
-        row = row.iloc[0]  # Get first matching row
-        # print(row)
- 
         data = {
             "Net Profit Margin %": row.get("Net Profit Margin %"),
             "Return on Equity %": row.get("Return on Equity %"),
@@ -106,7 +87,154 @@ def evaluate_company_risk(company_name, loan_value, collateral_value, credit_sco
  
     process_risk_result(company_name, ticker, risk_score, data.get("LtC"), loan_value)
  
+# ---------------------------------------------------------------------
+# Bulk mode: score a whole book of applications across a process pool
+# ---------------------------------------------------------------------
+BULK_OUTPUT_DIR = "output/bulk_results"
+BULK_CHUNK_SIZE = 5000
+RATIO_COLUMNS = ["Net Profit Margin %", "Return on Equity %", "Return on Assets %", "Current Ratio",
+                 "Asset Turnover Ratio", "Debt Equity Ratio", "Debt To Asset Ratio", "Interest Coverage Ratio"]
+# Accepted spellings of the application columns
+BULK_COLUMN_ALIASES = {
+    "company": "Company Name", "company name": "Company Name",
+    "loan": "Loan Value", "loan value": "Loan Value",
+    "collateral": "Collateral Value", "collateral value": "Collateral Value",
+    "credit": "Credit Score", "credit score": "Credit Score",
+}
+ 
+def read_applications(path):
+    applications = pd.read_parquet(path) if path.endswith(".parquet") else pd.read_csv(path)
+    applications = applications.rename(columns=lambda c: BULK_COLUMN_ALIASES.get(c.strip().lower(), c))
+    missing = {"Company Name", "Loan Value", "Collateral Value", "Credit Score"} - set(applications.columns)
+    if missing:
+        raise ValueError(f"{path} is missing columns: {sorted(missing)}")
+    return applications
+ 
+def score_chunk(chunk, allow_remote=False):
+    """
+    Resolve tickers, look up financials and score one chunk of applications.
+    Runs in a worker process; the ticker index and financials store load once per worker.
+    """
+    tickers = {name: resolve_ticker(name, allow_remote=allow_remote) for name in chunk["Company Name"].unique()}
+    chunk = chunk.copy()
+    chunk["Ticker"] = chunk["Company Name"].map(tickers)
+ 
+    store = get_store()
+    rows = [store.get(t, RATIO_COLUMNS) if isinstance(t, str) else None for t in chunk["Ticker"]]
+    found = [row is not None for row in rows]
+    ratios = pd.DataFrame([row or {} for row in rows], columns=RATIO_COLUMNS, index=chunk.index)
+    chunk[RATIO_COLUMNS] = ratios
+ 
+    chunk["Status"] = "ok"
+    chunk.loc[~pd.Series(found, index=chunk.index), "Status"] = "no financials"
+    chunk.loc[chunk["Ticker"].isna(), "Status"] = "ticker not found"
+ 
+    scores = score_batch(chunk)
+    chunk[scores.columns] = scores
+    chunk.loc[chunk["Status"] != "ok", scores.columns] = None
+    return chunk
+ 
+def _file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+ 
+def _part_path(output_dir, index):
+    return os.path.join(output_dir, f"part-{index:05d}.parquet")
+ 
+def evaluate_portfolio(input_path, output_dir=BULK_OUTPUT_DIR, workers=None, chunk_size=BULK_CHUNK_SIZE,
+                       allow_remote=False, combined_path=None):
+    """
+    Score every application in a CSV/Parquet file (company, loan, collateral, credit score).
+ 
+    The file is split into fixed chunks that are scored across a process pool, with at most two
+    chunks per worker queued at a time. Each chunk is written to output_dir as its own Parquet part
+    (renamed into place) as soon as it finishes, which doubles as the checkpoint: rerunning the
+    same job skips chunks whose part already exists.
+    Args:
+    - input_path (str): Applications file.
+    - output_dir (str): Directory for the part files and job description.
+    - workers (int): Worker processes, defaults to the CPU count.
+    - chunk_size (int): Applications per chunk.
+    - allow_remote (bool): Fall back to Yahoo search for names missing from the local ticker index.
+    - combined_path (str): Also merge all parts into this CSV/Parquet file at the end.
+    """
+    applications = read_applications(input_path)
+    os.makedirs(output_dir, exist_ok=True)
+ 
+    # The input and its chunking must not change between a run and its resume
+    job = {"input": os.path.abspath(input_path), "sha256": _file_sha256(input_path), "rows": len(applications),
+           "chunk_size": chunk_size}
+    job_path = os.path.join(output_dir, "job.json")
+    if os.path.exists(job_path):
+        with open(job_path) as f:
+            previous = json.load(f)
+        if previous != job:
+            raise ValueError(f"{output_dir} holds results of a different job: {previous}")
+    else:
+        with open(job_path, "w") as f:
+            json.dump(job, f, indent=2)
+ 
+    n_chunks = (len(applications) + chunk_size - 1) // chunk_size
+    pending = [i for i in range(n_chunks) if not os.path.exists(_part_path(output_dir, i))]
+    print(f"{len(applications)} applications, {n_chunks} chunks, {n_chunks - len(pending)} already done")
+ 
+    # Warm the ticker index and the financials cache once so workers don't all rebuild them
+    load_index()
+    get_store()
+ 
+    start, done, done_rows = time.perf_counter(), 0, 0
+    workers = workers or os.cpu_count() or 1
+    todo = iter(pending)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        running = {}
+ 
+        def submit_next():
+            i = next(todo, None)
+            if i is not None:
+                chunk = applications.iloc[i * chunk_size:(i + 1) * chunk_size]
+                running[pool.submit(score_chunk, chunk, allow_remote)] = i
+ 
+        for _ in range(2 * workers):
+            submit_next()
+        while running:
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                i = running.pop(future)
+                scored = future.result()
+                part_path = _part_path(output_dir, i)
+                scored.to_parquet(part_path + ".tmp", index=False)
+                os.replace(part_path + ".tmp", part_path)
+                done, done_rows = done + 1, done_rows + len(scored)
+                rate = done_rows / (time.perf_counter() - start)
+                print(f"Chunk {i + 1}/{n_chunks} saved ({done}/{len(pending)} this run, {rate:,.0f} applications/s)")
+                submit_next()
+ 
+    if combined_path:
+        parts = [pd.read_parquet(_part_path(output_dir, i)) for i in range(n_chunks)]
+        combined = pd.concat(parts, ignore_index=True)
+        if combined_path.endswith(".parquet"):
+            combined.to_parquet(combined_path, index=False)
+        else:
+            combined.to_csv(combined_path, index=False)
+        print(f"Saved {len(combined)} results to {combined_path}")
+ 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Evaluate company loan risk")
+    parser.add_argument("--bulk", metavar="FILE", help="CSV/Parquet of applications to score in bulk")
+    parser.add_argument("--output-dir", default=BULK_OUTPUT_DIR, help="Where bulk results and checkpoints go")
+    parser.add_argument("--combined", metavar="FILE", help="Merge bulk results into this file at the end")
+    parser.add_argument("--workers", type=int, help="Worker processes (default: all cores)")
+    parser.add_argument("--chunk-size", type=int, default=BULK_CHUNK_SIZE)
+    parser.add_argument("--remote", action="store_true", help="Use Yahoo search for names not in the local index")
+    args = parser.parse_args()
+ 
+    if args.bulk:
+        evaluate_portfolio(args.bulk, args.output_dir, args.workers, args.chunk_size, args.remote, args.combined)
+        sys.exit(0)
+ 
     company = input("Enter company name: ").strip()
     loan = float(input("Enter loan value: "))
     collateral = float(input("Enter collateral value: "))
@@ -0,0 +1,200 @@
+import os
+import argparse
+import time
+import numpy as np
+import pandas as pd
+
+# Every version of every (ticker, period) the pipeline has seen, with the date it became known
+PANEL_PATH = "output/financials_panel.parquet"
+
+# Report date assumed for periods already on file when the panel is first built
+FILING_LAG = pd.Timedelta(days=60)
+
+KEY_COLUMNS = ["Company", "Period", "Report Date"]
+# Columns of the ratios table that are not financial values
+ID_COLUMNS = ["Company", "Industry", "Sector", "Financial Year", "Period"]
+
+# Dates are days since 1970, so a (company, date) pair packs into one int64 sort key
+_DAYS = 1 << 20
+
+_panel = None
+_panel_mtime = None
+
+
+def _days(values):
+    return np.asarray(pd.to_datetime(values), dtype="datetime64[D]").astype(np.int64)
+
+
+def update_panel(ratios, path=PANEL_PATH, observed_at=None):
+    """
+    Append the (ticker, period) rows of the ratios table that are new or whose values changed,
+    stamped with the date they were observed. Rows never change once written, so the panel
+    answers "what was known at date D" for back tests.
+    Args:
+    - ratios (pd.DataFrame): Output of ratio_pipeline.update_ratios, one row per ticker and period.
+    - observed_at (date): Report date of new rows, today by default. On the first build every
+      period gets period end + FILING_LAG instead, since when it was filed is unknown.
+    Returns:
+    - added (int): Number of rows appended.
+    """
+    value_columns = [col for col in ratios.columns if col not in ID_COLUMNS]
+    fresh = ratios[["Company", "Period"] + value_columns].copy()
+    fresh["Period"] = pd.to_datetime(fresh["Period"])
+    observed_at = pd.Timestamp(observed_at or pd.Timestamp.now()).normalize()
+
+    if os.path.exists(path):
+        panel = pd.read_parquet(path)
+        latest = panel.sort_values("Report Date").drop_duplicates(["Company", "Period"], keep="last")
+        value_columns = [col for col in value_columns if col in panel.columns]
+        merged = fresh.merge(latest, on=["Company", "Period"], how="left", suffixes=("", " Known"), indicator=True)
+        new = (merged["_merge"] == "left_only").to_numpy()
+        ours = merged[value_columns].to_numpy(dtype=float)
+        known = merged[[col + " Known" for col in value_columns]].to_numpy(dtype=float)
+        changed = ((ours != known) & ~(np.isnan(ours) & np.isnan(known))).any(axis=1)
+        added = fresh[new | changed].copy()
+        added["Report Date"] = observed_at
+    else:
+        panel = None
+        added = fresh
+        added["Report Date"] = fresh["Period"] + FILING_LAG
+
+    if added.empty:
+        return 0
+    added = added[KEY_COLUMNS + value_columns]
+    panel = pd.concat([panel, added], ignore_index=True) if panel is not None else added
+    folder = os.path.dirname(path)
+    if folder:
+        os.makedirs(folder, exist_ok=True)
+    panel.to_parquet(path + ".tmp", index=False)
+    os.replace(path + ".tmp", path)
+    return len(added)
+
+
+class FinancialsPanel:
+    """
+    Point-in-time financials keyed by (ticker, period end, report date) with vectorized as-of lookups.
+
+    Rows are sorted by (ticker, report date) into one int64 key array, and each row knows which
+    row was the current view at that moment: the latest period reported so far, in its latest
+    revision (a restatement of an older period doesn't replace a newer period). An as-of query
+    for many tickers is then a single np.searchsorted over the keys.
+    """
+
+    def __init__(self, panel):
+        panel = panel.sort_values(["Company", "Report Date", "Period"], ignore_index=True)
+        self.panel = panel
+        self.companies, codes = np.unique(panel["Company"].to_numpy(dtype=str), return_inverse=True)
+        self.codes = codes.astype(np.int64)
+        self.keys = self.codes * _DAYS + _days(panel["Report Date"])
+
+        # Latest period reported so far within each company, and the last row reporting it
+        periods = _days(panel["Period"])
+        running = pd.Series(periods).groupby(self.codes).cummax().to_numpy()
+        current = np.where(periods == running, np.arange(len(panel)), -1)
+        self.current = np.maximum.accumulate(current) if len(panel) else current
+
+    @classmethod
+    def load(cls, path=PANEL_PATH):
+        return cls(pd.read_parquet(path))
+
+    def as_of(self, tickers, dates, columns=None):
+        """
+        Financials known at each date.
+        Args:
+        - tickers (list): Tickers to look up.
+        - dates: One date for all tickers, or one per ticker.
+        - columns (list): Value columns to return, all by default.
+        Returns:
+        - rows (pd.DataFrame): One row per ticker, in input order, with the period and report date
+          the values come from (NaN where nothing had been reported yet).
+        """
+        tickers = np.asarray(tickers, dtype=str)
+        dates = np.broadcast_to(_days(np.atleast_1d(dates)), tickers.shape)
+
+        code = np.searchsorted(self.companies, tickers)
+        if len(self.companies):
+            code = np.minimum(code, len(self.companies) - 1)
+            known = self.companies[code] == tickers
+        else:
+            known = np.zeros(tickers.shape, dtype=bool)
+        position = np.searchsorted(self.keys, code * _DAYS + dates, side="right") - 1
+        found = known & (position >= 0)
+        found[found] = self.codes[position[found]] == code[found]
+
+        # -1 is not a row label, so reindex() leaves tickers with nothing reported as NaN
+        rows = np.full(tickers.shape, -1)
+        rows[found] = self.current[position[found]]
+        columns = list(columns or [col for col in self.panel.columns if col not in KEY_COLUMNS])
+        values = self.panel[["Period", "Report Date"] + columns].reindex(rows).reset_index(drop=True)
+        values.insert(0, "Company", tickers)
+        values.insert(1, "As Of", pd.to_datetime(dates.astype("datetime64[D]")))
+        return values
+
+    def get(self, ticker, as_of, columns=None):
+        """
+        One ticker's values known at as_of as a dict (None if nothing was reported yet).
+        """
+        row = self.as_of([ticker], as_of, columns).iloc[0]
+        if pd.isna(row["Period"]):
+            return None
+        return row.drop(["Company", "As Of"]).to_dict()
+
+    def history(self, ticker):
+        """
+        Every reported version of one ticker's periods.
+        """
+        return self.panel[self.panel["Company"] == ticker].reset_index(drop=True)
+
+
+def load_panel(path=PANEL_PATH):
+    """
+    Shared panel index, rebuilt when the panel file changes.
+    """
+    global _panel, _panel_mtime
+    mtime = os.path.getmtime(path)
+    if _panel is None or mtime != _panel_mtime:
+        _panel, _panel_mtime = FinancialsPanel.load(path), mtime
+    return _panel
+
+
+def benchmark(n_tickers=10_000, n_years=5, revisions=0.1, queries=10_000, seed=0):
+    """
+    Time as-of lookups for one date across n_tickers on a synthetic panel.
+    """
+    rng = np.random.default_rng(seed)
+    periods = pd.to_datetime([f"{2025 - i}-03-31" for i in range(n_years)])
+    panel = pd.DataFrame({
+        "Company": np.repeat([f"T{i:05d}.NS" for i in range(n_tickers)], n_years),
+        "Period": np.tile(periods, n_tickers),
+    })
+    panel["Report Date"] = panel["Period"] + FILING_LAG + pd.to_timedelta(rng.integers(0, 60, len(panel)), unit="D")
+    restated = panel.sample(frac=revisions, random_state=seed).copy()
+    restated["Report Date"] += pd.Timedelta(days=200)
+    panel = pd.concat([panel, restated], ignore_index=True)
+    for col in ["Net Profit Margin %", "Return on Equity %", "Return on Assets %", "Current Ratio",
+                "Asset Turnover Ratio", "Debt Equity Ratio", "Debt To Asset Ratio", "Interest Coverage Ratio"]:
+        panel[col] = rng.normal(size=len(panel))
+
+    start = time.perf_counter()
+    index = FinancialsPanel(panel)
+    built = time.perf_counter() - start
+    tickers = rng.choice(index.companies, queries)
+    start = time.perf_counter()
+    rows = index.as_of(tickers, "2023-12-31")
+    elapsed = time.perf_counter() - start
+    print(f"Panel of {len(panel):,} rows indexed in {built * 1000:.1f} ms; "
+          f"as-of lookup of {queries:,} tickers in {elapsed * 1000:.1f} ms ({rows['Period'].notna().sum():,} found)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Point-in-time financials panel")
+    parser.add_argument("tickers", nargs="*", help="Tickers to look up (the panel is filled by ratio_pipeline.py)")
+    parser.add_argument("--as-of", default=None, help="Date, today by default")
+    parser.add_argument("--bench", type=int, metavar="TICKERS", help="Benchmark as-of lookups on a synthetic panel")
+    args = parser.parse_args()
+
+    if args.bench:
+        benchmark(args.bench, queries=args.bench)
+    elif args.tickers:
+        rows = load_panel().as_of(args.tickers, args.as_of or pd.Timestamp.now())
+        print(rows.T.to_string())
@@ -0,0 +1,195 @@
+import os
+import re
+import time
+import random
+import asyncio
+import threading
+from collections import deque
+
+# Concurrency the limiter starts at and moves between
+INITIAL_CONCURRENCY = 4
+MAX_CONCURRENCY = 64
+# AIMD: +1 in-flight slot per window of successful requests, halved on throttling
+DECREASE_FACTOR = 0.5
+DECREASE_COOLDOWN = 1.0  # seconds; one throttling episode only halves once
+
+# Provisioned deployment quota, enforced client side and split between shard workers
+# (0 = unknown, only the rate limit headers are followed)
+REQUESTS_PER_MINUTE = int(os.environ.get("LLM_REQUESTS_PER_MINUTE", 0))
+TOKENS_PER_MINUTE = int(os.environ.get("LLM_TOKENS_PER_MINUTE", 0))
+QUOTA_WINDOW = 60.0
+
+# How long a remaining-budget header is trusted when the response carries no reset time
+BUDGET_REFRESH = 1.0
+POLL_INTERVAL = 0.01
+
+# Retries of 429 / 5xx / connection errors
+MAX_RETRIES = 6
+BACKOFF_BASE = 0.5
+BACKOFF_CAP = 30.0
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+def estimate_tokens(messages, max_tokens=None):
+    """
+    Tokens a request counts against the quota: prompt (about 4 characters per token plus a few
+    per message) and the completion budget, which Azure reserves up front.
+    """
+    prompt = sum(len(str(message.get("content", ""))) // 4 + 4 for message in messages)
+    return prompt + (max_tokens or 0)
+
+
+def parse_duration(value):
+    """
+    Seconds from a rate limit reset header: "20ms", "1s", "6m0s" or a plain number of seconds.
+    """
+    if value is None:
+        return None
+    value = str(value).strip()
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    units = {"ms": 0.001, "s": 1, "m": 60, "h": 3600}
+    parts = re.findall(r"([\d.]+)(ms|s|m|h)", value)
+    return sum(float(number) * units[unit] for number, unit in parts) if parts else None
+
+
+def retry_after(headers):
+    if headers is None:
+        return None
+    if headers.get("retry-after-ms"):
+        return float(headers["retry-after-ms"]) / 1000
+    return parse_duration(headers.get("retry-after"))
+
+
+def backoff_delay(attempt, headers=None):
+    """
+    The server's retry-after if given, else exponential backoff with full jitter.
+    """
+    delay = retry_after(headers)
+    if delay is not None:
+        return delay + random.uniform(0, BACKOFF_BASE)
+    return random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * 2 ** attempt))
+
+
+class AdaptiveLimiter:
+    """
+    Client-side limiter for one deployment, shared by every engine in the process.
+
+    Concurrency follows AIMD: each success grows the in-flight limit by 1/limit (about one slot
+    per round of requests), a 429 halves it. Until the first 429 it grows by a whole slot per
+    success instead (slow start), so an unthrottled deployment reaches full concurrency quickly.
+    Requests also wait while the budget reported in the x-ratelimit-remaining-requests / -tokens
+    headers can't cover their estimated tokens, and everyone pauses for a retry-after. With a
+    provisioned quota (requests / tokens per minute) requests are also kept within it over a
+    sliding minute, which is how each shard worker stays within its slice of the budget. State
+    is guarded by a thread lock and waiting is plain polling, so one limiter works across threads
+    and event loops.
+    """
+
+    def __init__(self, initial=INITIAL_CONCURRENCY, maximum=MAX_CONCURRENCY,
+                 requests_per_minute=REQUESTS_PER_MINUTE, tokens_per_minute=TOKENS_PER_MINUTE):
+        self.limit = float(min(initial, maximum))
+        self.maximum = maximum
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.window = deque()  # (time, tokens) of requests sent in the last QUOTA_WINDOW
+        self.window_tokens = 0
+        self.in_flight = 0
+        self.blocked_until = 0.0
+        self.remaining_requests = None
+        self.remaining_tokens = None
+        self.budget_reset_at = 0.0
+        self.last_decrease = 0.0
+        self.slow_start = True
+        self.stats = {"requests": 0, "throttled": 0, "errors": 0}
+        self.lock = threading.Lock()
+
+    def _wait_time(self, now, tokens):
+        if now < self.blocked_until:
+            return self.blocked_until - now
+        if self.in_flight >= int(self.limit):
+            return POLL_INTERVAL
+        if now >= self.budget_reset_at:
+            # Budget reading is stale; go ahead and let the next response refresh it
+            self.remaining_requests = self.remaining_tokens = None
+        if (self.remaining_requests is not None and self.remaining_requests < 1) or \
+                (self.remaining_tokens is not None and self.remaining_tokens < tokens):
+            return max(self.budget_reset_at - now, POLL_INTERVAL)
+        if self.requests_per_minute or self.tokens_per_minute:
+            while self.window and self.window[0][0] <= now - QUOTA_WINDOW:
+                self.window_tokens -= self.window.popleft()[1]
+            if self.window and ((self.requests_per_minute and len(self.window) >= self.requests_per_minute) or
+                                (self.tokens_per_minute and self.window_tokens + tokens > self.tokens_per_minute)):
+                return max(self.window[0][0] + QUOTA_WINDOW - now, POLL_INTERVAL)
+        return 0
+
+    async def acquire(self, tokens=0):
+        """
+        Wait for an in-flight slot and enough request/token budget.
+        """
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                wait = self._wait_time(now, tokens)
+                if wait <= 0:
+                    if self.requests_per_minute or self.tokens_per_minute:
+                        self.window.append((now, tokens))
+                        self.window_tokens += tokens
+                    self.in_flight += 1
+                    self.stats["requests"] += 1
+                    if self.remaining_requests is not None:
+                        self.remaining_requests -= 1
+                    if self.remaining_tokens is not None:
+                        self.remaining_tokens -= tokens
+                    return
+            await asyncio.sleep(min(wait, 1.0))
+
+    def release(self, headers=None, status=None):
+        """
+        Record the outcome of a request: its rate limit headers and HTTP status (None if it never
+        got a response).
+        """
+        with self.lock:
+            now = time.monotonic()
+            self.in_flight -= 1
+            if headers is not None:
+                self._read_budget(headers, now)
+
+            if status == 429:
+                self.stats["throttled"] += 1
+                self.slow_start = False
+                if now - self.last_decrease >= DECREASE_COOLDOWN:
+                    self.limit = max(1.0, self.limit * DECREASE_FACTOR)
+                    self.last_decrease = now
+                self.blocked_until = max(self.blocked_until, now + (retry_after(headers) or BACKOFF_BASE))
+            elif status is None or status >= 500:
+                self.stats["errors"] += 1
+            else:
+                self.limit = min(float(self.maximum), self.limit + (1 if self.slow_start else 1 / self.limit))
+
+    def _read_budget(self, headers, now):
+        requests = headers.get("x-ratelimit-remaining-requests")
+        tokens = headers.get("x-ratelimit-remaining-tokens")
+        if requests is None and tokens is None:
+            return
+        # Requests still in flight were admitted against an older reading; count them again
+        self.remaining_requests = int(requests) - self.in_flight if requests is not None else None
+        self.remaining_tokens = int(tokens) if tokens is not None else None
+        reset = max(parse_duration(headers.get("x-ratelimit-reset-requests")) or 0,
+                    parse_duration(headers.get("x-ratelimit-reset-tokens")) or 0)
+        self.budget_reset_at = now + (reset or BUDGET_REFRESH)
+
+
+def get_limiter(key):
+    """
+    The process-wide limiter of one deployment (key: endpoint and deployment name).
+    """
+    with _limiters_lock:
+        limiter = _limiters.get(key)
+        if limiter is None:
+            limiter = _limiters[key] = AdaptiveLimiter()
+        return limiter
@@ -0,0 +1,159 @@
+import os
+import json
+import argparse
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from statements_store import STATEMENTS_PATH, latest_versions, read_statements
+from panel_store import PANEL_PATH, update_panel
+
+CLEANED_PATH = "output/Company_Financials_Cleaned.xlsx"
+# Every ticker and year with its ratios; only tickers whose statements changed are recomputed
+RATIOS_PATH = "output/company_ratios.parquet"
+# Statements version each ticker's ratios were computed from, kept in the ratios file metadata
+VERSIONS_KEY = b"statement_versions"
+
+# Output column -> provider line items to take it from, first one present wins
+LINE_ITEMS = {
+    "Net Income Continuous Operations": ["Net Income Continuous Operations", "Net Income"],
+    "Total Revenue": ["Total Revenue", "Operating Revenue"],
+    "Stockholders Equity": ["Stockholders Equity", "Common Stock Equity"],
+    "Total Debt": ["Total Debt"],
+    "Current Liabilities": ["Current Liabilities"],
+    "EBIT": ["EBIT"],
+    "Current Assets": ["Current Assets"],
+    "Total Assets": ["Total Assets"],
+    "Inventory": ["Inventory"],
+    "Interest Expense": ["Interest Expense", "Interest Expense Non Operating"],
+}
+
+# Ratio column -> (numerator, denominator, scale)
+RATIOS = {
+    "Net Profit Margin %": ("Net Income Continuous Operations", "Total Revenue", 100),
+    "Return on Equity %": ("Net Income Continuous Operations", "Stockholders Equity", 100),
+    "Return on Assets %": ("Net Income Continuous Operations", "Total Assets", 100),
+    "Asset Turnover Ratio": ("Total Revenue", "Total Assets", 1),
+    "Current Ratio": ("Current Assets", "Current Liabilities", 1),
+    "Debt Equity Ratio": ("Total Debt", "Stockholders Equity", 1),
+    "Debt To Asset Ratio": ("Total Debt", "Total Assets", 1),
+    "Interest Coverage Ratio": ("EBIT", "Interest Expense", 1),
+}
+
+ID_COLUMNS = ["Company", "Industry", "Sector", "Financial Year"]
+COLUMNS = ID_COLUMNS + list(LINE_ITEMS) + list(RATIOS)
+
+
+def safe_divide(numerator, denominator):
+    """
+    Element-wise ml_rule.safe_div: NaN where the denominator is zero or missing.
+    """
+    numerator = np.asarray(numerator, dtype=float)
+    denominator = np.asarray(denominator, dtype=float)
+    out = np.full(np.broadcast(numerator, denominator).shape, np.nan)
+    valid = (denominator != 0) & ~np.isnan(denominator)
+    np.divide(numerator, denominator, out=out, where=valid)
+    return out
+
+
+def compute_ratios(rows):
+    """
+    Line items and ratios of every (ticker, period) in one pass over whole columns.
+    Args:
+    - rows (pd.DataFrame): Long statement rows (Ticker, Period, Item, Value), see statements_store.
+    Returns:
+    - ratios (pd.DataFrame): One row per ticker and period end, COLUMNS plus Period.
+    """
+    wanted = {item for items in LINE_ITEMS.values() for item in items}
+    rows = rows[rows["Item"].isin(wanted)]
+    if rows.empty:
+        return pd.DataFrame(columns=COLUMNS + ["Period"])
+    wide = rows.pivot_table(index=["Ticker", "Period"], columns="Item", values="Value", aggfunc="last")
+
+    out = pd.DataFrame(index=wide.index)
+    for column, items in LINE_ITEMS.items():
+        values = np.full(len(wide), np.nan)
+        # Fill from the fallbacks backwards so the preferred item overrides them
+        for item in reversed(items):
+            if item in wide.columns:
+                candidate = wide[item].to_numpy(dtype=float)
+                values = np.where(np.isnan(candidate), values, candidate)
+        out[column] = values
+    for column, (numerator, denominator, scale) in RATIOS.items():
+        out[column] = safe_divide(out[numerator], out[denominator]) * scale
+
+    out = out.reset_index().rename(columns={"Ticker": "Company"})
+    out["Period"] = pd.to_datetime(out["Period"])
+    out["Financial Year"] = out["Period"].dt.year
+    # Not part of the statements
+    out["Industry"] = None
+    out["Sector"] = None
+    return out[COLUMNS + ["Period"]]
+
+
+def update_ratios(statements_path=STATEMENTS_PATH, ratios_path=RATIOS_PATH, force=False):
+    """
+    Bring the ratios table in line with the statements dataset, recomputing only tickers whose
+    statements version changed (and dropping tickers no longer in the dataset).
+    Returns:
+    - ratios (pd.DataFrame): All tickers and periods.
+    - changed (int): Number of tickers recomputed.
+    """
+    versions = latest_versions(statements_path)
+    previous = None
+    if not force and os.path.exists(ratios_path):
+        table = pq.read_table(ratios_path)
+        known = json.loads((table.schema.metadata or {}).get(VERSIONS_KEY, b"{}"))
+        previous = table.to_pandas()
+        changed = [ticker for ticker, version in versions.items() if known.get(ticker) != version]
+        if not changed and known.keys() == versions.keys():
+            return previous, 0
+        previous = previous[previous["Company"].isin(versions) & ~previous["Company"].isin(changed)]
+    else:
+        changed = list(versions)
+
+    rows = read_statements(statements_path, tickers=changed if previous is not None else None,
+                           columns=["Ticker", "Period", "Item", "Value"])
+    fresh = compute_ratios(rows)
+    ratios = pd.concat([previous, fresh], ignore_index=True) if previous is not None else fresh
+    ratios = ratios.sort_values(["Company", "Period"], ascending=[True, False], ignore_index=True)
+
+    folder = os.path.dirname(ratios_path)
+    if folder:
+        os.makedirs(folder, exist_ok=True)
+    table = pa.Table.from_pandas(ratios, preserve_index=False)
+    table = table.replace_schema_metadata({**(table.schema.metadata or {}), VERSIONS_KEY: json.dumps(versions).encode()})
+    pq.write_table(table, ratios_path + ".tmp")
+    os.replace(ratios_path + ".tmp", ratios_path)
+    return ratios, len(changed)
+
+
+def build_cleaned(statements_path=STATEMENTS_PATH, output_path=CLEANED_PATH, year=None, force=False):
+    """
+    Write Company_Financials_Cleaned: each company's latest period, or a given period end year
+    (e.g. year=2024 for Company_Financials_FY2024).
+    """
+    ratios, changed = update_ratios(statements_path, force=force)
+    print(f"{ratios['Company'].nunique()} companies, {changed} recomputed")
+    if changed or not os.path.exists(PANEL_PATH):
+        print(f"{update_panel(ratios)} new or revised periods added to {PANEL_PATH}")
+    if year is not None:
+        cleaned = ratios[ratios["Financial Year"] == year]
+    else:
+        # Sorted latest period first within each company
+        cleaned = ratios.drop_duplicates("Company")
+    cleaned = cleaned.drop_duplicates("Company")[COLUMNS]
+    cleaned.to_excel(output_path, index=False)
+    print(f"Saved {len(cleaned)} rows to {output_path}")
+    return cleaned
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build Company_Financials_Cleaned from the scraped statements")
+    parser.add_argument("--statements", default=STATEMENTS_PATH)
+    parser.add_argument("--output", default=CLEANED_PATH)
+    parser.add_argument("--year", type=int, help="Period end year instead of each company's latest period")
+    parser.add_argument("--force", action="store_true", help="Recompute every ticker")
+    args = parser.parse_args()
+
+    build_cleaned(args.statements, args.output, args.year, args.force)
@@ -0,0 +1,339 @@
+import os
+import re
+import json
+import math
+import time
+import asyncio
+import argparse
+import numpy as np
+import pandas as pd
+from llm_engine import GenerationEngine, make_client
+from rate_limiter import AdaptiveLimiter
+
+# Per request limits: the prompt (instructions + packed rows) and the completion
+MAX_INPUT_TOKENS = 24000
+MAX_OUTPUT_TOKENS = 4096
+# Hard cap on rows per request; very long structured answers get sloppier
+MAX_BATCH_ROWS = 200
+# Headroom on the estimated completion size of a row
+OUTPUT_MARGIN = 1.3
+# Rounds of re-requesting missing or invalid rows, with batches halved each round
+MAX_ROUNDS = 4
+# Stream answers and take each row as soon as it is complete
+STREAM = True
+
+# Synthetic loan columns of the generators with their valid ranges
+LOAN_FIELDS = {
+    "Loan Value": (1_000_000, 500_000_000),
+    "Collateral Value": (1_000_000, 550_000_000),
+    "Loan Tenure": (6, 240),
+    "Credit Score": (300, 900),
+    "Risk Score": (0, 100),
+}
+
+SYSTEM_PROMPT = "You generate synthetic loan and risk data."
+
+
+def _tokens(text):
+    # Same rough estimate as rate_limiter.estimate_tokens
+    return len(text) // 4 + 1
+
+
+def row_schema(fields):
+    """
+    Structured output format: {"rows": [{"id": ..., <field>: number, ...}, ...]}.
+    """
+    row = {
+        "type": "object",
+        "properties": {"id": {"type": "integer"}, **{field: {"type": "number"} for field in fields}},
+        "required": ["id", *fields],
+        "additionalProperties": False,
+    }
+    return {"type": "json_schema", "json_schema": {"name": "rows", "strict": True, "schema": {
+        "type": "object",
+        "properties": {"rows": {"type": "array", "items": row}},
+        "required": ["rows"],
+        "additionalProperties": False,
+    }}}
+
+
+def parse_rows(content):
+    """
+    Row objects of a structured response. A malformed or truncated response still yields every
+    complete row object in it.
+    """
+    try:
+        rows = json.loads(content)["rows"]
+        if isinstance(rows, list):
+            return [row for row in rows if isinstance(row, dict)]
+    except (json.JSONDecodeError, KeyError, TypeError):
+        pass
+    rows = []
+    for match in re.findall(r"\{[^{}]*\}", content or ""):
+        try:
+            rows.append(json.loads(match))
+        except json.JSONDecodeError:
+            continue
+    return rows
+
+
+class RowStreamParser:
+    """
+    Picks the rows out of a streamed structured response as they complete: every innermost JSON
+    object ({...} without nested objects) is emitted as soon as its closing brace arrives,
+    whatever encloses it.
+    """
+
+    def __init__(self):
+        self.text = ""
+        self.position = 0
+        self.open = []  # [start, has nested object] per open brace
+        self.in_string = self.escaped = False
+
+    def feed(self, text):
+        """
+        Add the next piece of the response. Returns the rows completed by it.
+        """
+        self.text += text
+        rows = []
+        for i in range(self.position, len(self.text)):
+            char = self.text[i]
+            if self.in_string:
+                if self.escaped:
+                    self.escaped = False
+                elif char == "\\":
+                    self.escaped = True
+                elif char == '"':
+                    self.in_string = False
+            elif char == '"':
+                self.in_string = True
+            elif char == "{":
+                if self.open:
+                    self.open[-1][1] = True
+                self.open.append([i, False])
+            elif char == "}" and self.open:
+                start, nested = self.open.pop()
+                if not nested:
+                    try:
+                        row = json.loads(self.text[start:i + 1])
+                    except json.JSONDecodeError:
+                        continue
+                    if isinstance(row, dict):
+                        rows.append(row)
+        self.position = len(self.text)
+        return rows
+
+
+class RowBatcher:
+    """
+    Generates new columns for a table of rows with as few requests as the token budget allows.
+
+    Rows are packed greedily into batches that fit MAX_INPUT_TOKENS of prompt and
+    MAX_OUTPUT_TOKENS of answer, each batch asks for a JSON-schema response with one object per
+    row id, and the batches of a round run concurrently through the GenerationEngine. Answers are
+    streamed and every row is validated and committed as soon as it is complete, so the first
+    rows are usable long before a batch finishes and a batch failing late keeps its earlier rows.
+    Rows that come back missing, duplicated or out of range are re-requested in batches half the
+    size, for up to MAX_ROUNDS rounds.
+    """
+
+    def __init__(self, instructions, fields=None, engine=None, system=SYSTEM_PROMPT, validate=None,
+                 max_input_tokens=MAX_INPUT_TOKENS, max_output_tokens=MAX_OUTPUT_TOKENS,
+                 max_batch_rows=MAX_BATCH_ROWS, max_rounds=MAX_ROUNDS, stream=STREAM):
+        self.instructions = instructions
+        self.fields = dict(fields or LOAN_FIELDS)
+        self.engine = engine or GenerationEngine()
+        self.system = system
+        self.validate = validate
+        self.max_input_tokens = max_input_tokens
+        self.max_output_tokens = max_output_tokens
+        self.max_batch_rows = max_batch_rows
+        self.max_rounds = max_rounds
+        self.stream = stream
+        self.response_format = row_schema(self.fields)
+
+        widest = {"id": 10**6, **{field: float(high) for field, (low, high) in self.fields.items()}}
+        self.output_row_tokens = _tokens(json.dumps(widest)) * OUTPUT_MARGIN
+        self.prompt_tokens = _tokens(self.system) + _tokens(self.instructions) + 50
+        self.stats = {"requests": 0, "rows": 0, "resliced": 0, "failed": 0, "first_row": None}
+
+    def _lines(self, rows):
+        records = rows.astype(object).where(rows.notna(), None).to_dict("records")
+        return [json.dumps({"id": i, **record}, default=str) for i, record in enumerate(records)]
+
+    def pack(self, ids, row_limit=None):
+        """
+        Split row ids into consecutive batches within the token budget and row_limit.
+        """
+        row_limit = min(row_limit or self.max_batch_rows, self.max_batch_rows)
+        batches, batch, used = [], [], self.prompt_tokens
+        for i in ids:
+            tokens = _tokens(self.lines[i])
+            if batch and (len(batch) >= row_limit or used + tokens > self.max_input_tokens
+                          or (len(batch) + 1) * self.output_row_tokens > self.max_output_tokens):
+                batches.append(batch)
+                batch, used = [], self.prompt_tokens
+            batch.append(i)
+            used += tokens
+        if batch:
+            batches.append(batch)
+        return batches
+
+    def request(self, batch):
+        """
+        Messages and completion parameters of one batch.
+        """
+        prompt = (f"{self.instructions}\n\n"
+                  f"Rows, one JSON object per line. Answer with one object per id, with the fields "
+                  f"{', '.join(self.fields)}:\n" + "\n".join(self.lines[i] for i in batch))
+        messages = [{"role": "system", "content": self.system}, {"role": "user", "content": prompt}]
+        max_tokens = min(self.max_output_tokens, int(len(batch) * self.output_row_tokens) + 50)
+        return messages, {"max_tokens": max_tokens, "response_format": self.response_format}
+
+    def accept(self, row, expected):
+        """
+        Values of a response row, or None if it isn't a valid answer for one of the expected ids.
+        """
+        i = row.get("id")
+        if not isinstance(i, int) or i not in expected:
+            return None
+        values = {}
+        for field, (low, high) in self.fields.items():
+            value = row.get(field)
+            if isinstance(value, bool) or not isinstance(value, (int, float)) or not math.isfinite(value):
+                return None
+            if not low <= value <= high:
+                return None
+            values[field] = float(value)
+        if self.validate is not None and not self.validate(values):
+            return None
+        return values
+
+    def _commit(self, i, values):
+        self.values[i] = list(values.values())
+        if self.stats["first_row"] is None:
+            self.stats["first_row"] = time.perf_counter() - self.start
+        if self.on_row is not None:
+            self.on_row(i, values)
+
+    async def _batch(self, semaphore, batch, params):
+        messages, request_params = self.request(batch)
+        expected, results = set(batch), {}
+
+        def take(rows):
+            for row in rows:
+                values = self.accept(row, expected)
+                if values is not None and row["id"] not in results:
+                    results[row["id"]] = values
+                    self._commit(row["id"], values)
+
+        async with semaphore:
+            self.stats["requests"] += 1
+            try:
+                if self.stream:
+                    parser = RowStreamParser()
+                    async for text in self.engine.stream(messages, **request_params, **params):
+                        take(parser.feed(text))
+                else:
+                    take(parse_rows(await self.engine.complete(messages, **request_params, **params)))
+            except Exception as e:
+                print(f"Batch of {len(batch)} rows failed after {len(results)} rows: {e!r}")
+        if len(results) < len(batch):
+            # Don't let a partial answer be served from the cache if this exact batch is retried
+            self.engine.forget(messages, **request_params, **params)
+        return batch, results
+
+    async def generate(self, rows, on_row=None, **params):
+        """
+        Generate self.fields for every row.
+        Args:
+        - rows (pd.DataFrame): Input features, one row per record.
+        - on_row (callable): Called with (position, values) as soon as a row has a valid answer.
+        - params: Completion parameters shared by all requests (temperature, seed, ...).
+        Returns:
+        - values (pd.DataFrame): The generated fields, indexed like rows; NaN where no valid
+          answer came back after max_rounds.
+        """
+        self.lines = self._lines(rows)
+        self.values = np.full((len(rows), len(self.fields)), np.nan)
+        self.on_row = on_row
+        semaphore = asyncio.Semaphore(self.engine.concurrency)
+        batches = self.pack(range(len(rows)))
+        self.start = time.perf_counter()
+
+        for round_number in range(1, self.max_rounds + 1):
+            if not batches:
+                break
+            if round_number > 1:
+                self.stats["resliced"] += sum(len(batch) for batch in batches)
+            done = await asyncio.gather(*(self._batch(semaphore, batch, params) for batch in batches))
+            retry = []
+            for batch, results in done:
+                missing = [i for i in batch if i not in results]
+                if missing:
+                    retry += self.pack(missing, row_limit=max(1, len(batch) // 2))
+            print(f"Round {round_number}: {len(batches)} requests, "
+                  f"{sum(len(batch) for batch in batches) - sum(len(batch) for batch in retry)} rows ok, "
+                  f"{sum(len(batch) for batch in retry)} to retry ({time.perf_counter() - self.start:.1f}s)")
+            batches = retry
+
+        self.stats["rows"] = len(rows)
+        self.stats["failed"] = int(np.isnan(self.values).any(axis=1).sum())
+        return pd.DataFrame(self.values, columns=list(self.fields), index=rows.index)
+
+    def run(self, rows, on_row=None, **params):
+        """
+        Synchronous generate() for the scripts.
+        """
+        return asyncio.run(self._run_and_close(rows, on_row, **params))
+
+    async def _run_and_close(self, rows, on_row, **params):
+        try:
+            return await self.generate(rows, on_row, **params)
+        finally:
+            await self.engine.client.close()
+
+
+def fill_rows(rows, instructions, fields=None, **params):
+    """
+    The rows with the generated fields filled in, see RowBatcher.generate.
+    """
+    batcher = RowBatcher(instructions, fields)
+    values = batcher.run(rows, **params)
+    print(f"{batcher.stats['rows']} rows in {batcher.stats['requests']} requests, "
+          f"{batcher.stats['resliced']} re-requested, {batcher.stats['failed']} without a valid answer")
+    return rows.assign(**values)
+
+
+def benchmark(url, n_rows=1000):
+    """
+    Requests, time to the first row and total time per row vs batched vs batched and streamed
+    generation against an OpenAI compatible server (e.g. fake_llm_server.py --drop-rate 0.05).
+    """
+    rng = np.random.default_rng(0)
+    rows = pd.DataFrame(rng.normal(size=(n_rows, 8)).round(3), columns=[
+        "Net Profit Margin %", "Return on Equity %", "Return on Assets %", "Current Ratio",
+        "Asset Turnover Ratio", "Debt Equity Ratio", "Debt To Asset Ratio", "Interest Coverage Ratio"])
+    instructions = "Generate realistic loan and risk details for each company."
+    for label, limit, stream in [("per row", 1, False), ("batched", MAX_BATCH_ROWS, False),
+                                 ("batched, streamed", MAX_BATCH_ROWS, True)]:
+        limiter = AdaptiveLimiter()
+        engine = GenerationEngine(make_client(azure_endpoint=url, api_key="fake"), limiter=limiter, cache=False)
+        batcher = RowBatcher(instructions, engine=engine, max_batch_rows=limit, stream=stream)
+        start = time.perf_counter()
+        values = batcher.run(rows, temperature=0.6)
+        elapsed = time.perf_counter() - start
+        print(f"{label}: {n_rows} rows in {elapsed:.2f}s with {batcher.stats['requests']} requests, "
+              f"first row after {batcher.stats['first_row']:.2f}s, {batcher.stats['resliced']} re-requested, "
+              f"{values.notna().all(axis=1).sum()} complete\n")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark batched row generation against a local fake server")
+    parser.add_argument("--url", default="http://localhost:8001", help="Endpoint of fake_llm_server.py")
+    parser.add_argument("--rows", type=int, default=1000)
+    args = parser.parse_args()
+
+    os.environ.setdefault("AZURE_OPENAI_DEPLOYMENT", "fake")
+    os.environ.setdefault("API_VERSION_GA", "2024-10-21")
+    benchmark(args.url, args.rows)
@@ -0,0 +1,96 @@
+import os
+import json
+import threading
+from llm_cache import cache_key
+
+# Per-script journals of generated rows
+JOURNAL_DIR = "output/journals"
+
+
+def request_hash(messages, **params):
+    """
+    Fingerprint of a row's request, so a journaled result is only reused for the same prompt.
+    """
+    return cache_key(None, messages, **params)[:16]
+
+
+def read_journal(path):
+    """
+    Stream the complete entries of a journal: dicts with the row, request hash and value.
+    Stops at a partially written last line.
+    """
+    if not os.path.exists(path):
+        return
+    with open(path, "rb") as f:
+        for line in f:
+            if not line.endswith(b"\n"):
+                return
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                return
+
+
+class RowJournal:
+    """
+    Append-only JSONL journal of finished rows. Every row is written and fsynced as soon as it
+    completes, so a crash or Ctrl-C loses at most the rows still in flight; on restart the rows
+    already journaled for the same request are skipped.
+    """
+
+    def __init__(self, path):
+        folder = os.path.dirname(path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        self.path = path
+        self.entries = set()
+        self.lock = threading.Lock()
+
+        size = 0
+        if os.path.exists(path):
+            with open(path, "rb") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line) if line.endswith(b"\n") else None
+                    except json.JSONDecodeError:
+                        entry = None
+                    if entry is None:
+                        break
+                    self.entries.add((entry["row"], entry["hash"]))
+                    size += len(line)
+            if os.path.getsize(path) > size:
+                # Drop a line cut short by a crash, so the next append starts on a fresh line
+                with open(path, "r+b") as f:
+                    f.truncate(size)
+        self.file = open(path, "a", encoding="utf-8")
+
+    def __contains__(self, key):
+        return key in self.entries
+
+    def append(self, row, request_hash, value):
+        line = json.dumps({"row": row, "hash": request_hash, "value": value}, default=str)
+        with self.lock:
+            self.file.write(line + "\n")
+            self.file.flush()
+            os.fsync(self.file.fileno())
+            self.entries.add((row, request_hash))
+
+    def results(self, hashes, rows=None):
+        """
+        Values for the given request hashes, assembled in one pass over the journal (None where a
+        row has no entry; a later entry for the same row wins).
+        Args:
+        - hashes (list): Request hash per row.
+        - rows (list): Row ids the values were journaled under, their positions by default.
+        """
+        self.file.flush()
+        positions = {row: i for i, row in enumerate(rows if rows is not None else range(len(hashes)))}
+        results = [None] * len(hashes)
+        for entry in read_journal(self.path):
+            i = positions.get(entry["row"])
+            if i is not None and hashes[i] == entry["hash"]:
+                results[i] = entry["value"]
+        return results
+
+    def close(self):
+        self.file.close()
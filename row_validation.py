@@ -0,0 +1,117 @@
+import numpy as np
+import pandas as pd
+from llm_engine import regenerate
+from row_batcher import LOAN_FIELDS
+
+# Valid range of every synthetic column, under the names the generators use
+RANGES = {**LOAN_FIELDS, "Loan Tenure (Months)": LOAN_FIELDS["Loan Tenure"]}
+INTEGER_COLUMNS = ["Loan Tenure", "Loan Tenure (Months)", "Credit Score"]
+
+# Loan to Collateral Ratio must match Loan Value / Collateral Value within these tolerances
+LTC_COLUMN = "Loan to Collateral Ratio"
+LTC_RELATIVE_TOLERANCE = 0.02
+LTC_ABSOLUTE_TOLERANCE = 0.005
+
+# Validation passes; each re-requests only the rows that failed the previous one
+VALIDATION_ROUNDS = 2
+
+
+def coerce_numeric(values):
+    """
+    Numbers from model output: "₹1,00,00,000", " 750 " and 750.0 all become floats, anything
+    else NaN.
+    """
+    if pd.api.types.is_numeric_dtype(values):
+        return values.astype(float)
+    text = values.astype("string").str.replace(r"[^\d.eE+-]", "", regex=True)
+    return pd.to_numeric(text, errors="coerce").astype(float)
+
+
+def pipe_frame(results, columns):
+    """
+    Frame of pipe-separated answers ("10000000 | 15000000 | 120 | 750 | 20"), one per row.
+    Rows with a different number of fields (or no answer) come out all NaN.
+    """
+    answers = pd.Series(results, dtype="string").str.strip()
+    well_formed = answers.str.count(r"\|").eq(len(columns) - 1).fillna(False).to_numpy(dtype=bool)
+    frame = pd.DataFrame(np.nan, index=answers.index, columns=columns, dtype=object)
+    if well_formed.any():
+        parts = answers[well_formed].str.split("|", expand=True)
+        frame.loc[well_formed, columns] = parts.to_numpy()
+    return frame
+
+
+def validate_frame(frame, ranges=None):
+    """
+    Check every synthetic column of a generated frame in one vectorized pass.
+    Args:
+    - frame (pd.DataFrame): Generated rows; columns named in ranges are checked, others kept as is.
+    - ranges (dict): Column -> (low, high), RANGES by default.
+    Returns:
+    - frame (pd.DataFrame): The frame with the checked columns coerced to numbers (whole numbers
+      for tenure and credit score).
+    - failures (pd.Series): Reasons per failing row, indexed like the frame (empty if all pass).
+    """
+    ranges = ranges or RANGES
+    frame = frame.copy()
+    checks = {}
+    for column, (low, high) in ranges.items():
+        if column not in frame.columns:
+            continue
+        values = coerce_numeric(frame[column])
+        if column in INTEGER_COLUMNS:
+            values = values.round()
+        frame[column] = values
+        checks[f"{column} missing"] = values.isna()
+        checks[f"{column} out of range"] = (values < low) | (values > high)
+
+    if {LTC_COLUMN, "Loan Value", "Collateral Value"} <= set(frame.columns):
+        ratio = coerce_numeric(frame[LTC_COLUMN])
+        frame[LTC_COLUMN] = ratio
+        expected = frame["Loan Value"] / frame["Collateral Value"]
+        tolerance = np.maximum(LTC_RELATIVE_TOLERANCE * expected.abs(), LTC_ABSOLUTE_TOLERANCE)
+        checks[f"{LTC_COLUMN} inconsistent"] = ratio.isna() | ((ratio - expected).abs() > tolerance)
+
+    checks = pd.DataFrame(checks, index=frame.index).fillna(False).astype(bool)
+    failed = checks.any(axis=1)
+    # Joins the names of the failed checks per row without a Python loop over rows
+    failures = checks[failed].astype(object).dot(checks.columns + "; ").str.rstrip("; ")
+    for column in INTEGER_COLUMNS:
+        if column in frame.columns and column in ranges:
+            frame[column] = frame[column].astype("Int64")
+    return frame, failures
+
+
+def validate_and_regenerate(requests, results, to_frame, parse=None, rounds=VALIDATION_ROUNDS,
+                            journal=None, **params):
+    """
+    Validate generated rows and send only the failing ones back to the model, each as one more
+    request, until they pass or the rounds run out.
+    Args:
+    - requests (list): The message lists the results were generated from.
+    - results (list): Parsed results per request (None where it failed).
+    - to_frame (callable): Results list -> frame of the synthetic columns, indexed by position.
+    - parse (callable): Parser of the generator, applied to the new answers.
+    - journal (str or list): Journal of the generator, or one journal per row for a sharded run;
+      regenerated rows replace their journaled results.
+    - params: Completion parameters of the generator (temperature, max_tokens, ...).
+    Returns:
+    - frame (pd.DataFrame): Validated synthetic columns; NaN in the rows that never passed.
+    - failures (pd.Series): Reasons of the rows that never passed.
+    """
+    results = list(results)
+    frame, failures = validate_frame(to_frame(results))
+    for round_number in range(1, rounds + 1):
+        if failures.empty:
+            break
+        print(f"Validation round {round_number}: {len(failures)} rows failed, regenerating them")
+        print(failures.value_counts().head().to_string())
+        for i, result in regenerate(requests, failures.index, parse, journal=journal, **params).items():
+            results[i] = result
+        frame, failures = validate_frame(to_frame(results))
+
+    if not failures.empty:
+        print(f"{len(failures)} rows still invalid after {rounds} rounds; their values are left empty")
+        checked = [col for col in frame.columns if col in RANGES or col == LTC_COLUMN]
+        frame.loc[failures.index, checked] = pd.NA
+    return frame, failures
@@ -0,0 +1,232 @@
+import os
+import json
+import math
+import random
+import numpy as np
+import pandas as pd
+from scoring_snapshot import FEATURE_COLUMNS, FIN_WEIGHTS, REPAY_WEIGHTS, FINAL_WEIGHTS, SNAPSHOT_FORMAT, \
+    prepare_features, applicant_features
+
+STATS_PATH = "output/running_stats.json"
+
+
+class KLLSketch:
+    """
+    KLL streaming quantile sketch (Karnin, Lang, Liberty 2016).
+
+    Items live in a stack of compactors; an item at level h stands for 2**h original values.
+    When a level is full it is sorted and every other item (random offset) is promoted to the
+    next level. Updates are O(1) amortised and the sketch keeps O(k log(n/k)) items, with a rank
+    error of roughly 1.7/k (about 1% for the default k=200).
+    """
+
+    def __init__(self, k=200, seed=0):
+        self.k = k
+        self.n = 0
+        self.compactors = [[]]
+        self._rng = random.Random(seed)
+        self._size = 0
+        self._max_size = self._capacity(0)
+
+    def _capacity(self, level):
+        depth = len(self.compactors) - level - 1
+        return max(2, int(math.ceil(self.k * (2 / 3) ** depth)))
+
+    def _resize(self):
+        self._size = sum(len(c) for c in self.compactors)
+        self._max_size = sum(self._capacity(h) for h in range(len(self.compactors)))
+
+    def update(self, value):
+        self.compactors[0].append(value)
+        self.n += 1
+        self._size += 1
+        if self._size >= self._max_size:
+            self._compress()
+
+    def update_many(self, values):
+        for value in values:
+            self.update(value)
+
+    def _compress(self):
+        for h in range(len(self.compactors)):
+            if len(self.compactors[h]) >= self._capacity(h):
+                if h + 1 == len(self.compactors):
+                    self.compactors.append([])
+                items = sorted(self.compactors[h])
+                # With an odd count the largest item stays behind so no weight is lost
+                keep = items[-1:] if len(items) % 2 else []
+                pairs = items[:len(items) - len(keep)]
+                self.compactors[h + 1].extend(pairs[self._rng.randint(0, 1)::2])
+                self.compactors[h] = keep
+                # One compaction per update keeps the cost amortised O(1)
+                break
+        self._resize()
+
+    def merge(self, other):
+        while len(self.compactors) < len(other.compactors):
+            self.compactors.append([])
+        for h, items in enumerate(other.compactors):
+            self.compactors[h].extend(items)
+        self.n += other.n
+        self._resize()
+        while self._size >= self._max_size:
+            self._compress()
+
+    def _weighted(self):
+        values = np.concatenate([np.asarray(c, dtype=np.float64) for c in self.compactors])
+        weights = np.concatenate([np.full(len(c), 2.0 ** h) for h, c in enumerate(self.compactors)])
+        order = np.argsort(values, kind="stable")
+        return values[order], np.cumsum(weights[order])
+
+    def quantile(self, q):
+        """
+        Approximate q-quantile (0 <= q <= 1), NaN if the sketch is empty.
+        """
+        if self.n == 0:
+            return float("nan")
+        values, cum = self._weighted()
+        target = q * cum[-1]
+        return float(values[min(np.searchsorted(cum, target, side="left"), len(values) - 1)])
+
+    def rank(self, value):
+        """
+        Approximate fraction of values <= value.
+        """
+        if self.n == 0:
+            return float("nan")
+        values, cum = self._weighted()
+        idx = np.searchsorted(values, value, side="right")
+        return float(cum[idx - 1] / cum[-1]) if idx else 0.0
+
+    def to_dict(self):
+        return {"k": self.k, "n": self.n, "compactors": self.compactors}
+
+    @classmethod
+    def from_dict(cls, state, seed=0):
+        sketch = cls(k=state["k"], seed=seed)
+        sketch.n = state["n"]
+        sketch.compactors = [list(c) for c in state["compactors"]] or [[]]
+        sketch._resize()
+        return sketch
+
+
+class RunningStats:
+    """
+    Normalisation statistics of the rule model kept incrementally as applications are admitted:
+    exact count/min/max and a KLL sketch per feature for the median and other percentiles.
+    Missing values are skipped, like DataFrame.median does.
+    """
+
+    def __init__(self, features=FEATURE_COLUMNS, k=200):
+        self.features = list(features)
+        self.count = {col: 0 for col in self.features}
+        self.min = {col: math.inf for col in self.features}
+        self.max = {col: -math.inf for col in self.features}
+        self.sketches = {col: KLLSketch(k=k, seed=i) for i, col in enumerate(self.features)}
+
+    def admit(self, data):
+        """
+        Add one application (raw dict, LtC derived like scoring_snapshot.applicant_features).
+        """
+        features = applicant_features(data)
+        for col in self.features:
+            value = features.get(col)
+            if value is None:
+                continue
+            self.count[col] += 1
+            self.min[col] = min(self.min[col], value)
+            self.max[col] = max(self.max[col], value)
+            self.sketches[col].update(value)
+
+    def admit_frame(self, df):
+        """
+        Add many applications at once (raw DataFrame with the rule model's input columns).
+        """
+        features = prepare_features(df)
+        for col in self.features:
+            values = features[col].dropna().to_numpy(dtype=np.float64)
+            if not len(values):
+                continue
+            self.count[col] += len(values)
+            self.min[col] = min(self.min[col], float(values.min()))
+            self.max[col] = max(self.max[col], float(values.max()))
+            self.sketches[col].update_many(values.tolist())
+
+    def median(self, col):
+        return self.sketches[col].quantile(0.5)
+
+    def quantile(self, col, q):
+        return self.sketches[col].quantile(q)
+
+    def percentile_rank(self, col, value):
+        return 100 * self.sketches[col].rank(value)
+
+    def scoring_snapshot(self):
+        """
+        Scoring snapshot (see scoring_snapshot.py) from the current statistics, so score_applicant
+        and score_batch can use the live population without refitting anything.
+        Raises ValueError if a feature has no values yet, since it can't be scaled.
+        """
+        empty = [col for col in self.features if not self.count[col]]
+        if empty:
+            raise ValueError(f"No values admitted yet for {', '.join(empty)}; cannot build a scoring snapshot")
+        return {
+            "format": SNAPSHOT_FORMAT,
+            "version": f"{SNAPSHOT_FORMAT}-running-{sum(self.count.values())}",
+            "n_rows": max(self.count.values(), default=0),
+            "features": self.features,
+            "min": {col: float(self.min[col]) for col in self.features},
+            "max": {col: float(self.max[col]) for col in self.features},
+            "median": {col: self.median(col) for col in self.features},
+            "fin_weights": dict(FIN_WEIGHTS),
+            "repay_weights": dict(REPAY_WEIGHTS),
+            "final_weights": dict(FINAL_WEIGHTS),
+        }
+
+    def to_dict(self):
+        return {
+            "features": self.features,
+            "count": self.count,
+            # inf is not valid JSON; empty features are stored as None
+            "min": {col: None if math.isinf(v) else v for col, v in self.min.items()},
+            "max": {col: None if math.isinf(v) else v for col, v in self.max.items()},
+            "sketches": {col: s.to_dict() for col, s in self.sketches.items()},
+        }
+
+    @classmethod
+    def from_dict(cls, state):
+        stats = cls(features=state["features"])
+        stats.count = dict(state["count"])
+        stats.min = {col: math.inf if v is None else v for col, v in state["min"].items()}
+        stats.max = {col: -math.inf if v is None else v for col, v in state["max"].items()}
+        stats.sketches = {col: KLLSketch.from_dict(s, seed=i) for i, (col, s) in enumerate(state["sketches"].items())}
+        return stats
+
+    def save(self, path=STATS_PATH):
+        """
+        Snapshot the statistics to disk (atomic rename, safe to call while scoring).
+        """
+        folder = os.path.dirname(path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.to_dict(), f)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path=STATS_PATH):
+        """
+        Restore statistics saved with save, no history is rescanned.
+        """
+        with open(path) as f:
+            return cls.from_dict(json.load(f))
+
+    @classmethod
+    def from_frame(cls, df, k=200):
+        """
+        Seed the statistics from a reference population (raw DataFrame).
+        """
+        stats = cls(k=k)
+        stats.admit_frame(pd.DataFrame(df))
+        return stats
@@ -0,0 +1,137 @@
+import sys
+import time
+import numpy as np
+from scoring_snapshot import load_snapshot, applicant_features
+from batch_scoring import scale_matrix
+
+
+def _feature_slopes(snapshot):
+    """
+    Per feature: how much the Final Risk Score moves per unit of scaled feature (1-101 scale),
+    the raw-unit scaling factor 100 / (max - min), and the scaling bounds.
+    """
+    features = snapshot["features"]
+    final = snapshot["final_weights"]
+    bf, br = final["Financial Risk Score"], final["Repayment Risk Score"]
+    weights = np.array([bf * snapshot["fin_weights"].get(col, 0.0) + br * snapshot["repay_weights"].get(col, 0.0)
+                        for col in features])
+    low = np.array([snapshot["min"][col] for col in features])
+    high = np.array([snapshot["max"][col] for col in features])
+    span = high - low
+    with np.errstate(divide="ignore"):
+        per_unit = np.where(span == 0, 0.0, 100 / np.where(span == 0, 1.0, span))
+    return weights, per_unit, low, high
+
+
+def risk_surface(ratios, loan_values, collateral_values, credit_scores, snapshot=None):
+    """
+    Risk score surface of one company over a grid of loan, collateral and credit score inputs.
+
+    The rule model is additive in its scaled features, so the score splits into a constant
+    company part, an LtC part over the (loan, collateral) grid and a credit score part. Each is
+    computed once and the full surface is one broadcast sum. The model is piecewise linear, so
+    the partial derivatives are exact: zero where a feature is clipped at the snapshot range.
+    Args:
+    - ratios (dict): The company's ratio columns (e.g. from ml_rule.fetch_financial_data_from_excel).
+    - loan_values, collateral_values, credit_scores: 1-D grids of L, C and S values.
+    - snapshot (dict): Scoring snapshot, loaded from the default path if None.
+    Returns:
+    - surface (dict):
+        "Final Risk Score": L x C x S array,
+        "Repayment Risk Score": L x C x S array,
+        "Financial Risk Score": float (does not depend on the grid),
+        "d Loan Value", "d Collateral Value", "d Credit Score": L x C x S partial derivatives of
+        the Final Risk Score (read-only broadcast views),
+        "feature_gradients": dict of d Final Risk Score / d ratio at the company's current values.
+    """
+    if snapshot is None:
+        snapshot = load_snapshot()
+
+    features = snapshot["features"]
+    loan = np.asarray(loan_values, dtype=np.float64)
+    collateral = np.asarray(collateral_values, dtype=np.float64)
+    credit = np.asarray(credit_scores, dtype=np.float64)
+    shape = (len(loan), len(collateral), len(credit))
+
+    weights, per_unit, low, high = _feature_slopes(snapshot)
+    fin_w = np.array([snapshot["fin_weights"].get(col, 0.0) for col in features])
+    repay_w = np.array([snapshot["repay_weights"].get(col, 0.0) for col in features])
+    final = snapshot["final_weights"]
+    bf, br = final["Financial Risk Score"], final["Repayment Risk Score"]
+
+    # Company part: every feature except LtC and Credit Score, at the company's values
+    base = applicant_features({**ratios, "Loan Value": None, "Collateral Value": None, "Credit Score": None})
+    X = np.array([[np.nan if base.get(col) is None else base[col] for col in features]])
+    scaled = scale_matrix(X, snapshot)[0]
+    i_ltc, i_credit = features.index("LtC"), features.index("Credit Score")
+    company = np.ones(len(features), dtype=bool)
+    company[[i_ltc, i_credit]] = False
+
+    fin_score = 100 - scaled @ fin_w
+    repay_company = 100 - scaled[company] @ repay_w[company]
+
+    # LtC part over the (loan, collateral) grid, credit part over the credit grid
+    with np.errstate(divide="ignore", invalid="ignore"):
+        ltc = np.where(collateral[None, :] == 0, np.nan, loan[:, None] / collateral[None, :])
+    ltc_scaled = _scale_column(ltc, snapshot, "LtC")
+    credit_scaled = _scale_column(credit, snapshot, "Credit Score")
+
+    repay = repay_company - repay_w[i_ltc] * ltc_scaled[:, :, None] - repay_w[i_credit] * credit_scaled[None, None, :]
+    final_score = bf * fin_score + br * repay
+
+    # Partial derivatives: zero where the input is clipped (or LtC is undefined)
+    ltc_active = (ltc > low[i_ltc]) & (ltc < high[i_ltc])
+    dfinal_dltc = np.where(ltc_active, -weights[i_ltc] * per_unit[i_ltc], 0.0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        d_loan = np.where(ltc_active, dfinal_dltc / collateral[None, :], 0.0)
+        d_collateral = np.where(ltc_active, -dfinal_dltc * loan[:, None] / collateral[None, :] ** 2, 0.0)
+    credit_active = (credit > low[i_credit]) & (credit < high[i_credit])
+    d_credit = np.where(credit_active, -weights[i_credit] * per_unit[i_credit], 0.0)
+
+    active = (X[0] > low) & (X[0] < high)
+    gradients = {col: float(-weights[i] * per_unit[i]) if active[i] else 0.0
+                 for i, col in enumerate(features) if company[i]}
+
+    return {
+        "Final Risk Score": final_score,
+        "Repayment Risk Score": repay,
+        "Financial Risk Score": float(fin_score),
+        "d Loan Value": np.broadcast_to(d_loan[:, :, None], shape),
+        "d Collateral Value": np.broadcast_to(d_collateral[:, :, None], shape),
+        "d Credit Score": np.broadcast_to(d_credit[None, None, :], shape),
+        "feature_gradients": gradients,
+    }
+
+
+def _scale_column(values, snapshot, col):
+    """
+    scale_matrix for a single feature over an array of any shape.
+    """
+    i = snapshot["features"].index(col)
+    X = np.full(values.shape + (len(snapshot["features"]),), np.nan)
+    X[..., i] = values
+    return scale_matrix(X.reshape(-1, X.shape[-1]), snapshot)[:, i].reshape(values.shape)
+
+
+if __name__ == "__main__":
+    from ml_rule import search_ticker_by_company_name, fetch_financial_data_from_excel
+
+    company = sys.argv[1] if len(sys.argv) > 1 else input("Enter company name: ").strip()
+    ticker = search_ticker_by_company_name(company)
+    ratios = fetch_financial_data_from_excel(ticker, None, None, None)
+    if not ratios:
+        sys.exit(1)
+
+    loans = np.linspace(1e6, 5e8, 100)
+    collaterals = np.linspace(1e6, 5.5e8, 100)
+    credits = np.linspace(300, 900, 50)
+
+    start = time.perf_counter()
+    surface = risk_surface(ratios, loans, collaterals, credits)
+    elapsed = time.perf_counter() - start
+
+    scores = surface["Final Risk Score"]
+    print(f"{company} ({ticker}): {scores.size:,} scenarios in {elapsed * 1000:.1f} ms")
+    print(f"Financial Risk Score: {surface['Financial Risk Score']:.2f}")
+    print(f"Final Risk Score range: {scores.min():.2f} - {scores.max():.2f}")
+    print(f"Feature gradients: {surface['feature_gradients']}")
@@ -0,0 +1,244 @@
+import os
+import json
+import math
+import hashlib
+from datetime import datetime
+import numpy as np
+import pandas as pd
+from application_store import reference_with_applications
+
+# Reference population the rule model is normalised against
+REFERENCE_PATH = "output/Company_Financials_Synthetic_First100.xlsx"
+SNAPSHOT_PATH = "output/scoring_snapshot.json"
+SNAPSHOT_FORMAT = 1
+
+# Same inputs and weights as rule_function in rule.py
+INPUT_COLUMNS = ["Net Profit Margin %", "Return on Equity %", "Return on Assets %",
+                 "Current Ratio", "Asset Turnover Ratio", "Debt Equity Ratio", "Debt To Asset Ratio",
+                 "Interest Coverage Ratio", "Loan Value", "Collateral Value", "Credit Score"]
+
+FEATURE_COLUMNS = ["Net Profit Margin %", "Return on Equity %", "Return on Assets %",
+                   "Current Ratio", "Asset Turnover Ratio", "Debt Equity Ratio", "Debt To Asset Ratio",
+                   "Interest Coverage Ratio", "Credit Score", "LtC"]
+
+FIN_WEIGHTS = {"Net Profit Margin %": 0.25, "Return on Equity %": 0.25, "Return on Assets %": 0.25,
+               "Current Ratio": 0.25, "Asset Turnover Ratio": 0.1, "Debt Equity Ratio": 0.1, "Debt To Asset Ratio": -0.2}
+
+REPAY_WEIGHTS = {"Interest Coverage Ratio": 0.20, "Credit Score": 0.65, "LtC": 0.15}
+
+# Final Risk Score = 0.3 * Financial Risk Score + 0.7 * Repayment Risk Score
+FINAL_WEIGHTS = {"Financial Risk Score": 0.3, "Repayment Risk Score": 0.7}
+
+_snapshot_cache = {}
+
+
+def prepare_features(df):
+    """
+    Turn raw applicant rows into the rule model's feature frame (LtC replaces Loan/Collateral Value).
+    Args:
+    - df (DataFrame): Rows with at least INPUT_COLUMNS.
+    Returns:
+    - DataFrame: FEATURE_COLUMNS as floats, missing values left as NaN.
+    """
+    df = df.reindex(columns=INPUT_COLUMNS).apply(pd.to_numeric, errors="coerce").astype(float)
+
+    # If Collateral Value is 0, avoid division by 0 and set LtC to NaN
+    collateral = df["Collateral Value"].to_numpy()
+    with np.errstate(divide="ignore", invalid="ignore"):
+        df["LtC"] = np.where(collateral == 0, np.nan, df["Loan Value"].to_numpy() / collateral)
+
+    return df[FEATURE_COLUMNS]
+
+
+def _to_float(value):
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return None
+    return None if math.isnan(value) else value
+
+
+def applicant_features(data):
+    """
+    Single-row version of prepare_features on a plain dict, missing values become None.
+    """
+    features = {col: _to_float(data.get(col)) for col in INPUT_COLUMNS}
+    loan, collateral = features.pop("Loan Value"), features.pop("Collateral Value")
+    if loan is None or collateral is None or collateral == 0:
+        features["LtC"] = None
+    else:
+        features["LtC"] = loan / collateral
+    return features
+
+
+def build_snapshot(reference_path=REFERENCE_PATH, snapshot_path=SNAPSHOT_PATH, store_path=None):
+    """
+    Fit the min/max scaling and median fill of the rule model once over the reference dataset
+    and persist them as a scoring snapshot.
+    Args:
+    - reference_path (str): Excel/CSV/Parquet file with the reference population.
+    - snapshot_path (str): Where to write the JSON snapshot, None to skip writing.
+    - store_path (str): Application store (see application_store.py) whose scored applications
+      join the reference population, None to use the reference file only.
+    Returns:
+    - snapshot (dict): Per-feature min/max/median, weights and version info.
+    """
+    if reference_path.endswith(".csv"):
+        reference = pd.read_csv(reference_path)
+    elif reference_path.endswith(".parquet"):
+        reference = pd.read_parquet(reference_path)
+    else:
+        reference = pd.read_excel(reference_path)
+
+    with open(reference_path, "rb") as f:
+        reference_hash = hashlib.sha256(f.read()).hexdigest()
+
+    if store_path:
+        reference = reference_with_applications(reference, store_path)
+
+    snapshot = snapshot_from_frame(reference)
+    snapshot["reference_path"] = reference_path
+    snapshot["reference_sha256"] = reference_hash
+    snapshot["version"] = f"{SNAPSHOT_FORMAT}-{reference_hash[:12]}"
+
+    if snapshot_path:
+        save_snapshot(snapshot, snapshot_path)
+    return snapshot
+
+
+def snapshot_from_frame(reference):
+    """
+    Build a snapshot from an in-memory reference frame (see build_snapshot).
+    """
+    features = prepare_features(reference)
+    medians = features.median()
+    # Median filled values never fall outside the observed range, so min/max over the
+    # non-missing values match what MinMaxScaler sees after fillna.
+    filled = features.fillna(medians)
+
+    return {
+        "format": SNAPSHOT_FORMAT,
+        "version": f"{SNAPSHOT_FORMAT}-inline",
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "n_rows": int(len(features)),
+        "features": FEATURE_COLUMNS,
+        "min": {col: float(filled[col].min()) for col in FEATURE_COLUMNS},
+        "max": {col: float(filled[col].max()) for col in FEATURE_COLUMNS},
+        "median": {col: float(medians[col]) for col in FEATURE_COLUMNS},
+        "fin_weights": dict(FIN_WEIGHTS),
+        "repay_weights": dict(REPAY_WEIGHTS),
+        "final_weights": dict(FINAL_WEIGHTS),
+    }
+
+
+def save_snapshot(snapshot, snapshot_path=SNAPSHOT_PATH):
+    folder = os.path.dirname(snapshot_path)
+    if folder:
+        os.makedirs(folder, exist_ok=True)
+    tmp_path = snapshot_path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(snapshot, f, indent=2)
+    # Atomic swap so readers never see a half written snapshot
+    os.replace(tmp_path, snapshot_path)
+    _snapshot_cache.pop(snapshot_path, None)
+
+
+def load_snapshot(snapshot_path=SNAPSHOT_PATH):
+    """
+    Load a scoring snapshot, building it from REFERENCE_PATH if it doesn't exist yet.
+    The parsed snapshot is kept in memory until the file changes.
+    """
+    if not os.path.exists(snapshot_path):
+        return build_snapshot(snapshot_path=snapshot_path)
+
+    mtime = os.path.getmtime(snapshot_path)
+    cached = _snapshot_cache.get(snapshot_path)
+    if cached and cached[0] == mtime:
+        return cached[1]
+
+    with open(snapshot_path) as f:
+        snapshot = json.load(f)
+    if snapshot.get("format") != SNAPSHOT_FORMAT:
+        raise ValueError(f"Unsupported snapshot format {snapshot.get('format')} in {snapshot_path}")
+
+    _snapshot_cache[snapshot_path] = (mtime, snapshot)
+    return snapshot
+
+
+def scale_value(value, low, high):
+    """
+    Min/max scale one value onto the rule model's 1-101 range.
+
+    A value outside the snapshot [low, high] lands on 1 or 101. That is exactly what rule_function
+    returns for the applicant: refitting MinMaxScaler on reference + applicant makes the applicant
+    the new min or max. Only the reference rows would shift, and their scores are never returned,
+    so the snapshot stays valid. Rebuild it with build_snapshot when the reference population changes.
+    """
+    span = high - low
+    if not span:
+        # Constant reference column: MinMaxScaler maps it to 0, unless the applicant is the new max
+        return 101.0 if value > high else 1.0
+    value = min(max(value, low), high)
+    return 1 + 100 * (value - low) / span
+
+
+def final_weight(snapshot, col):
+    """
+    Weight of one feature's scaled value in the Final Risk Score (financial and repayment weights blended).
+    """
+    final_weights = snapshot["final_weights"]
+    return (final_weights["Financial Risk Score"] * snapshot["fin_weights"].get(col, 0.0)
+            + final_weights["Repayment Risk Score"] * snapshot["repay_weights"].get(col, 0.0))
+
+
+def score_applicant(data, snapshot=None, explain=False):
+    """
+    Score a single applicant against a scoring snapshot, without reading the reference data.
+    Args:
+    - data (dict): Applicant with INPUT_COLUMNS (LtC is derived from Loan/Collateral Value).
+    - snapshot (dict): Snapshot from load_snapshot/build_snapshot, loaded from SNAPSHOT_PATH if None.
+    - explain (bool): Also return each feature's contribution to the Final Risk Score.
+    Returns:
+    - scores (dict): Financial Risk Score, Repayment Risk Score, Final Risk Score and LtC. With
+      explain=True also "Contributions" (feature -> points added to the score of an applicant at
+      the snapshot medians) and "Base Score" (that median applicant's score), so that
+      Base Score + sum(Contributions) == Final Risk Score.
+    """
+    if snapshot is None:
+        snapshot = load_snapshot()
+
+    features = applicant_features(data)
+
+    scaled = {}
+    for col in snapshot["features"]:
+        value = features[col]
+        if value is None:
+            # fillna(median) of reference + applicant is the reference median when the applicant is missing
+            value = snapshot["median"][col]
+        scaled[col] = scale_value(value, snapshot["min"][col], snapshot["max"][col])
+
+    fin_score = 100 - sum(scaled[col] * w for col, w in snapshot["fin_weights"].items())
+    repay_score = 100 - sum(scaled[col] * w for col, w in snapshot["repay_weights"].items())
+    final_weights = snapshot["final_weights"]
+    final_score = (fin_score * final_weights["Financial Risk Score"]) + (repay_score * final_weights["Repayment Risk Score"])
+
+    scores = {
+        "Financial Risk Score": fin_score,
+        "Repayment Risk Score": repay_score,
+        "Final Risk Score": final_score,
+        "LtC": features["LtC"],
+    }
+
+    if explain:
+        contributions = {}
+        for col in snapshot["features"]:
+            median_scaled = scale_value(snapshot["median"][col], snapshot["min"][col], snapshot["max"][col])
+            contributions[col] = -final_weight(snapshot, col) * (scaled[col] - median_scaled)
+        scores["Base Score"] = final_score - sum(contributions.values())
+        scores["Contributions"] = contributions
+    return scores
+
+
+if __name__ == "__main__":
+    snapshot = build_snapshot()
+    print(f"Snapshot {snapshot['version']} built from {snapshot['n_rows']} rows -> {SNAPSHOT_PATH}")
@@ -1,59 +1,321 @@
 import os
 import time
+import json
+import zlib
+import hashlib
+import random
+import argparse
+import threading
+from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import pandas as pd
-import Other.scrape_financial_data as yf
+from statements_store import STATEMENTS_PATH, STATEMENT_TYPES, statements_frame, write_statements, compact
 
 # Load the CSV files for both Equity and SME tickers
 equity_file_path = "equity_tickers.csv"
 sme_file_path = "sme_tickers.csv"
 
-# Load the equity and SME tickers into pandas DataFrames
-equity_df = pd.read_csv(equity_file_path)
-sme_df = pd.read_csv(sme_file_path)
-
-# Check the available columns for both DataFrames
-print(f"Available columns in equity CSV: {equity_df.columns}")
-print(f"Available columns in SME CSV: {sme_df.columns}")
-
-# Extract the tickers for both, assuming the column is named 'SYMBOL'
-equity_tickers = equity_df['SYMBOL'].dropna().unique().tolist()
-sme_tickers = sme_df['SYMBOL'].dropna().unique().tolist()
-
-# Combine both lists of tickers
-all_tickers = equity_tickers + sme_tickers
-all_tickers = [ticker.strip().upper() + ".NS" for ticker in all_tickers]  # Add '.NS' suffix for NSE
-
-# Output folder to save financials
-out_dir = "Financials"
-os.makedirs(out_dir, exist_ok=True)
-
-# Loop through all tickers and fetch their financial data
-for ticker in all_tickers:
-    print(f"Processing {ticker} ...", end=" ")
-    stock = yf.Ticker(ticker)
-    
-    # Fetch financial data
-    bs = stock.balance_sheet
-    is_ = stock.income_stmt
-    cf = stock.cash_flow
-
-    # Skip tickers with no financial data
-    if bs.empty and is_.empty and cf.empty:
-        print("No financials data")
-        continue
-
-    # Save to Excel file
-    path = os.path.join(out_dir, f"{ticker}_financials.xlsx")
-    with pd.ExcelWriter(path, engine="xlsxwriter") as writer:
-        if not bs.empty:
-            bs.to_excel(writer, sheet_name="Balance Sheet")
-        if not is_.empty:
-            is_.to_excel(writer, sheet_name="Income Statement")
-        if not cf.empty:
-            cf.to_excel(writer, sheet_name="Cash Flow Statement")
-    print("Saved")
-    
-    # Delay to avoid hitting API rate limits
-    time.sleep(1)
-
-print("All financials have been saved in the 'Financials' folder.")
+# Statements dataset (see statements_store.py); the manifest lives next to the data
+out_dir = STATEMENTS_PATH
+
+# Provider requests per second shared by all workers, and how many may go out back to back
+RATE_LIMIT = 2.0
+BURST = 5
+WORKERS = 8
+MAX_RETRIES = 5
+BACKOFF_BASE = 2.0  # seconds, doubled on every retry
+
+# Fetched tickers are written to the dataset in batches of this many
+FLUSH_TICKERS = 200
+# Partitions holding at least this many files are compacted at the end of a run
+COMPACT_FILES = 16
+
+# Freshness manifest, one JSON line appended per fetched ticker (underscore: not part of the dataset)
+MANIFEST_NAME = "_manifest.jsonl"
+MAX_AGE = timedelta(days=7)  # recheck every ticker at least this often
+# Once a new annual period should have been filed, recheck daily until it shows up
+PERIOD_LENGTH = timedelta(days=365)
+FILING_LAG = timedelta(days=60)
+RECHECK_DUE = timedelta(days=1)
+
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket: acquire() blocks until a request may be sent, so all workers
+    together stay under `rate` requests per second. pause() holds every worker back, e.g. after
+    the provider throttled one of them.
+    """
+
+    def __init__(self, rate=RATE_LIMIT, burst=BURST):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.resume_at = 0.0
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if now >= self.resume_at and self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = max(self.resume_at - now, (1 - self.tokens) / self.rate)
+            time.sleep(wait)
+
+    def pause(self, seconds):
+        with self.lock:
+            self.resume_at = max(self.resume_at, time.monotonic() + seconds)
+            self.tokens = 0
+
+
+class ThrottledError(Exception):
+    pass
+
+
+def is_throttled(error):
+    # yfinance raises YFRateLimitError; plain HTTP clients surface a 429
+    text = f"{type(error).__name__} {error}"
+    return isinstance(error, ThrottledError) or "RateLimit" in text or "Too Many Requests" in text or "429" in text
+
+
+def load_tickers(paths=(equity_file_path, sme_file_path)):
+    tickers = []
+    for path in paths:
+        df = pd.read_csv(path)
+        df.columns = [col.strip() for col in df.columns]
+        # Extract the tickers, assuming the column is named 'SYMBOL'
+        tickers += df['SYMBOL'].dropna().unique().tolist()
+    # Add '.NS' suffix for NSE
+    return list(dict.fromkeys(ticker.strip().upper() + ".NS" for ticker in tickers))
+
+
+def fetch_statements(source, ticker, bucket, retries=MAX_RETRIES):
+    """
+    Fetch the three statements of one ticker, one rate-limited request each.
+    Throttled or failed requests are retried with exponential backoff and jitter; a throttled
+    request also pauses the shared bucket so the other workers back off too.
+    Returns:
+    - statements (dict): Statement type -> DataFrame (possibly empty).
+    """
+    stock = source.Ticker(ticker)
+    statements = {}
+    for statement in STATEMENT_TYPES:
+        for attempt in range(retries + 1):
+            bucket.acquire()
+            try:
+                statements[statement] = getattr(stock, statement)
+                break
+            except Exception as e:
+                if attempt == retries:
+                    raise
+                delay = BACKOFF_BASE * 2 ** attempt * random.uniform(0.5, 1.5)
+                if is_throttled(e):
+                    bucket.pause(delay)
+                else:
+                    time.sleep(delay)
+    return statements
+
+
+def statements_hash(statements):
+    digest = hashlib.sha256()
+    for statement, df in statements.items():
+        digest.update(statement.encode())
+        digest.update(df.to_csv().encode())
+    return digest.hexdigest()
+
+
+def latest_period(statements):
+    periods = [col for df in statements.values() for col in df.columns]
+    return str(max(pd.to_datetime(periods)).date()) if periods else None
+
+
+class Manifest:
+    """
+    Per-ticker record of the last fetch: time, latest statement period and content hash.
+
+    Entries are appended to a JSON lines file once a ticker's data is written (later lines win),
+    so an interrupted run loses at most one unwritten batch and the next run resumes from there.
+    """
+
+    def __init__(self, folder=out_dir):
+        self.path = os.path.join(folder, MANIFEST_NAME)
+        self.entries = {}
+        self.lock = threading.Lock()
+        if os.path.exists(self.path):
+            with open(self.path) as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        # Line cut short by a crash
+                        continue
+                    self.entries[entry["ticker"]] = entry
+            self.compact()
+
+    def compact(self):
+        with open(self.path + ".tmp", "w") as f:
+            for entry in self.entries.values():
+                f.write(json.dumps(entry) + "\n")
+        os.replace(self.path + ".tmp", self.path)
+
+    def record(self, ticker, **fields):
+        entry = {"ticker": ticker, "fetched_at": datetime.now().isoformat(timespec="seconds"), **fields}
+        with self.lock:
+            self.entries[ticker] = entry
+            with open(self.path, "a") as f:
+                f.write(json.dumps(entry) + "\n")
+
+    def is_stale(self, ticker, now=None):
+        """
+        Never fetched, not checked within MAX_AGE, or a newer period is due and it wasn't checked today.
+        """
+        entry = self.entries.get(ticker)
+        if entry is None:
+            return True
+        now = now or datetime.now()
+        age = now - datetime.fromisoformat(entry["fetched_at"])
+        if age >= MAX_AGE:
+            return True
+        if entry.get("latest_period"):
+            due = datetime.fromisoformat(entry["latest_period"]) + PERIOD_LENGTH + FILING_LAG
+            return now >= due and age >= RECHECK_DUE
+        return False
+
+
+def scrape(tickers, source, folder=out_dir, workers=WORKERS, rate=RATE_LIMIT, burst=BURST, force=False):
+    """
+    Fetch the financials of every stale ticker with a pool of workers sharing one rate limit, so
+    the run takes about requests / rate seconds instead of one round trip plus a second each.
+    Tickers the manifest marks as fresh are skipped, and statements whose content hash didn't
+    change are not rewritten. Changed statements are appended to the dataset in batches.
+    Returns:
+    - counts (dict): Number of tickers saved, unchanged, without data, failed and skipped.
+    """
+    os.makedirs(folder, exist_ok=True)
+    manifest = Manifest(folder)
+    stale = [ticker for ticker in tickers if force or manifest.is_stale(ticker)]
+    bucket = TokenBucket(rate, burst)
+    counts = {"saved": 0, "unchanged": 0, "no data": 0, "failed": 0, "skipped": len(tickers) - len(stale)}
+    print(f"{len(stale)} of {len(tickers)} tickers are stale")
+    tickers = stale
+    start = time.perf_counter()
+
+    pending = []  # (ticker, rows, manifest fields) waiting to be written
+
+    def flush():
+        if pending:
+            write_statements([rows for _, rows, _ in pending], folder)
+            for ticker, _, fields in pending:
+                manifest.record(ticker, **fields)
+            pending.clear()
+
+    def job(ticker):
+        statements = fetch_statements(source, ticker, bucket)
+        # Skip tickers with no financial data
+        if all(df.empty for df in statements.values()):
+            return "no data", None, {"latest_period": None, "hash": None}
+        fields = {"latest_period": latest_period(statements), "hash": statements_hash(statements)}
+        if manifest.entries.get(ticker, {}).get("hash") == fields["hash"]:
+            return "unchanged", None, fields
+        return "saved", statements_frame(ticker, statements, time.time_ns()), fields
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(job, ticker): ticker for ticker in tickers}
+        for done, future in enumerate(as_completed(futures), start=1):
+            ticker = futures[future]
+            try:
+                status, rows, fields = future.result()
+                if rows is None:
+                    manifest.record(ticker, **fields)
+                else:
+                    pending.append((ticker, rows, fields))
+            except Exception as e:
+                status = "failed"
+                print(f"{ticker}: failed ({e})")
+            counts[status] += 1
+            if len(pending) >= FLUSH_TICKERS:
+                flush()
+            if done % 50 == 0 or done == len(futures):
+                elapsed = time.perf_counter() - start
+                print(f"{done}/{len(futures)} tickers in {elapsed:.1f}s ({done / elapsed:.2f}/s): {counts}")
+    flush()
+    compact(folder, min_files=COMPACT_FILES)
+    return counts
+
+
+class LocalSource:
+    """
+    Stand-in for the financial data provider with configurable latency, error and throttling rates,
+    for trying the scraper without network access.
+    """
+
+    def __init__(self, latency=0.2, error_rate=0.0, throttle_rate=0.0, empty_rate=0.1, seed=None):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.empty_rate = empty_rate
+        self.random = random.Random(seed)
+        self.requests = 0
+        self.lock = threading.Lock()
+
+    def Ticker(self, ticker):
+        return _LocalTicker(self, ticker)
+
+    def request(self, ticker, attribute):
+        with self.lock:
+            self.requests += 1
+            draw = self.random.random()
+            empty = self.random.random() < self.empty_rate
+        time.sleep(self.latency)
+        if draw < self.throttle_rate:
+            raise ThrottledError("429 Too Many Requests")
+        if draw < self.throttle_rate + self.error_rate:
+            raise ConnectionError(f"Connection reset while fetching {ticker} {attribute}")
+        if empty:
+            return pd.DataFrame()
+        periods = pd.to_datetime(["2024-03-31", "2023-03-31", "2022-03-31", "2021-03-31"])
+        rows = {"balance_sheet": ["Total Assets", "Current Assets", "Inventory", "Current Liabilities",
+                                  "Total Debt", "Stockholders Equity"],
+                "income_stmt": ["Total Revenue", "EBIT", "Interest Expense", "Net Income Continuous Operations"],
+                "cash_flow": ["Operating Cash Flow", "Free Cash Flow"]}[attribute]
+        values = [[zlib.crc32(f"{ticker}|{row}|{period.date()}".encode()) % 10**9 for period in periods] for row in rows]
+        return pd.DataFrame(values, index=rows, columns=periods, dtype=float)
+
+
+class _LocalTicker:
+    def __init__(self, source, ticker):
+        self.source = source
+        self.ticker = ticker
+
+    balance_sheet = property(lambda self: self.source.request(self.ticker, "balance_sheet"))
+    income_stmt = property(lambda self: self.source.request(self.ticker, "income_stmt"))
+    cash_flow = property(lambda self: self.source.request(self.ticker, "cash_flow"))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Download financial statements for all NSE equity and SME tickers")
+    parser.add_argument("--workers", type=int, default=WORKERS)
+    parser.add_argument("--rate", type=float, default=RATE_LIMIT, help="Provider requests per second")
+    parser.add_argument("--burst", type=int, default=BURST)
+    parser.add_argument("--out-dir", default=out_dir)
+    parser.add_argument("--limit", type=int, help="Only the first N tickers")
+    parser.add_argument("--force", action="store_true", help="Refetch every ticker, fresh or not")
+    parser.add_argument("--local", action="store_true", help="Use the local stand-in source instead of the provider")
+    parser.add_argument("--latency", type=float, default=0.2, help="Local source latency (s)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Local source error rate")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="Local source throttling rate")
+    args = parser.parse_args()
+
+    all_tickers = load_tickers()[:args.limit]
+    if args.local:
+        source = LocalSource(args.latency, args.error_rate, args.throttle_rate)
+    else:
+        import Other.scrape_financial_data as source
+
+    scrape(all_tickers, source, args.out_dir, args.workers, args.rate, args.burst, args.force)
+    print(f"All financials have been saved in the '{args.out_dir}' dataset.")
@@ -0,0 +1,130 @@
+import os
+import time
+import zlib
+import argparse
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from llm_engine import CONCURRENCY, generate
+from rate_limiter import AdaptiveLimiter, REQUESTS_PER_MINUTE, TOKENS_PER_MINUTE
+
+# Worker processes for sharded generation
+SHARDS = os.cpu_count() or 4
+
+
+def shard_of(keys, shards):
+    """
+    Shard of each row, from a hash of its key (e.g. company and financial year), so a row lands in
+    the same shard, and the same shard journal, on every run regardless of row order.
+    """
+    return [zlib.crc32(str(key).encode()) % shards for key in keys]
+
+
+def row_keys(df):
+    """
+    Stable key per row of a financials table: company and financial year where available.
+    """
+    columns = [col for col in ["Company", "Financial Year", "Period"] if col in df.columns]
+    if not columns:
+        return [str(i) for i in df.index]
+    return df[columns].astype(str).agg("|".join, axis=1).tolist()
+
+
+def shard_journal(journal, shard, shards):
+    root, ext = os.path.splitext(journal)
+    return f"{root}.shard-{shard + 1}-of-{shards}{ext or '.jsonl'}"
+
+
+def row_journals(keys, journal, shards):
+    """
+    Shard journal of each row in generate_sharded, e.g. for regenerating rows of a sharded run
+    (see llm_engine.regenerate).
+    """
+    return [shard_journal(journal, shard, shards) for shard in shard_of(keys, shards)]
+
+
+def shard_quota(quota, shards):
+    """
+    Each shard's share of a per-minute quota. A limited quota never rounds down to 0, which means
+    unlimited to AdaptiveLimiter.
+    """
+    return max(1, quota // shards) if quota else 0
+
+
+def _run_shard(args):
+    shard, shards, requests, rows, parse, journal, concurrency, quota, params = args
+    limiter = AdaptiveLimiter(maximum=concurrency, requests_per_minute=quota[0], tokens_per_minute=quota[1])
+    start = time.perf_counter()
+    results = generate(requests, parse, concurrency, journal=journal, rows=rows, limiter=limiter, **params)
+    print(f"Shard {shard + 1}/{shards}: {sum(r is not None for r in results)}/{len(requests)} rows "
+          f"in {time.perf_counter() - start:.1f}s, {limiter.stats}")
+    return results
+
+
+def generate_sharded(requests, keys, journal, shards=SHARDS, parse=None, concurrency=CONCURRENCY,
+                     requests_per_minute=REQUESTS_PER_MINUTE, tokens_per_minute=TOKENS_PER_MINUTE, **params):
+    """
+    generate() over a whole dataset split into shards, one worker process per shard.
+
+    Every worker runs its own engine and limiter with 1/shards of the provisioned requests and
+    tokens per minute (see shard_quota), and journals its rows to its own shard journal, so a
+    rerun resumes each shard where it stopped. Throughput then grows with the quota rather than
+    with one event loop.
+    Args:
+    - requests (list): Message lists, one per row.
+    - keys (list): Stable key per row (e.g. "Company|Financial Year") used to assign shards.
+    - journal (str): Journal path; shard k writes <journal>.shard-k-of-n.jsonl.
+    - parse (callable): Applied to each response content; must be importable by the workers
+      (a module level function).
+    - params: Completion parameters shared by all requests (temperature, max_tokens, ...).
+    Returns:
+    - results (list): Parsed content per request in input order; None where the request failed.
+    """
+    if len(keys) != len(requests):
+        raise ValueError("One key per request is required")
+    if requests_per_minute and requests_per_minute < shards:
+        print(f"Only {requests_per_minute} requests per minute for {shards} shards; each shard still sends "
+              f"1 per minute, so use fewer shards to stay within the quota")
+    quota = (shard_quota(requests_per_minute, shards), shard_quota(tokens_per_minute, shards))
+    assignment = shard_of(keys, shards)
+    members = [[i for i, s in enumerate(assignment) if s == shard] for shard in range(shards)]
+    jobs = [(shard, shards, [requests[i] for i in rows], rows, parse, shard_journal(journal, shard, shards),
+             concurrency, quota, params) for shard, rows in enumerate(members) if rows]
+
+    results = [None] * len(requests)
+    with ProcessPoolExecutor(max_workers=len(jobs) or 1) as pool:
+        for (_, _, _, rows, *_), shard_results in zip(jobs, pool.map(_run_shard, jobs)):
+            for i, result in zip(rows, shard_results):
+                results[i] = result
+    return results
+
+
+def benchmark(url, n_requests=2000, shard_counts=(1, 2, 4), requests_per_minute=0):
+    """
+    Throughput of sharded generation against an OpenAI compatible server (e.g. fake_llm_server.py).
+    """
+    run = time.time_ns()  # fresh prompts, so nothing is answered from the response cache
+    requests = [[{"role": "user", "content": f"Row {i} of run {run}"}] for i in range(n_requests)]
+    keys = [f"T{i}.NS|2024" for i in range(n_requests)]
+    for shards in shard_counts:
+        with tempfile.TemporaryDirectory() as folder:
+            start = time.perf_counter()
+            results = generate_sharded(requests, keys, os.path.join(folder, "bench.jsonl"), shards,
+                                       requests_per_minute=requests_per_minute, max_tokens=200)
+            elapsed = time.perf_counter() - start
+        print(f"{shards} shards: {n_requests} requests in {elapsed:.2f}s ({n_requests / elapsed:.1f}/s), "
+              f"{sum(r is not None for r in results)} ok\n")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark sharded generation against a local fake server")
+    parser.add_argument("--url", default="http://localhost:8001", help="Endpoint of fake_llm_server.py")
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--shards", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--rpm", type=int, default=0, help="Provisioned requests per minute, split between shards")
+    args = parser.parse_args()
+
+    os.environ["AZURE_OPENAI_ENDPOINT"] = args.url
+    os.environ.setdefault("AZURE_OPENAI_API_KEY", "fake")
+    os.environ.setdefault("AZURE_OPENAI_DEPLOYMENT", "fake")
+    os.environ.setdefault("API_VERSION_GA", "2024-10-21")
+    benchmark(args.url, args.requests, args.shards, args.rpm)
@@ -0,0 +1,182 @@
+import os
+import time
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+# Scraped balance sheets, income statements and cash flows of every ticker as one Parquet dataset
+STATEMENTS_PATH = "output/statements"
+
+# Statement types, named like the provider's stock.balance_sheet / income_stmt / cash_flow
+STATEMENT_TYPES = ["balance_sheet", "income_stmt", "cash_flow"]
+
+# Rows are sorted by ticker, so row group min/max statistics let a ticker filter skip most groups
+ROW_GROUP_SIZE = 20_000
+
+SCHEMA = pa.schema([
+    ("Ticker", pa.string()),
+    ("Period", pa.date32()),
+    ("Item", pa.string()),
+    ("Value", pa.float64()),
+    # Write stamp of the fetch the row came from; the latest fetch of each period is current
+    ("Version", pa.int64()),
+    ("Statement", pa.string()),
+    ("Year", pa.int32()),
+])
+PARTITIONING = ds.partitioning(pa.schema([("Statement", pa.string()), ("Year", pa.int32())]), flavor="hive")
+
+
+def statements_frame(ticker, statements, version):
+    """
+    Long rows (one per ticker, statement, period and line item) from provider style statements.
+    Args:
+    - ticker (str): Ticker the statements belong to.
+    - statements (dict): Statement type -> DataFrame with line items as index and period ends as columns.
+    - version (int): Write stamp stored with every row.
+    """
+    frames = []
+    for statement, df in statements.items():
+        if df.empty:
+            continue
+        long = df.rename_axis(index="Item", columns="Period").stack().rename("Value").reset_index()
+        long["Statement"] = statement
+        frames.append(long)
+    if not frames:
+        return pd.DataFrame(columns=SCHEMA.names)
+
+    rows = pd.concat(frames, ignore_index=True)
+    rows["Ticker"] = ticker
+    rows["Period"] = pd.to_datetime(rows["Period"]).dt.date
+    rows["Item"] = rows["Item"].astype(str)
+    rows["Value"] = pd.to_numeric(rows["Value"], errors="coerce")
+    rows["Version"] = version
+    # Period end year, e.g. 2024 for the year ended 31 March 2024
+    rows["Year"] = pd.to_datetime(rows["Period"]).dt.year
+    return rows[SCHEMA.names]
+
+
+def write_statements(frames, path=STATEMENTS_PATH):
+    """
+    Append a batch of statement rows (several tickers at once) as new files, one per
+    statement/year partition. Nothing existing is rewritten; compact() folds old versions away.
+    """
+    rows = pd.concat(frames, ignore_index=True) if isinstance(frames, list) else frames
+    if rows.empty:
+        return
+    table = pa.Table.from_pandas(rows.sort_values(["Ticker", "Period", "Item"]), schema=SCHEMA, preserve_index=False)
+    ds.write_dataset(table, path, format="parquet", partitioning=PARTITIONING,
+                     basename_template=f"part-{time.time_ns()}-{os.getpid()}-{{i}}.parquet",
+                     existing_data_behavior="overwrite_or_ignore",
+                     min_rows_per_group=ROW_GROUP_SIZE, max_rows_per_group=ROW_GROUP_SIZE)
+
+
+def _dataset(path):
+    # Underscore/dot prefixed files (the scraper manifest, temporary files) are not data
+    return ds.dataset(path, format="parquet", partitioning=PARTITIONING, schema=SCHEMA)
+
+
+def _filter(tickers=None, statements=None, years=None):
+    conditions = []
+    if tickers is not None:
+        conditions.append(pc.field("Ticker").isin(list(tickers)))
+    if statements is not None:
+        conditions.append(pc.field("Statement").isin(list(statements)))
+    if years is not None:
+        conditions.append(pc.field("Year").isin([int(year) for year in years]))
+    expression = None
+    for condition in conditions:
+        expression = condition if expression is None else expression & condition
+    return expression
+
+
+def latest_versions(path=STATEMENTS_PATH, tickers=None):
+    """
+    Version of each ticker's most recent fetch, across all statements. It changes whenever the
+    ticker is fetched again, so it tells which tickers' statements changed; which rows are current
+    is decided per period, see current_versions().
+    """
+    if not os.path.isdir(path):
+        return {}
+    table = _dataset(path).to_table(columns=["Ticker", "Version"], filter=_filter(tickers))
+    latest = table.group_by("Ticker").aggregate([("Version", "max")])
+    return dict(zip(latest["Ticker"].to_pylist(), latest["Version_max"].to_pylist()))
+
+
+def current_versions(path=STATEMENTS_PATH, tickers=None, statements=None, years=None):
+    """
+    Version of the latest fetch of each ticker, statement and period. The provider only returns
+    the last few years, so a period missing from a newer fetch stays current in an older one.
+    Returns:
+    - versions (pyarrow.Table): Ticker, Statement, Period and Version columns.
+    """
+    table = _dataset(path).to_table(columns=["Ticker", "Statement", "Period", "Version"],
+                                    filter=_filter(tickers, statements, years))
+    latest = table.group_by(["Ticker", "Statement", "Period"]).aggregate([("Version", "max")])
+    return latest.rename_columns(["Ticker", "Statement", "Period", "Version"])
+
+
+def read_statements(path=STATEMENTS_PATH, tickers=None, statements=None, years=None, columns=None):
+    """
+    Current statement rows, reading only the partitions and row groups the filters need.
+    Args:
+    - tickers (list): Only these tickers.
+    - statements (list): Only these statement types (partition pruning).
+    - years (list): Only these period end years (partition pruning).
+    - columns (list): Columns to return, all by default.
+    Returns:
+    - rows (pd.DataFrame): Long rows of the latest fetch of each ticker, statement and period.
+    """
+    columns = list(columns or SCHEMA.names)
+    if not os.path.isdir(path):
+        return pd.DataFrame(columns=columns)
+
+    keys = ["Ticker", "Statement", "Period", "Version"]
+    current = current_versions(path, tickers, statements, years)
+    table = _dataset(path).to_table(columns=list(dict.fromkeys(columns + keys)),
+                                    filter=_filter(tickers, statements, years))
+    table = table.join(current, keys, join_type="inner")
+    return table.select(columns).to_pandas()
+
+
+def get_statement(ticker, statement, path=STATEMENTS_PATH):
+    """
+    One statement of one ticker in the provider's layout: line items x period ends, latest period first.
+    """
+    rows = read_statements(path, tickers=[ticker], statements=[statement], columns=["Item", "Period", "Value"])
+    if rows.empty:
+        return pd.DataFrame()
+    wide = rows.pivot_table(index="Item", columns="Period", values="Value", aggfunc="last")
+    return wide[sorted(wide.columns, reverse=True)]
+
+
+def compact(path=STATEMENTS_PATH, min_files=1):
+    """
+    Rewrite each partition holding at least min_files files as one file with only current rows,
+    sorted by ticker, so lookups stay cheap after many incremental runs. Run it between scrapes,
+    not alongside readers.
+    """
+    if not os.path.isdir(path):
+        return
+    current = current_versions(path)
+    partitions, statements = {}, {}
+    for fragment in _dataset(path).get_fragments():
+        folder = os.path.dirname(fragment.path)
+        partitions.setdefault(folder, []).append(fragment.path)
+        statements[folder] = ds.get_partition_keys(fragment.partition_expression)["Statement"]
+
+    for folder, files in partitions.items():
+        if len(files) < min_files:
+            continue
+        table = ds.dataset(files, format="parquet").to_table()
+        versions = current.filter(pc.field("Statement") == statements[folder]).drop_columns(["Statement"])
+        table = table.join(versions, ["Ticker", "Period", "Version"], join_type="inner")
+        tmp_path = os.path.join(folder, "_compacted.parquet.tmp")
+        if table.num_rows:
+            table = table.sort_by([("Ticker", "ascending"), ("Period", "ascending"), ("Item", "ascending")])
+            pq.write_table(table.select([name for name in SCHEMA.names if name not in ("Statement", "Year")]),
+                           tmp_path, row_group_size=ROW_GROUP_SIZE)
+            os.replace(tmp_path, os.path.join(folder, f"part-{time.time_ns()}-{os.getpid()}-c.parquet"))
+        for file in files:
+            os.remove(file)
@@ -0,0 +1,34 @@
+import os
+import sys
+import numpy as np
+import pandas as pd
+import pytest
+
+# The modules live at the top level of the repository
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scoring_snapshot import INPUT_COLUMNS  # noqa: E402
+
+
+# Reference population and applicants shared by the scoring tests
+@pytest.fixture
+def reference():
+    rng = np.random.default_rng(7)
+    frame = pd.DataFrame(rng.normal(0, 20, size=(60, len(INPUT_COLUMNS))), columns=INPUT_COLUMNS)
+    frame["Loan Value"] = rng.uniform(1e6, 5e8, len(frame))
+    frame["Collateral Value"] = rng.uniform(1e6, 5.5e8, len(frame))
+    frame["Credit Score"] = rng.integers(300, 901, len(frame))
+    frame.iloc[::9, 2] = np.nan
+    return frame
+
+
+@pytest.fixture
+def applicants(reference):
+    rng = np.random.default_rng(11)
+    frame = reference.sample(20, random_state=3).reset_index(drop=True)
+    frame += rng.normal(0, 5, size=frame.shape)
+    frame.loc[0, "Return on Equity %"] = 500.0  # above the reference range
+    frame.loc[1, "Current Ratio"] = -500.0  # below it
+    frame.loc[2, ["Debt Equity Ratio", "Credit Score"]] = np.nan
+    frame.loc[3, "Collateral Value"] = 0.0  # no LtC
+    return frame
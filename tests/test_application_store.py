@@ -0,0 +1,38 @@
+import os
+import pyarrow as pa
+import application_store
+from application_store import FANOUT, append_application, compact, read_applications, _list_segments, _segment_level
+
+
+def test_int_and_float_values_of_a_field_read_together(tmp_path):
+    store = str(tmp_path)
+    append_application({"Credit Score": 750, "Risk Score": 20}, store)
+    append_application({"Credit Score": 750.5, "Risk Score": 20.25}, store)
+
+    applications = read_applications(store)
+    assert applications["Credit Score"].tolist() == [750.0, 750.5]
+    assert applications["Risk Score"].tolist() == [20.0, 20.25]
+
+
+def test_appends_keep_working_after_compaction_of_mixed_types(tmp_path):
+    store = str(tmp_path)
+    for i in range(FANOUT + 3):
+        append_application({"Credit Score": 700 + i if i % 2 else 700.5 + i}, store)
+
+    assert any(_segment_level(name) == 1 for name in _list_segments(store))
+    scores = read_applications(store)["Credit Score"].tolist()
+    assert scores == [700 + i if i % 2 else 700.5 + i for i in range(FANOUT + 3)]
+
+
+def test_segments_written_with_int64_are_cast_on_read(tmp_path):
+    store = str(tmp_path)
+    # A segment from before numeric fields were stored as float64
+    application_store._write_segment(store, pa.Table.from_pylist([{"Credit Score": 750}]), level=0)
+    append_application({"Credit Score": 750.5}, store)
+
+    assert read_applications(store)["Credit Score"].tolist() == [750.0, 750.5]
+    for _ in range(FANOUT):
+        append_application({"Credit Score": 600}, store)
+    compact(store)
+    assert len(read_applications(store)) == FANOUT + 2
+    assert not [name for name in os.listdir(store) if name.endswith(".tmp")]
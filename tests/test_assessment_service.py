@@ -0,0 +1,82 @@
+import asyncio
+import functools
+import gc
+import pandas as pd
+import pytest
+from fastapi.testclient import TestClient
+import assessment_service
+from scoring_snapshot import INPUT_COLUMNS, score_applicant, snapshot_from_frame
+
+APPLICATION = dict(zip(INPUT_COLUMNS, [10.0, 15.0, 6.0, 1.5, 0.8, 0.6, 0.3, 5.0, 1e8, 1.5e8, 720.0]))
+
+
+class FailingBackend(assessment_service.FakeBackend):
+    async def narrative(self, query):
+        raise RuntimeError("model unavailable")
+
+
+@pytest.fixture
+def client(monkeypatch):
+    reference = pd.DataFrame([{**APPLICATION, "Credit Score": 300 + 50 * i, "Current Ratio": 0.5 * i}
+                              for i in range(12)])
+    monkeypatch.setattr(assessment_service, "score_applicant",
+                        functools.partial(score_applicant, snapshot=snapshot_from_frame(reference)))
+    monkeypatch.setattr(assessment_service, "resolve_ticker", lambda company: "TEST.NS")
+    monkeypatch.setattr(assessment_service, "fetch_financial_data_from_excel", lambda *args: dict(APPLICATION))
+    monkeypatch.setattr(assessment_service, "backend", assessment_service.FakeBackend())
+    monkeypatch.setattr(assessment_service, "FAKE_LLM_DELAY", 0)
+    return TestClient(assessment_service.app)
+
+
+def body(**loan_details):
+    return {"companyName": "Test Ltd", "loanDetails": {"amount": "1000000", "term": "36", "purpose": "Capex",
+                                                       **loan_details}}
+
+
+def test_create_assessment(client):
+    response = client.post("/api/assessments", json=body())
+    assert response.status_code == 200
+    assert response.json()["narrative"].startswith("1. financial performance")
+    assert len(response.json()["drivers"]) == 3
+
+
+@pytest.mark.parametrize("loan_details", [{"amount": "abc"}, {"amount": "-5"}, {"term": None}, {"term": "x"},
+                                          {"purpose": "  "}, {"purpose": None}])
+def test_invalid_loan_details_are_rejected(client, loan_details):
+    response = client.post("/api/assessments", json=body(**loan_details))
+    assert response.status_code == 400
+    assert "loanDetails" in response.json()["error"]
+
+
+def test_llm_failure_returns_error_body(client, monkeypatch):
+    monkeypatch.setattr(assessment_service, "backend", FailingBackend())
+    response = client.post("/api/assessments", json=body())
+    assert response.status_code == 502
+    assert "model unavailable" in response.json()["error"]
+
+
+def test_least_recently_used_assessments_are_dropped(client, monkeypatch):
+    monkeypatch.setattr(assessment_service, "assessments", assessment_service.OrderedDict())
+    monkeypatch.setattr(assessment_service, "MAX_ASSESSMENTS", 2)
+    ids = [client.post("/api/assessments", json=body()).json()["assessmentId"] for _ in range(2)]
+    assert client.get(f"/api/assessments/{ids[0]}").status_code == 200  # ids[1] is now the oldest
+    ids.append(client.post("/api/assessments", json=body()).json()["assessmentId"])
+    assert [client.get(f"/api/assessments/{i}").status_code for i in ids] == [200, 404, 200]
+
+    monkeypatch.setattr(assessment_service, "ASSESSMENT_TTL", -1)
+    assert client.get(f"/api/assessments/{ids[2]}").status_code == 404
+    assert not assessment_service.assessments
+
+
+def test_failed_job_nobody_awaits_is_not_reported_as_unretrieved(caplog):
+    async def failing():
+        raise RuntimeError("model unavailable")
+
+    async def start():
+        assessment = {"jobs": {}}
+        assessment_service._start_job(assessment, "narrative", failing())
+        await asyncio.sleep(0)
+
+    asyncio.run(start())
+    gc.collect()
+    assert "never retrieved" not in caplog.text
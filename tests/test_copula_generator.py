@@ -0,0 +1,62 @@
+import numpy as np
+import pandas as pd
+import pytest
+from copula_generator import INTEGER_COLUMNS, LABEL_COLUMNS, LABEL_RANGES, RATIO_COLUMNS, CopulaGenerator
+
+
+@pytest.fixture
+def training():
+    """
+    Labelled rows where the labels depend on the ratios, within LABEL_RANGES.
+    """
+    rng = np.random.default_rng(3)
+    n = 400
+    ratios = rng.multivariate_normal(np.zeros(len(RATIO_COLUMNS)), 0.5 * np.eye(len(RATIO_COLUMNS)) + 0.5, n)
+    data = pd.DataFrame(ratios * 10, columns=RATIO_COLUMNS)
+    risk = 1 / (1 + np.exp(ratios[:, 0] + 0.5 * rng.standard_normal(n)))
+    data["Loan Value"] = rng.uniform(1e6, 5e8, n)
+    data["Collateral Value"] = np.minimum(data["Loan Value"] * rng.uniform(1, 1.5, n), 5.5e8)
+    data["Loan Tenure"] = rng.integers(6, 241, n)
+    data["Credit Score"] = np.rint(900 - 600 * risk)
+    data["Risk Score"] = 100 * risk
+    return data
+
+
+def in_ranges(frame):
+    return all(frame[col].between(*LABEL_RANGES[col]).all() for col in LABEL_COLUMNS)
+
+
+def test_samples_and_labels_stay_in_range(training):
+    model = CopulaGenerator.fit(training)
+    sample = model.sample(20_000, seed=1)
+    assert list(sample.columns) == RATIO_COLUMNS + LABEL_COLUMNS
+    assert in_ranges(sample)
+
+    labels = model.label(training, seed=1)
+    assert list(labels.columns) == LABEL_COLUMNS and labels.index.equals(training.index)
+    assert in_ranges(labels)
+    for frame in (sample, labels):
+        for col in INTEGER_COLUMNS:
+            assert pd.api.types.is_integer_dtype(frame[col])
+    # The dependence of the labels on the ratios is kept
+    assert np.corrcoef(training["Net Profit Margin %"], labels["Credit Score"])[0, 1] > 0.5
+
+
+def test_save_and_load_give_the_same_samples(tmp_path, training):
+    model = CopulaGenerator.fit(training)
+    path = str(tmp_path / "model.json")
+    model.save(path)
+    loaded = CopulaGenerator.load(path)
+
+    pd.testing.assert_frame_equal(loaded.sample(1_000, seed=7), model.sample(1_000, seed=7))
+    pd.testing.assert_frame_equal(loaded.label(training, seed=7), model.label(training, seed=7))
+
+
+def test_missing_ratios_are_labelled(training):
+    model = CopulaGenerator.fit(training)
+    features = training[RATIO_COLUMNS].head(50).copy()
+    features.iloc[::3, 1] = np.nan
+    features.iloc[5] = np.nan
+    labels = model.label(features, seed=2)
+    assert not labels.isna().any().any()
+    assert in_ranges(labels)
@@ -0,0 +1,38 @@
+import os
+import pandas as pd
+import pyarrow.parquet as pq
+from financials_store import FinancialsStore
+
+
+def test_parquet_cache_is_only_loaded_when_its_hash_matches(tmp_path, monkeypatch):
+    source = str(tmp_path / "financials.xlsx")
+    pd.DataFrame({"Company": ["A.NS", "B.NS"], "Current Ratio": [1.5, 0.7]}).to_excel(source, index=False)
+    assert FinancialsStore(source).get("B.NS")["Current Ratio"] == 0.7
+    assert [name for name in os.listdir(tmp_path) if name.endswith(".tmp")] == []
+
+    loads = []
+    read_table = pq.read_table
+    monkeypatch.setattr(pq, "read_table", lambda *args, **kwargs: loads.append(args) or read_table(*args, **kwargs))
+
+    # Unchanged source: answered from the cache without parsing Excel
+    monkeypatch.setattr(pd, "read_excel", None)
+    assert FinancialsStore(source).get("A.NS")["Current Ratio"] == 1.5
+    assert len(loads) == 1
+    monkeypatch.undo()
+
+    # Changed source: the stale cache is never loaded
+    pd.DataFrame({"Company": ["A.NS"], "Current Ratio": [2.5]}).to_excel(source, index=False)
+    loads.clear()
+    monkeypatch.setattr(pq, "read_table", lambda *args, **kwargs: loads.append(args) or read_table(*args, **kwargs))
+    store = FinancialsStore(source)
+    assert store.get("A.NS")["Current Ratio"] == 2.5 and "B.NS" not in store
+    assert loads == []
+
+
+def test_source_that_cannot_be_cached_is_still_served(tmp_path):
+    source = str(tmp_path / "financials.xlsx")
+    # A column mixing numbers and text has no Parquet type
+    pd.DataFrame({"Company": ["A.NS", "B.NS"], "Rating": [3, "AA"]}).to_excel(source, index=False)
+    store = FinancialsStore(source)
+    assert store.get("B.NS")["Rating"] == "AA"
+    assert os.listdir(tmp_path) == ["financials.xlsx"]
@@ -0,0 +1,80 @@
+import sqlite3
+from openai.types.chat import ChatCompletion
+from llm_cache import LLMCache, CachedClient, cache_key
+
+
+def stored(path):
+    db = sqlite3.connect(path)
+    try:
+        return dict(db.execute("SELECT key, size FROM responses"))
+    finally:
+        db.close()
+
+
+class FakeCompletions:
+    def __init__(self):
+        self.calls = 0
+
+    def create(self, **kwargs):
+        self.calls += 1
+        return ChatCompletion.model_validate({
+            "id": f"c{self.calls}", "object": "chat.completion", "created": 0, "model": kwargs["model"],
+            "choices": [{"index": 0, "finish_reason": "stop",
+                         "message": {"role": "assistant", "content": f"answer {self.calls}"}}]})
+
+
+class FakeClient:
+    def __init__(self):
+        self.chat = type("Chat", (), {"completions": FakeCompletions()})()
+
+
+def test_sampled_requests_are_cached_unless_bypassed(tmp_path):
+    client = CachedClient(FakeClient(), LLMCache(str(tmp_path / "cache.sqlite")))
+    request = {"model": "m", "messages": [{"role": "user", "content": "hi"}], "temperature": 0.6}
+    answer = lambda **kwargs: client.chat.completions.create(**request, **kwargs).choices[0].message.content
+
+    assert answer() == answer() == "answer 1"
+    # Regenerating calls the model even though the request is cached
+    assert answer(cache=False) == "answer 2"
+    assert client._client.chat.completions.calls == 2
+
+    uncached = CachedClient(FakeClient(), None)  # LLM_CACHE=0
+    assert uncached.chat.completions.create(**request).choices[0].message.content == "answer 1"
+    assert uncached.chat.completions.create(**request).choices[0].message.content == "answer 2"
+
+
+def test_scope_separates_identical_prompts():
+    messages = [{"role": "user", "content": "same prompt"}]
+    assert cache_key("m", messages, temperature=0) == cache_key("m", messages, temperature=0)
+    assert cache_key("m", messages, scope=1, temperature=0) != cache_key("m", messages, scope=2, temperature=0)
+
+
+def test_running_total_and_lru_eviction(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    cache = LLMCache(path, max_bytes=1000)
+    for i in range(5):
+        cache.put(f"k{i}", "x" * 150)
+    cache.put("k0", "x" * 100)  # replacing an entry counts its new size only
+    assert cache.total == sum(stored(path).values()) == 700
+
+    assert cache.get("k1") is not None  # k1 becomes the most recently used
+    for i in range(5, 8):
+        cache.put(f"k{i}", "x" * 150)
+    keys = stored(path)
+    assert cache.total == sum(keys.values()) <= 1000
+    assert "k1" in keys and "k2" not in keys
+
+    cache.delete("k1")
+    assert cache.total == sum(stored(path).values())
+
+
+def test_access_times_are_written_in_batches(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    cache = LLMCache(path)
+    cache.put("k", "value")
+    created = sqlite3.connect(path).execute("SELECT last_used FROM responses").fetchone()[0]
+
+    assert cache.get("k") == "value"
+    assert sqlite3.connect(path).execute("SELECT last_used FROM responses").fetchone()[0] == created
+    cache.flush()
+    assert sqlite3.connect(path).execute("SELECT last_used FROM responses").fetchone()[0] > created
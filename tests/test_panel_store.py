@@ -0,0 +1,53 @@
+import numpy as np
+import pandas as pd
+from panel_store import KEY_COLUMNS, FinancialsPanel
+
+
+def random_panel(n_tickers=40, seed=0):
+    rng = np.random.default_rng(seed)
+    periods = pd.to_datetime([f"{year}-03-31" for year in range(2019, 2025)])
+    panel = pd.DataFrame({"Company": np.repeat([f"T{i:02d}.NS" for i in range(n_tickers)], len(periods)),
+                          "Period": np.tile(periods, n_tickers)})
+    panel["Report Date"] = panel["Period"] + pd.to_timedelta(rng.integers(30, 120, len(panel)), unit="D")
+    # Restatements, some of them reported after newer periods
+    restated = panel.sample(frac=0.3, random_state=seed).copy()
+    restated["Report Date"] += pd.to_timedelta(rng.integers(1, 500, len(restated)), unit="D")
+    panel = pd.concat([panel, restated], ignore_index=True)
+    panel["Current Ratio"] = rng.normal(size=len(panel))
+    return panel
+
+
+def naive_as_of(panel, ticker, date):
+    """
+    Latest period reported by date, in its latest revision by date.
+    """
+    known = panel[(panel["Company"] == ticker) & (panel["Report Date"] <= date)]
+    if known.empty:
+        return None
+    latest = known[known["Period"] == known["Period"].max()]
+    return latest.sort_values("Report Date").iloc[-1]
+
+
+def test_as_of_matches_naive_filtering():
+    panel = random_panel()
+    index = FinancialsPanel(panel)
+    tickers = list(panel["Company"].unique()) + ["MISSING.NS"]
+    for date in pd.to_datetime(["2019-01-01", "2020-06-30", "2022-12-31", "2026-01-01"]):
+        rows = index.as_of(tickers, date)
+        assert rows["Company"].tolist() == tickers
+        for ticker, row in zip(tickers, rows.itertuples(index=False)):
+            expected = naive_as_of(panel, ticker, date)
+            if expected is None:
+                assert pd.isna(row.Period) and np.isnan(row[-1])
+            else:
+                assert row.Period == expected["Period"]
+                assert row[3] == expected["Report Date"]
+                assert row[-1] == expected["Current Ratio"]
+
+
+def test_as_of_on_an_empty_panel_is_all_nan():
+    index = FinancialsPanel(pd.DataFrame(columns=KEY_COLUMNS + ["Current Ratio"]))
+    rows = index.as_of(["ABC.NS", "XYZ.NS"], "2024-12-31")
+    assert rows["Company"].tolist() == ["ABC.NS", "XYZ.NS"]
+    assert rows[["Period", "Report Date", "Current Ratio"]].isna().all().all()
+    assert index.get("ABC.NS", "2024-12-31") is None
@@ -0,0 +1,41 @@
+import numpy as np
+import pandas as pd
+import pytest
+from running_stats import RunningStats
+from scoring_snapshot import INPUT_COLUMNS, score_applicant
+
+
+@pytest.fixture
+def population():
+    rng = np.random.default_rng(5)
+    frame = pd.DataFrame(rng.normal(10, 5, size=(3_000, len(INPUT_COLUMNS))), columns=INPUT_COLUMNS)
+    frame["Collateral Value"] = rng.uniform(1e6, 5e8, len(frame))
+    frame.iloc[::7, 0] = np.nan
+    return frame
+
+
+def test_save_and_load_keep_the_statistics(tmp_path, population):
+    stats = RunningStats.from_frame(population)
+    path = str(tmp_path / "stats.json")
+    stats.save(path)
+    loaded = RunningStats.load(path)
+
+    assert loaded.count == stats.count and loaded.min == stats.min and loaded.max == stats.max
+    for col in stats.features:
+        for q in (0.1, 0.5, 0.9):
+            assert loaded.quantile(col, q) == stats.quantile(col, q)
+    assert loaded.scoring_snapshot()["median"] == stats.scoring_snapshot()["median"]
+
+    # The loaded sketches keep taking values
+    loaded.admit(population.iloc[0].to_dict())
+    assert loaded.count["Credit Score"] == stats.count["Credit Score"] + 1
+    assert loaded.sketches["Credit Score"].n == stats.sketches["Credit Score"].n + 1
+
+
+def test_snapshot_needs_a_value_for_every_feature(population):
+    stats = RunningStats.from_frame(population.drop(columns="Credit Score"))
+    with pytest.raises(ValueError, match="Credit Score"):
+        stats.scoring_snapshot()
+
+    stats.admit(population.iloc[0].to_dict())
+    assert np.isfinite(score_applicant(population.iloc[1].to_dict(), stats.scoring_snapshot())["Final Risk Score"])
@@ -0,0 +1,76 @@
+import numpy as np
+import pandas as pd
+import pytest
+from batch_scoring import score_batch
+from scenario_grid import risk_surface
+from scoring_snapshot import INPUT_COLUMNS, snapshot_from_frame
+
+LOANS = np.linspace(1e6, 5e8, 7)
+COLLATERALS = np.linspace(1e6, 5.5e8, 6)
+# Reaches past the reference credit scores at both ends, where the score is clipped
+CREDITS = np.linspace(250, 950, 8)
+
+
+@pytest.fixture
+def snapshot(reference):
+    return snapshot_from_frame(reference)
+
+
+@pytest.fixture
+def ratios(reference):
+    return reference.iloc[5].drop(["Loan Value", "Collateral Value", "Credit Score"]).to_dict()
+
+
+def grid_scores(ratios, snapshot, loans, collaterals, credits):
+    """
+    score_batch of every (loan, collateral, credit score) combination, as L x C x S arrays.
+    """
+    L, C, S = np.meshgrid(loans, collaterals, credits, indexing="ij")
+    frame = pd.DataFrame([ratios] * L.size).reindex(columns=INPUT_COLUMNS)
+    frame["Loan Value"], frame["Collateral Value"], frame["Credit Score"] = L.ravel(), C.ravel(), S.ravel()
+    scores = score_batch(frame, snapshot)
+    return {col: scores[col].to_numpy().reshape(L.shape) for col in scores.columns}
+
+
+def test_surface_matches_score_batch(ratios, snapshot):
+    surface = risk_surface(ratios, LOANS, COLLATERALS, CREDITS, snapshot)
+    expected = grid_scores(ratios, snapshot, LOANS, COLLATERALS, CREDITS)
+
+    assert surface["Final Risk Score"].shape == (len(LOANS), len(COLLATERALS), len(CREDITS))
+    assert np.allclose(surface["Final Risk Score"], expected["Final Risk Score"])
+    assert np.allclose(surface["Repayment Risk Score"], expected["Repayment Risk Score"])
+    assert np.allclose(surface["Financial Risk Score"], expected["Financial Risk Score"])
+
+
+@pytest.mark.parametrize("name, axis", [("Loan Value", 0), ("Collateral Value", 1), ("Credit Score", 2)])
+def test_partial_derivatives_match_finite_differences(ratios, snapshot, name, axis):
+    surface = risk_surface(ratios, LOANS, COLLATERALS, CREDITS, snapshot)
+    grids = [LOANS, COLLATERALS, CREDITS]
+    step = 1e-6 * grids[axis]
+
+    def shifted(sign):
+        moved = list(grids)
+        moved[axis] = grids[axis] + sign * step
+        return grid_scores(ratios, snapshot, *moved)["Final Risk Score"]
+
+    center = surface["Final Risk Score"]
+    along = np.expand_dims(step, [a for a in range(3) if a != axis])
+    forward, backward = (shifted(1) - center) / along, (center - shifted(-1)) / along
+    # Skip points on a kink of the piecewise linear score, where the one-sided slopes differ
+    smooth = np.isclose(forward, backward, rtol=1e-4, atol=1e-12)
+    assert smooth.mean() > 0.8
+    assert np.allclose(surface["d " + name][smooth], forward[smooth], rtol=1e-4, atol=1e-12)
+    if name == "Credit Score":
+        # Outside the reference range the input is clipped
+        assert (surface["d Credit Score"][:, :, [0, -1]] == 0).all()
+        assert (surface["d Credit Score"][:, :, 1:-1] != 0).all()
+
+
+def test_feature_gradients_match_finite_differences(ratios, snapshot):
+    surface = risk_surface(ratios, LOANS, COLLATERALS, CREDITS, snapshot)
+    for col, gradient in surface["feature_gradients"].items():
+        step = 1e-6 * max(abs(ratios[col]), 1)
+        scores = [risk_surface({**ratios, col: ratios[col] + sign * step}, LOANS, COLLATERALS, CREDITS, snapshot)
+                  for sign in (-1, 1)]
+        slope = (scores[1]["Final Risk Score"][0, 0, 0] - scores[0]["Final Risk Score"][0, 0, 0]) / (2 * step)
+        assert slope == pytest.approx(gradient, rel=1e-4, abs=1e-9)
@@ -0,0 +1,95 @@
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.preprocessing import MinMaxScaler
+import dt
+import rule_decision
+import scoring_snapshot
+from running_stats import KLLSketch
+from scoring_snapshot import INPUT_COLUMNS, score_applicant, snapshot_from_frame
+from scoring_snapshot import FIN_WEIGHTS, REPAY_WEIGHTS
+from batch_scoring import score_batch, top_drivers
+
+
+def test_batch_explain_matches_score_applicant(reference, applicants):
+    snapshot = snapshot_from_frame(reference)
+    scores, contributions = score_batch(applicants, snapshot, explain=True)
+
+    for i, row in applicants.iterrows():
+        single = score_applicant(row.to_dict(), snapshot, explain=True)
+        assert scores.loc[i, "Final Risk Score"] == pytest.approx(single["Final Risk Score"])
+        assert scores.loc[i, "Base Score"] == pytest.approx(single["Base Score"])
+        for feature, value in single["Contributions"].items():
+            assert contributions.loc[i, feature] == pytest.approx(value, abs=1e-9)
+
+    assert np.allclose(scores["Base Score"] + contributions.sum(axis=1), scores["Final Risk Score"])
+
+
+def test_top_drivers_are_the_largest_contributions(reference, applicants):
+    _, contributions = score_batch(applicants, snapshot_from_frame(reference), explain=True)
+    for (_, row), drivers in zip(contributions.iterrows(), top_drivers(contributions, k=3)):
+        expected = row.abs().sort_values(ascending=False).index[:3].tolist()
+        assert [feature for feature, _ in drivers] == expected
+
+
+def legacy_rule_score(reference, data):
+    """
+    Final Risk Score of the applicant as the original rule_function computed it: append the
+    applicant to the reference, median fill, refit MinMaxScaler and score the last row.
+    """
+    df = pd.concat([reference, pd.DataFrame([data])], axis=0)[INPUT_COLUMNS].astype(float)
+    df["LtC"] = np.where(df["Collateral Value"] == 0, np.nan, df["Loan Value"] / df["Collateral Value"])
+    df = df.drop(columns=["Loan Value", "Collateral Value"])
+    df = df.fillna(df.median(numeric_only=True))
+    scaled = pd.DataFrame(MinMaxScaler().fit_transform(df), columns=df.columns)
+    scaled = 1 + 100 * scaled
+    for feature, weight in (FIN_WEIGHTS | REPAY_WEIGHTS).items():
+        scaled[feature] = scaled[feature] * weight
+    fin_score = 100 - scaled[list(FIN_WEIGHTS)].sum(axis=1)
+    repay_score = 100 - scaled[list(REPAY_WEIGHTS)].sum(axis=1)
+    return (fin_score * 0.3 + repay_score * 0.7).iloc[-1]
+
+
+def test_snapshot_matches_the_refitted_rule_function(reference, applicants):
+    snapshot = snapshot_from_frame(reference)
+    for _, row in applicants.iterrows():
+        data = row.to_dict()
+        assert score_applicant(data, snapshot)["Final Risk Score"] == pytest.approx(legacy_rule_score(reference, data))
+
+
+def test_batch_matches_score_applicant(reference, applicants):
+    snapshot = snapshot_from_frame(reference)
+    scores = score_batch(applicants, snapshot)
+    for i, row in applicants.iterrows():
+        assert scores.loc[i, "Final Risk Score"] == pytest.approx(score_applicant(row.to_dict(), snapshot)["Final Risk Score"])
+
+
+@pytest.mark.parametrize("seed", [0, 1, 2])
+def test_kll_rank_error_stays_within_bounds(seed):
+    rng = np.random.default_rng(seed)
+    values = rng.lognormal(0, 1, 50_000)
+    # Two halves sketched separately and merged, like stats of several workers
+    sketch, other = KLLSketch(k=200, seed=seed), KLLSketch(k=200, seed=seed + 1)
+    sketch.update_many(values[:25_000])
+    other.update_many(values[25_000:])
+    sketch.merge(other)
+
+    ordered = np.sort(values)
+    assert sketch.n == len(values)
+    assert sum(len(c) for c in sketch.compactors) < 2_000
+    for q in np.linspace(0.01, 0.99, 25):
+        true_rank = np.searchsorted(ordered, sketch.quantile(q), side="right") / len(values)
+        assert abs(true_rank - q) < 0.02
+        assert abs(sketch.rank(ordered[int(q * len(values))]) - q) < 0.02
+
+
+def test_every_rule_scorer_uses_the_snapshot(reference, applicants, monkeypatch):
+    monkeypatch.setattr(scoring_snapshot, "load_snapshot", lambda: snapshot_from_frame(reference))
+    for _, row in applicants.iterrows():
+        data = row.to_dict()
+        expected = legacy_rule_score(reference, data)
+        score, ltc = rule_decision.rule_function(data)
+        assert score == pytest.approx(expected)
+        assert dt.rule_function(data) == pytest.approx(expected)
+        if data["Collateral Value"]:
+            assert ltc == pytest.approx(data["Loan Value"] / data["Collateral Value"])
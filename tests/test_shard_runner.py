@@ -0,0 +1,83 @@
+import pytest
+import llm_engine
+from llm_engine import generate, regenerate
+from row_journal import read_journal, request_hash
+from shard_runner import row_journals, shard_journal, shard_of, shard_quota
+
+
+class FakeEngine:
+    """
+    Answers every request at once with a fixed text, in place of GenerationEngine.
+    """
+    calls = []
+    forgotten = []
+    scopes = []
+
+    def __init__(self, concurrency=None, limiter=None):
+        pass
+
+    def forget(self, messages, scope=None, **params):
+        FakeEngine.forgotten.append(scope)
+
+    def run(self, requests, parse=None, on_result=None, scopes=None, **params):
+        FakeEngine.calls.append(len(requests))
+        FakeEngine.scopes.append(scopes)
+        results = [f"answer to {messages[0]['content']}" for messages in requests]
+        for i, result in enumerate(results):
+            if on_result is not None:
+                on_result(i, result)
+        return results
+
+
+@pytest.fixture
+def fake_engine(monkeypatch):
+    FakeEngine.calls, FakeEngine.forgotten, FakeEngine.scopes = [], [], []
+    monkeypatch.setattr(llm_engine, "GenerationEngine", FakeEngine)
+    return FakeEngine
+
+
+@pytest.mark.parametrize("quota, shards, share", [(0, 4, 0), (3, 4, 1), (1, 8, 1), (100, 4, 25), (90_000, 4, 22_500)])
+def test_shard_quota_never_turns_a_limit_off(quota, shards, share):
+    assert shard_quota(quota, shards) == share
+
+
+def test_row_journals_match_the_shard_of_each_row(tmp_path):
+    keys = [f"T{i}.NS|2024" for i in range(50)]
+    journal = str(tmp_path / "run.jsonl")
+    expected = [shard_journal(journal, shard, 4) for shard in shard_of(keys, 4)]
+    assert row_journals(keys, journal, 4) == expected
+
+
+def test_regenerated_rows_are_journaled_in_their_shard(tmp_path, fake_engine):
+    requests = [[{"role": "user", "content": f"Row {i}"}] for i in range(10)]
+    keys = [f"T{i}.NS|2024" for i in range(10)]
+    journals = row_journals(keys, str(tmp_path / "run.jsonl"), 3)
+    params = {"temperature": 0.5, "max_tokens": 20}
+
+    # First pass of each shard, as generate_sharded's workers run it
+    for path in set(journals):
+        rows = [i for i in range(10) if journals[i] == path]
+        generate([requests[i] for i in rows], journal=path, rows=rows, **params)
+    regenerated = regenerate(requests, [2, 7], journal=journals, **params)
+    assert regenerated == {2: "answer to Row 2", 7: "answer to Row 7"}
+
+    # A resumed run finds every row, the regenerated ones included, in the shard journals
+    fake_engine.calls = []
+    for path in set(journals):
+        rows = [i for i in range(10) if journals[i] == path]
+        results = generate([requests[i] for i in rows], journal=path, rows=rows, **params)
+        assert results == [f"answer to Row {i}" for i in rows]
+    assert fake_engine.calls == []
+
+    for i in (2, 7):
+        # The first answer and the regenerated one, both in the row's own shard journal
+        entries = [entry for entry in read_journal(journals[i]) if entry["row"] == i]
+        assert [entry["hash"] for entry in entries] == [request_hash(requests[i], **params)] * 2
+
+
+def test_regenerated_rows_keep_their_own_cache_entries(fake_engine):
+    # Identical prompts: only the row scope keeps their cached answers apart
+    requests = [[{"role": "user", "content": "Same prompt"}] for _ in range(5)]
+    regenerate(requests, [1, 3], temperature=0)
+    assert fake_engine.forgotten == [1, 3]
+    assert fake_engine.scopes == [[1, 3]]
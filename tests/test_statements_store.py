@@ -0,0 +1,29 @@
+import pandas as pd
+from statements_store import compact, current_versions, read_statements, statements_frame, write_statements
+
+
+def balance_sheet(periods, value):
+    return {"balance_sheet": pd.DataFrame({period: [value, value * 2] for period in periods},
+                                          index=["Total Assets", "Total Debt"])}
+
+
+def test_periods_missing_from_a_newer_fetch_stay_current(tmp_path):
+    path = str(tmp_path / "statements")
+    # The first fetch covers 2021-2024, the newer one only 2022-2025 (the provider returns ~4 years)
+    write_statements(statements_frame("ABC.NS", balance_sheet(["2021-03-31", "2022-03-31", "2023-03-31",
+                                                                "2024-03-31"], 1.0), version=1), path)
+    write_statements(statements_frame("ABC.NS", balance_sheet(["2022-03-31", "2023-03-31", "2024-03-31",
+                                                                "2025-03-31"], 5.0), version=2), path)
+
+    def assets():
+        rows = read_statements(path, tickers=["ABC.NS"])
+        rows = rows[rows["Item"] == "Total Assets"]
+        return dict(zip(pd.to_datetime(rows["Period"]).dt.year, rows["Value"]))
+
+    expected = {2021: 1.0, 2022: 5.0, 2023: 5.0, 2024: 5.0, 2025: 5.0}
+    assert assets() == expected
+    assert len(current_versions(path)) == 5
+
+    compact(path)
+    assert assets() == expected
+    assert read_statements(path, years=[2021])["Version"].tolist() == [1, 1]
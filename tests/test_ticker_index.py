@@ -0,0 +1,20 @@
+import pytest
+from ticker_index import TickerIndex
+
+NAMES = ["The Company Ltd", "Tata Motors Limited", "Infosys Ltd"]
+SYMBOLS = ["TCL.NS", "TATAMOTORS.NS", "INFY.NS"]
+
+
+@pytest.mark.parametrize("name", ["Ltd", "The Company", "Pvt. Ltd.", ""])
+def test_names_of_only_stop_words_match_nothing(name):
+    index = TickerIndex(NAMES, SYMBOLS)
+    assert index.lookup(name) is None
+    assert index.search(name) == []
+    assert index.resolve(name) is None
+
+
+def test_lookup_and_search():
+    index = TickerIndex(NAMES, SYMBOLS)
+    assert index.lookup("Tata Motors Ltd.") == "TATAMOTORS.NS"
+    assert index.lookup("infy") == "INFY.NS"
+    assert index.search("Infosys Technologies")[0][0] == "INFY.NS"
@@ -0,0 +1,49 @@
+import json
+import numpy as np
+import pandas as pd
+import pytest
+from batch_scoring import score_batch
+from scoring_snapshot import snapshot_from_frame
+from weight_profiles import RISK_BANDS, apply_profile, compare_profiles, load_profiles, score_profiles
+
+
+@pytest.fixture
+def profiles(tmp_path):
+    path = tmp_path / "profiles.json"
+    path.write_text(json.dumps([
+        {"name": "baseline"},
+        {"name": "repayment heavy", "final_weights": {"Financial Risk Score": 0.1, "Repayment Risk Score": 0.9}},
+        {"name": "leverage averse",
+         "fin_weights": {"Net Profit Margin %": 0.2, "Return on Equity %": 0.2, "Return on Assets %": 0.2,
+                         "Current Ratio": 0.2, "Debt Equity Ratio": -0.3, "Debt To Asset Ratio": -0.4},
+         "repay_weights": {"Interest Coverage Ratio": 0.3, "Credit Score": 0.5, "LtC": -0.2}},
+    ]))
+    # Weight groups a profile leaves out come from the baseline
+    return load_profiles(str(path))
+
+
+def test_each_profile_matches_score_batch(reference, applicants, profiles):
+    snapshot = snapshot_from_frame(reference)
+    finals = score_profiles(applicants, profiles, snapshot)
+    components = score_profiles(applicants, profiles, snapshot, components=True)
+
+    for profile in profiles:
+        expected = score_batch(applicants, apply_profile(snapshot, profile))
+        assert np.allclose(finals[profile["name"]], expected["Final Risk Score"])
+        for score in ["Financial Risk Score", "Repayment Risk Score", "Final Risk Score"]:
+            assert np.allclose(components[(score, profile["name"])], expected[score])
+
+
+def test_compare_profiles(reference, applicants, profiles):
+    finals = score_profiles(applicants, profiles, snapshot_from_frame(reference))
+    summary = compare_profiles(finals)
+
+    assert summary.loc["baseline", "Spearman vs baseline"] == pytest.approx(1)
+    assert summary.loc["baseline", "Band changes vs baseline"] == 0
+    assert np.allclose(summary[list(RISK_BANDS)].sum(axis=1), 1)
+
+    bands = finals.apply(lambda scores: pd.cut(scores, [-np.inf, 30, 70, np.inf], labels=False))
+    for name in finals.columns:
+        assert summary.loc[name, "Band changes vs baseline"] == (bands[name] != bands["baseline"]).sum()
+        assert summary.loc[name, "Spearman vs baseline"] == pytest.approx(
+            finals[name].corr(finals["baseline"], method="spearman"))
@@ -0,0 +1,211 @@
+import os
+import re
+import json
+import pickle
+import tempfile
+from collections import Counter, defaultdict
+import pandas as pd
+import requests
+
+# Same ticker lists scraper_final.py uses
+TICKER_FILES = ["equity_tickers.csv", "sme_tickers.csv"]
+INDEX_PATH = "output/ticker_index.pkl"
+REMOTE_CACHE_PATH = "output/ticker_remote_cache.json"
+YAHOO_SEARCH_URL = "https://query1.finance.yahoo.com/v1/finance/search"
+
+# Minimum trigram Dice similarity for a fuzzy match
+FUZZY_THRESHOLD = 0.6
+
+# Words that don't tell companies apart
+STOP_WORDS = {"ltd", "limited", "pvt", "private", "co", "company", "corp", "corporation", "inc", "the", "and"}
+
+_session = None
+_index = None
+_remote_cache = None
+
+
+def normalize_name(name):
+    """
+    Lowercase, drop punctuation and legal suffixes: "Tata Motors Ltd." -> "tata motors".
+    """
+    words = re.sub(r"[^a-z0-9 ]", " ", str(name).lower().replace("&", " and ")).split()
+    return " ".join(w for w in words if w not in STOP_WORDS)
+
+
+def trigrams(text):
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class TickerIndex:
+    """
+    Offline company name -> NSE ticker index with exact (normalised) and trigram fuzzy matching.
+    """
+
+    def __init__(self, names, symbols, sources=None):
+        self.names = list(names)
+        self.symbols = list(symbols)
+        self.sources = sources or {}
+        self.exact = {}
+        self.postings = defaultdict(list)
+        self.sizes = []
+        for i, (name, symbol) in enumerate(zip(self.names, self.symbols)):
+            key = normalize_name(name)
+            self.exact.setdefault(key, symbol)
+            self.exact.setdefault(normalize_name(symbol.rsplit(".", 1)[0]), symbol)
+            grams = trigrams(key)
+            self.sizes.append(len(grams))
+            for gram in grams:
+                self.postings[gram].append(i)
+
+    @classmethod
+    def from_csvs(cls, paths=TICKER_FILES):
+        names, symbols, sources = [], [], {}
+        for path in paths:
+            if not os.path.exists(path):
+                continue
+            df = pd.read_csv(path)
+            df.columns = [col.strip() for col in df.columns]
+            name_col = next((col for col in df.columns if "NAME" in col.upper()), "SYMBOL")
+            df = df.dropna(subset=["SYMBOL"])
+            names += df[name_col].fillna(df["SYMBOL"]).astype(str).tolist()
+            symbols += [s.strip().upper() + ".NS" for s in df["SYMBOL"].astype(str)]
+            sources[path] = os.path.getmtime(path)
+        return cls(names, symbols, sources)
+
+    def lookup(self, company_name):
+        """
+        Exact match on the normalised name or symbol. A name made only of stop words ("The
+        Company Ltd") normalises to "" and matches nothing.
+        """
+        key = normalize_name(company_name)
+        return self.exact.get(key) if key else None
+
+    def search(self, company_name, limit=5):
+        """
+        Fuzzy matches ranked by trigram Dice similarity.
+        Returns:
+        - matches (list): (symbol, name, similarity) tuples, best first.
+        """
+        key = normalize_name(company_name)
+        if not key:
+            return []
+        grams = trigrams(key)
+        shared = Counter()
+        for gram in grams:
+            shared.update(self.postings.get(gram, ()))
+        scored = [(2 * count / (len(grams) + self.sizes[i]), i) for i, count in shared.items()]
+        scored.sort(reverse=True)
+        return [(self.symbols[i], self.names[i], score) for score, i in scored[:limit]]
+
+    def resolve(self, company_name):
+        """
+        Exact match, else the best fuzzy match above FUZZY_THRESHOLD, else None.
+        """
+        symbol = self.lookup(company_name)
+        if symbol:
+            return symbol
+        matches = self.search(company_name, limit=1)
+        if matches and matches[0][2] >= FUZZY_THRESHOLD:
+            return matches[0][0]
+        return None
+
+
+def load_index(index_path=INDEX_PATH, paths=TICKER_FILES):
+    """
+    Load the ticker index from disk (kept in memory afterwards), rebuilding it from the ticker
+    CSVs when they changed since it was saved.
+    """
+    global _index
+    sources = {path: os.path.getmtime(path) for path in paths if os.path.exists(path)}
+    if _index is not None and _index.sources == sources:
+        return _index
+
+    if os.path.exists(index_path):
+        with open(index_path, "rb") as f:
+            index = pickle.load(f)
+        if index.sources == sources:
+            _index = index
+            return _index
+
+    _index = TickerIndex.from_csvs(paths)
+    _replace_file(index_path, pickle.dumps(_index))
+    return _index
+
+
+def _replace_file(path, data):
+    """
+    Write to a temporary file of this process and rename it into place, so workers writing the
+    same file at once (e.g. ml_rule.py --bulk) never interleave or rename each other's file.
+    """
+    folder = os.path.dirname(path)
+    if folder:
+        os.makedirs(folder, exist_ok=True)
+    with tempfile.NamedTemporaryFile("wb", dir=folder or ".", prefix=os.path.basename(path) + ".",
+                                     suffix=".tmp", delete=False) as f:
+        f.write(data)
+    try:
+        os.replace(f.name, path)
+    except OSError:
+        os.remove(f.name)
+        raise
+
+
+def _load_remote_cache():
+    global _remote_cache
+    if _remote_cache is None:
+        _remote_cache = {}
+        if os.path.exists(REMOTE_CACHE_PATH):
+            with open(REMOTE_CACHE_PATH) as f:
+                _remote_cache = json.load(f)
+    return _remote_cache
+
+
+def _save_remote_cache():
+    # Keep the lookups other processes saved since this one loaded the cache
+    if os.path.exists(REMOTE_CACHE_PATH):
+        try:
+            with open(REMOTE_CACHE_PATH) as f:
+                _remote_cache.update({k: v for k, v in json.load(f).items() if k not in _remote_cache})
+        except (OSError, ValueError):
+            pass
+    _replace_file(REMOTE_CACHE_PATH, json.dumps(_remote_cache, indent=2).encode())
+
+
+def remote_search(company_name):
+    """
+    Yahoo Finance search, through one reused HTTP session. Results (including misses) are cached
+    on disk so a name is only ever looked up remotely once.
+    """
+    global _session
+    cache = _load_remote_cache()
+    key = normalize_name(company_name)
+    if key in cache:
+        return cache[key]
+
+    if _session is None:
+        _session = requests.Session()
+        _session.headers.update({"User-Agent": "Mozilla/5.0"})
+    response = _session.get(YAHOO_SEARCH_URL, params={"q": company_name}, timeout=10)
+    response.raise_for_status()
+    results = response.json().get("quotes", [])
+
+    # Prefer an NSE listing, else map a BSE listing onto its NSE symbol
+    symbols = [result.get("symbol", "") for result in results]
+    symbol = next((s for s in symbols if s.endswith(".NS")), None)
+    if symbol is None:
+        symbol = next((s[:-3] + ".NS" for s in symbols if s.endswith(".BO")), None)
+
+    cache[key] = symbol
+    _save_remote_cache()
+    return symbol
+
+
+def resolve_ticker(company_name, allow_remote=True):
+    """
+    Company name -> NSE ticker: local index first, remote search only on a miss.
+    """
+    symbol = load_index().resolve(company_name)
+    if symbol is None and allow_remote:
+        symbol = remote_search(company_name)
+    return symbol
@@ -0,0 +1,122 @@
+import sys
+import json
+import numpy as np
+import pandas as pd
+from scoring_snapshot import FIN_WEIGHTS, REPAY_WEIGHTS, FINAL_WEIGHTS, load_snapshot
+from batch_scoring import feature_matrix, scale_matrix
+
+PROFILES_PATH = "weight_profiles.json"
+
+BASELINE_PROFILE = {
+    "name": "baseline",
+    "fin_weights": dict(FIN_WEIGHTS),
+    "repay_weights": dict(REPAY_WEIGHTS),
+    "final_weights": dict(FINAL_WEIGHTS),
+}
+
+# Score bands used by the frontend (homepage.tsx getRiskCategory)
+RISK_BANDS = {"Low Risk": (-np.inf, 30), "Medium Risk": (30, 70), "High Risk": (70, np.inf)}
+
+
+def load_profiles(path=PROFILES_PATH):
+    """
+    Load weight profiles from a JSON list of
+    {"name", "fin_weights", "repay_weights", "final_weights"} objects.
+    Missing weight groups fall back to the baseline rule_function weights.
+    """
+    with open(path) as f:
+        profiles = json.load(f)
+    return [{**BASELINE_PROFILE, **profile} for profile in profiles]
+
+
+def apply_profile(snapshot, profile):
+    """
+    Copy of a scoring snapshot with the weights of one profile, for score_applicant / score_batch.
+    """
+    return {**snapshot, "fin_weights": profile["fin_weights"], "repay_weights": profile["repay_weights"],
+            "final_weights": profile["final_weights"]}
+
+
+def profile_matrices(profiles, features):
+    """
+    Compile K profiles into weight matrices over the snapshot features.
+    Returns:
+    - fin (ndarray): F x K financial weights.
+    - repay (ndarray): F x K repayment weights.
+    - blend (ndarray): 2 x K weights of the financial/repayment scores in the final score.
+    """
+    fin = np.zeros((len(features), len(profiles)))
+    repay = np.zeros((len(features), len(profiles)))
+    blend = np.zeros((2, len(profiles)))
+    for k, profile in enumerate(profiles):
+        for col, w in profile["fin_weights"].items():
+            fin[features.index(col), k] = w
+        for col, w in profile["repay_weights"].items():
+            repay[features.index(col), k] = w
+        blend[:, k] = [profile["final_weights"]["Financial Risk Score"], profile["final_weights"]["Repayment Risk Score"]]
+    return fin, repay, blend
+
+
+def score_profiles(frame_or_array, profiles, snapshot=None, components=False):
+    """
+    Score N applicants under K weight profiles at once.
+
+    Final = bf * (100 - S @ Wf) + br * (100 - S @ Wr) = 100 * (bf + br) - S @ (bf * Wf + br * Wr),
+    so the final scores of every profile come out of one (N x F) @ (F x K) product on the
+    scaled features S.
+    Args:
+    - frame_or_array: Applicants, see batch_scoring.feature_matrix.
+    - profiles (list): Weight profiles (see load_profiles).
+    - snapshot (dict): Scoring snapshot for the scaling, loaded from the default path if None.
+    - components (bool): Also return the Financial and Repayment Risk Scores per profile.
+    Returns:
+    - DataFrame: N x K Final Risk Scores, one column per profile name. With components=True
+      the columns are a (score, profile) MultiIndex covering all three scores.
+    """
+    if snapshot is None:
+        snapshot = load_snapshot()
+
+    scaled = scale_matrix(feature_matrix(frame_or_array), snapshot)
+    fin, repay, blend = profile_matrices(profiles, snapshot["features"])
+    names = [profile["name"] for profile in profiles]
+    index = frame_or_array.index if isinstance(frame_or_array, pd.DataFrame) else None
+
+    if not components:
+        final = 100 * blend.sum(axis=0) - scaled @ (blend[0] * fin + blend[1] * repay)
+        return pd.DataFrame(final, columns=names, index=index)
+
+    K = len(profiles)
+    sub_scores = 100 - scaled @ np.hstack([fin, repay])
+    fin_scores, repay_scores = sub_scores[:, :K], sub_scores[:, K:]
+    final = fin_scores * blend[0] + repay_scores * blend[1]
+    columns = pd.MultiIndex.from_product([["Financial Risk Score", "Repayment Risk Score", "Final Risk Score"], names])
+    return pd.DataFrame(np.hstack([fin_scores, repay_scores, final]), columns=columns, index=index)
+
+
+def compare_profiles(final_scores, baseline="baseline"):
+    """
+    Summarise Final Risk Scores from score_profiles per profile: distribution, risk band shares,
+    rank correlation with the baseline and how many applicants change band.
+    """
+    summary = final_scores.describe().T[["mean", "std", "min", "50%", "max"]]
+    bands = {}
+    for band, (low, high) in RISK_BANDS.items():
+        summary[band] = ((final_scores > low) & (final_scores <= high)).mean()
+        bands[band] = (final_scores > low) & (final_scores <= high)
+
+    if baseline in final_scores.columns:
+        ranks = final_scores.rank()
+        summary["Spearman vs " + baseline] = ranks.corrwith(ranks[baseline])
+        band_of = sum(i * bands[band].astype(int) for i, band in enumerate(RISK_BANDS))
+        summary["Band changes vs " + baseline] = band_of.ne(band_of[baseline], axis=0).sum()
+    return summary
+
+
+if __name__ == "__main__":
+    portfolio_path = sys.argv[1] if len(sys.argv) > 1 else "Updated_Application_Score_Assigned.xlsx"
+    profiles_path = sys.argv[2] if len(sys.argv) > 2 else PROFILES_PATH
+
+    portfolio = pd.read_csv(portfolio_path) if portfolio_path.endswith(".csv") else pd.read_excel(portfolio_path)
+    profiles = load_profiles(profiles_path)
+    scores = score_profiles(portfolio, profiles)
+    print(compare_profiles(scores).to_string())